@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import pickle
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from evaluate import evaluate_chunk
+from roguelike import CONTENT_PATH, Actor, BattleContext, OuterSkill, create_outer_pool, create_player
+from simulate import DEFAULT_MAX_STAGES, DEFAULT_MAX_TURNS, resolve_build, simulate_run
+
+
+DEFAULT_ADVISOR_BATTLES = 400
+DEFAULT_LOOKAHEAD = 2
+DEFAULT_CACHE_CAPACITY = 20000
+CACHE_VERSION = 3
+
+BuildKey = Tuple[str, Tuple[str, ...], int, str, int, int, Optional[int]]
+
+
+@dataclass(frozen=True)
+class Valuation:
+    win_rate: float
+    damage_taken: float
+
+
+def build_key(
+    inner_skill_id: str,
+    outer_skill_ids: Iterable[str],
+    stage: int,
+    policy_name: str,
+    battles: int,
+    seed: int,
+    max_turns: Optional[int],
+) -> BuildKey:
+    return inner_skill_id, tuple(sorted(outer_skill_ids)), stage, policy_name, battles, seed, max_turns
+
+
+def content_fingerprint(path: str = CONTENT_PATH) -> str:
+    with open(path, "rb") as handle:
+        return hashlib.sha256(handle.read()).hexdigest()
+
+
+class ValuationCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        capacity: int = DEFAULT_CACHE_CAPACITY,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.fingerprint = fingerprint if fingerprint is not None else content_fingerprint()
+        self.entries: OrderedDict[BuildKey, Valuation] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, key: BuildKey) -> Optional[Valuation]:
+        valuation = self.entries.get(key)
+        if valuation is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return valuation
+
+    def put(self, key: BuildKey, valuation: Valuation) -> None:
+        self.entries[key] = valuation
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "rb") as handle:
+                version, fingerprint, entries = pickle.load(handle)
+            if (version, fingerprint) != (CACHE_VERSION, self.fingerprint):
+                return
+            loaded = [(tuple(key), Valuation(float(win_rate), float(damage_taken))) for key, (win_rate, damage_taken) in entries]
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+            return
+        for key, valuation in loaded:
+            self.entries[key] = valuation
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def save(self) -> None:
+        if not self.path or not self.dirty:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as handle:
+            entries = [(key, (valuation.win_rate, valuation.damage_taken)) for key, valuation in self.entries.items()]
+            pickle.dump((CACHE_VERSION, self.fingerprint, entries), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path)
+        self.dirty = False
+
+
+class RewardAdvisor:
+    def __init__(
+        self,
+        cache: Optional[ValuationCache] = None,
+        battles: int = DEFAULT_ADVISOR_BATTLES,
+        lookahead: int = DEFAULT_LOOKAHEAD,
+        policy_name: str = "attack",
+        seed: int = 0,
+        max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    ) -> None:
+        self.cache = cache if cache is not None else ValuationCache()
+        self.battles = battles
+        self.lookahead = lookahead
+        self.policy_name = policy_name
+        self.seed = seed
+        self.max_turns = max_turns
+
+    def valuation(self, inner_skill_id: str, outer_skill_ids: Iterable[str], stage: int) -> Valuation:
+        key = build_key(inner_skill_id, outer_skill_ids, stage, self.policy_name, self.battles, self.seed, self.max_turns)
+        valuation = self.cache.get(key)
+        if valuation is not None:
+            return valuation
+        stats = evaluate_chunk(
+            inner_skill_id,
+            list(key[1]),
+            stage,
+            self.policy_name,
+            self.seed,
+            0,
+            self.battles,
+            self.max_turns,
+        )
+        damage_taken = sum(value * count for value, count in stats.damage_taken.items())
+        valuation = Valuation(stats.wins / stats.battles, damage_taken / stats.battles)
+        self.cache.put(key, valuation)
+        return valuation
+
+    def score(self, inner_skill_id: str, outer_skill_ids: List[str], stage: int) -> float:
+        valuations = [
+            self.valuation(inner_skill_id, outer_skill_ids, next_stage)
+            for next_stage in range(stage, stage + self.lookahead)
+        ]
+        return sum(valuation.win_rate for valuation in valuations) / len(valuations)
+
+    def advise(self, options: List[OuterSkill], player: Actor, stage: int) -> List[Tuple[OuterSkill, float]]:
+        owned = [skill.id for skill in player.outer_skills]
+        scored = [(option, self.score(player.inner_skill.id, owned + [option.id], stage)) for option in options]
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        return self.advise(options, player, ctx.stage + 1)[0][0]
+
+
+class AdvisorPolicy:
+    def __init__(self, seed: Optional[int] = None, advisor: Optional[RewardAdvisor] = None) -> None:
+        self.advisor = advisor if advisor is not None else RewardAdvisor()
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        return "1"
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        return self.advisor.choose_reward(options, player, ctx)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模拟后续关卡为外功奖励打分")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument("--options", nargs=3, required=True, help="三个候选外功 id")
+    parser.add_argument("--stage", type=int, default=2, help="下一关关卡号")
+    parser.add_argument("--battles", type=int, default=DEFAULT_ADVISOR_BATTLES)
+    parser.add_argument("--lookahead", type=int, default=DEFAULT_LOOKAHEAD)
+    parser.add_argument("--cache", default="advisor_cache.pkl")
+    parser.add_argument("--runs", type=int, default=0, help="额外用该顾问自动进行若干局")
+    args = parser.parse_args()
+
+    inner_skill, outer_skills = resolve_build(args.inner_skill, args.outer_skills)
+    _, options = resolve_build(args.inner_skill, args.options)
+    player = create_player(inner_skill)
+    player.outer_skills = list(outer_skills)
+    cache = ValuationCache(args.cache)
+    advisor = RewardAdvisor(cache, battles=args.battles, lookahead=args.lookahead)
+
+    for attempt in ("首次", "再次"):
+        started = time.perf_counter()
+        ranking = advisor.advise(options, player, args.stage)
+        elapsed = time.perf_counter() - started
+        print(f"{attempt}评估用时 {elapsed * 1e6:.0f} 微秒")
+    for option, score in ranking:
+        print(f"{option.id}（{option.name}）: 后 {args.lookahead} 关平均胜率 {score:.4f}")
+
+    if args.runs:
+        outer_pool = create_outer_pool()
+        stages: Dict[str, List[int]] = {}
+        for seed in range(args.runs):
+            result = simulate_run(seed, AdvisorPolicy(seed, advisor), outer_pool, DEFAULT_MAX_STAGES, DEFAULT_MAX_TURNS)
+            stages.setdefault(result.inner_skill, []).append(result.stages_cleared)
+        for inner_skill_id, cleared in sorted(stages.items()):
+            print(f"{inner_skill_id}: {len(cleared)} 局，平均通关 {sum(cleared) / len(cleared):.2f}")
+
+    print(f"缓存 {len(cache.entries)} 条，命中 {cache.hits}，未命中 {cache.misses}")
+    cache.save()
+
+
+if __name__ == "__main__":
+    main()
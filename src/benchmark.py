@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from roguelike import (
+    BattleContext,
+    Event,
+    battle,
+    create_enemy,
+    create_event_log,
+    create_inner_skills,
+    create_outer_pool,
+    create_player,
+)
+from simulate import DEFAULT_MAX_TURNS, battle_seed, create_policy, resolve_build, simulate_battle
+
+
+BENCH_SEED = 20240601
+RUN_STAGES = 20
+STACKED_SKILLS = 32
+LOG_HISTORY = 10000
+DEFAULT_THRESHOLD = 0.2
+MEMORY_ITERATIONS = 20
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+Operation = Callable[[], None]
+
+
+def single_battle() -> Operation:
+    inner_skill, outer_skills = resolve_build("taiji", ["shock", "combo", "consume_shock"])
+    indices = itertools.count()
+
+    def operation() -> None:
+        seed = battle_seed(BENCH_SEED, next(indices))
+        simulate_battle(inner_skill, outer_skills, 3, seed, create_policy("attack", seed), DEFAULT_MAX_TURNS)
+
+    return operation
+
+
+def twenty_stage_run() -> Operation:
+    inner_skills = create_inner_skills()
+    outer_pool = create_outer_pool()
+    indices = itertools.count()
+
+    def operation() -> None:
+        seed = battle_seed(BENCH_SEED, next(indices))
+        ctx = BattleContext(rng=random.Random(seed), quiet=True)
+        policy = create_policy("random", seed)
+        player = create_player(ctx.rng.choice(inner_skills))
+        for stage in range(1, RUN_STAGES + 1):
+            ctx.stage = stage
+            player.hp = player.max_hp
+            enemy = create_enemy(stage, ctx.rng)
+            battle(player, enemy, ctx, policy.choose_intent, DEFAULT_MAX_TURNS)
+            player.add_outer_skill(ctx.rng.choice(outer_pool))
+
+    return operation
+
+
+def build_battle(skill_ids: List[str], inner_skill_id: str, stage: int) -> Operation:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, skill_ids)
+    indices = itertools.count()
+
+    def operation() -> None:
+        seed = battle_seed(BENCH_SEED, next(indices))
+        simulate_battle(inner_skill, outer_skills, stage, seed, create_policy("random", seed), DEFAULT_MAX_TURNS)
+
+    return operation
+
+
+def stacked_build() -> Operation:
+    pool_ids = [skill.id for skill in create_outer_pool()]
+    return build_battle([pool_ids[index % len(pool_ids)] for index in range(STACKED_SKILLS)], "nine_sun", 10)
+
+
+def echo_chain() -> Operation:
+    skill_ids = ["shock"] * 4 + ["combo", "echo", "riposte"] * 8 + ["counter_shock"] * 2
+    return build_battle(skill_ids, "taiji", 10)
+
+
+def create_headless_ui():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import gui
+
+    pygame = gui.load_pygame()
+    pygame.init()
+    screen = pygame.display.set_mode((gui.SCREEN_WIDTH, gui.SCREEN_HEIGHT))
+    ui = gui.GameUI(screen)
+    ui.rng.seed(BENCH_SEED)
+    ui.start_game()
+    return ui
+
+
+def log_history(size: int) -> List[Event]:
+    ctx = BattleContext(rng=random.Random(BENCH_SEED), logs=create_event_log(None))
+    inner_skill, outer_skills = resolve_build("taiji", ["shock", "combo", "consume_shock", "echo"])
+    policy = create_policy("random", BENCH_SEED)
+    while len(ctx.logs) < size:
+        player = create_player(inner_skill)
+        player.outer_skills = list(outer_skills)
+        battle(player, create_enemy(3, ctx.rng), ctx, policy.choose_intent, DEFAULT_MAX_TURNS)
+    return list(ctx.logs)[:size]
+
+
+def log_lines() -> Operation:
+    ui = create_headless_ui()
+    history = log_history(LOG_HISTORY)
+
+    def operation() -> None:
+        ui.log_view.clear()
+        ui.log_view.pending.extend(history)
+        ui.build_log_lines()
+
+    return operation
+
+
+def gui_draw() -> Operation:
+    ui = create_headless_ui()
+    ui.handle_intent("1")
+
+    def operation() -> None:
+        ui.draw()
+
+    return operation
+
+
+SCENARIOS: Dict[str, Callable[[], Operation]] = {
+    "single_battle": single_battle,
+    "twenty_stage_run": twenty_stage_run,
+    "stacked_build": stacked_build,
+    "echo_chain": echo_chain,
+    "log_lines": log_lines,
+    "gui_draw": gui_draw,
+}
+
+ITERATIONS: Dict[str, int] = {
+    "single_battle": 2000,
+    "twenty_stage_run": 50,
+    "stacked_build": 300,
+    "echo_chain": 300,
+    "log_lines": 500,
+    "gui_draw": 500,
+}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def measure(operation: Operation, iterations: int) -> Dict[str, float]:
+    for _ in range(max(1, iterations // 10)):
+        operation()
+    samples: List[float] = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+
+    tracemalloc.start()
+    for _ in range(min(iterations, MEMORY_ITERATIONS)):
+        operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed,
+        "p50_ms": percentile(samples, 0.5) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_benchmarks(names: List[str], scale: float = 1.0) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    skipped: Dict[str, str] = {}
+    for name in names:
+        try:
+            operation = SCENARIOS[name]()
+        except ImportError as error:
+            skipped[name] = str(error)
+            continue
+        results[name] = measure(operation, max(1, int(ITERATIONS[name] * scale)))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scenarios": results,
+        "skipped": skipped,
+    }
+
+
+def compare(report: Dict[str, object], baseline: Dict[str, object], threshold: float) -> List[str]:
+    regressions: List[str] = []
+    for name, result in report["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        ratio = result["ops_per_sec"] / reference["ops_per_sec"]
+        result["baseline_ratio"] = ratio
+        if ratio < 1 - threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="战斗引擎与界面渲染基准测试")
+    parser.add_argument("scenarios", nargs="*", help=f"可选：{', '.join(SCENARIOS)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="迭代次数倍率")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="吞吐下降超过该比例视为退化")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果写为基线")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{', '.join(unknown)}")
+    names = args.scenarios or list(SCENARIOS)
+    report = run_benchmarks(names, args.scale)
+
+    baseline: Optional[Dict[str, object]] = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    regressions = compare(report, baseline, args.threshold) if baseline else []
+
+    for name, result in report["scenarios"].items():
+        line = (
+            f"{name:<18} {result['ops_per_sec']:>10.1f} 次/秒"
+            f" | p50 {result['p50_ms']:.3f} 毫秒 p99 {result['p99_ms']:.3f} 毫秒"
+            f" | 峰值内存 {result['peak_kib']:.0f} KiB"
+        )
+        if "baseline_ratio" in result:
+            line += f" | 基线 {result['baseline_ratio']:.2f}x"
+        print(line)
+    for name, reason in report["skipped"].items():
+        print(f"{name:<18} 跳过：{reason}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+        print(f"基线已写入 {args.baseline}")
+    if regressions:
+        print(f"性能退化（阈值 {args.threshold:.0%}）：{', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
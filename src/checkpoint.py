@@ -0,0 +1,531 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import struct
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+from codec import FormatError, read_optional, read_varint, write_optional, write_varint
+from roguelike import (
+    STATUS_IDS,
+    Actor,
+    BattleContext,
+    Event,
+    OuterSkill,
+    RunState,
+    console_sink,
+    create_outer_pool,
+    game_content,
+    log,
+    play_run,
+    start_run,
+)
+from simulate import DEFAULT_MAX_STAGES, DEFAULT_MAX_TURNS, POLICIES, create_policy, record_stages, summary_lines
+
+
+CHECKPOINT_MAGIC = b"WXCK"
+CHECKPOINT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+KIND_RUN = 0
+KIND_JOB = 1
+DEFAULT_SAVE_PATH = "save.wxck"
+DEFAULT_SAVE_INTERVAL = 30.0
+DOUBLE = struct.Struct("<d")
+MT_STATE = struct.Struct("<625I")
+
+
+class CheckpointError(FormatError):
+    pass
+
+
+@dataclass
+class RunCheckpoint:
+    state: RunState
+    rng_state: tuple
+    policy_rng_state: Optional[tuple] = None
+    logs: List[Event] = field(default_factory=list)
+
+
+@dataclass
+class JobCheckpoint:
+    seed: int
+    policy: str
+    max_stages: Optional[int]
+    max_turns: Optional[int]
+    completed: int = 0
+    stages_by_inner: Dict[str, Dict[int, int]] = field(default_factory=dict)
+    run: Optional[RunCheckpoint] = None
+
+
+Checkpoint = Union[RunCheckpoint, JobCheckpoint]
+
+
+def write_signed(buffer: bytearray, value: int) -> None:
+    write_varint(buffer, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def read_signed(data: bytes, offset: int) -> Tuple[int, int]:
+    value, offset = read_varint(data, offset)
+    return (value >> 1) ^ -(value & 1), offset
+
+
+def write_text(buffer: bytearray, text: str) -> None:
+    encoded = text.encode("utf-8")
+    write_varint(buffer, len(encoded))
+    buffer.extend(encoded)
+
+
+def read_text(data: bytes, offset: int) -> Tuple[str, int]:
+    length, offset = read_varint(data, offset)
+    if offset + length > len(data):
+        raise CheckpointError("检查点数据被截断")
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def read_double(data: bytes, offset: int) -> Tuple[float, int]:
+    return DOUBLE.unpack_from(data, offset)[0], offset + DOUBLE.size
+
+
+def write_rng(buffer: bytearray, state: tuple) -> None:
+    version, internal, gauss_next = state
+    write_varint(buffer, version)
+    buffer.extend(MT_STATE.pack(*internal))
+    if gauss_next is None:
+        buffer.append(0)
+    else:
+        buffer.append(1)
+        buffer.extend(DOUBLE.pack(gauss_next))
+
+
+def read_rng(data: bytes, offset: int) -> Tuple[tuple, int]:
+    version, offset = read_varint(data, offset)
+    internal = MT_STATE.unpack_from(data, offset)
+    offset += MT_STATE.size
+    gauss_next = None
+    if data[offset]:
+        gauss_next, offset = read_double(data, offset + 1)
+    else:
+        offset += 1
+    return (version, internal, gauss_next), offset
+
+
+def write_actor(buffer: bytearray, actor: Actor) -> None:
+    write_text(buffer, actor.name)
+    write_text(buffer, actor.behavior_profile)
+    for value in (actor.hp, actor.max_hp, actor.qi, actor.max_qi, actor.turns_without_attack):
+        write_signed(buffer, value)
+    buffer.extend(DOUBLE.pack(actor.attack_probability))
+    write_text(buffer, actor.inner_skill.id)
+    write_varint(buffer, len(actor.outer_skills))
+    for skill in actor.outer_skills:
+        write_text(buffer, skill.id)
+    write_varint(buffer, len(actor.status_stacks))
+    for stacks in actor.status_stacks:
+        write_signed(buffer, stacks)
+
+
+def read_actor(data: bytes, offset: int, outer_skills: Dict[str, OuterSkill]) -> Tuple[Actor, int]:
+    name, offset = read_text(data, offset)
+    behavior_profile, offset = read_text(data, offset)
+    values = []
+    for _ in range(5):
+        value, offset = read_signed(data, offset)
+        values.append(value)
+    attack_probability, offset = read_double(data, offset)
+    inner_id, offset = read_text(data, offset)
+    inner_skill = next((skill for skill in game_content().inner_skills if skill.id == inner_id), None)
+    if inner_skill is None:
+        raise CheckpointError(f"未知内功: {inner_id}")
+    count, offset = read_varint(data, offset)
+    skills = []
+    for _ in range(count):
+        skill_id, offset = read_text(data, offset)
+        if skill_id not in outer_skills:
+            raise CheckpointError(f"未知外功: {skill_id}")
+        skills.append(outer_skills[skill_id])
+    count, offset = read_varint(data, offset)
+    if count != len(STATUS_IDS):
+        raise CheckpointError(f"状态层数应有 {len(STATUS_IDS)} 项，检查点中为 {count} 项")
+    status_stacks = []
+    for _ in range(count):
+        stacks, offset = read_signed(data, offset)
+        status_stacks.append(stacks)
+    hp, max_hp, qi, max_qi, turns_without_attack = values
+    actor = Actor(
+        name=name,
+        hp=hp,
+        max_hp=max_hp,
+        qi=qi,
+        max_qi=max_qi,
+        inner_skill=inner_skill,
+        outer_skills=skills,
+        status_stacks=status_stacks,
+        turns_without_attack=turns_without_attack,
+        behavior_profile=behavior_profile,
+        attack_probability=attack_probability,
+    )
+    return actor, offset
+
+
+def write_logs(buffer: bytearray, logs: List[Event]) -> None:
+    strings: Dict[str, int] = {}
+    for event in logs:
+        for text in (event.kind, event.actor, event.target, event.status, event.skill):
+            strings.setdefault(text, len(strings))
+    write_varint(buffer, len(strings))
+    for text in strings:
+        write_text(buffer, text)
+    write_varint(buffer, len(logs))
+    for event in logs:
+        for text in (event.kind, event.actor, event.target):
+            write_varint(buffer, strings[text])
+        write_signed(buffer, event.amount)
+        write_varint(buffer, strings[event.status])
+        write_varint(buffer, strings[event.skill])
+        write_varint(buffer, len(event.extra))
+        for value in event.extra:
+            write_signed(buffer, value)
+
+
+def read_logs(data: bytes, offset: int) -> Tuple[List[Event], int]:
+    count, offset = read_varint(data, offset)
+    strings = []
+    for _ in range(count):
+        text, offset = read_text(data, offset)
+        strings.append(text)
+    count, offset = read_varint(data, offset)
+    logs = []
+    for _ in range(count):
+        indexes = []
+        for _ in range(3):
+            index, offset = read_varint(data, offset)
+            indexes.append(index)
+        amount, offset = read_signed(data, offset)
+        status, offset = read_varint(data, offset)
+        skill, offset = read_varint(data, offset)
+        size, offset = read_varint(data, offset)
+        extra = []
+        for _ in range(size):
+            value, offset = read_signed(data, offset)
+            extra.append(value)
+        kind, actor, target = (strings[index] for index in indexes)
+        logs.append(Event(kind, actor, target, amount, strings[status], strings[skill], tuple(extra)))
+    return logs, offset
+
+
+def write_run(buffer: bytearray, checkpoint: RunCheckpoint) -> None:
+    state = checkpoint.state
+    write_varint(buffer, state.stage)
+    write_varint(buffer, state.turn)
+    write_actor(buffer, state.player)
+    buffer.append(0 if state.enemy is None else 1)
+    if state.enemy is not None:
+        write_actor(buffer, state.enemy)
+    write_rng(buffer, checkpoint.rng_state)
+    buffer.append(0 if checkpoint.policy_rng_state is None else 1)
+    if checkpoint.policy_rng_state is not None:
+        write_rng(buffer, checkpoint.policy_rng_state)
+    write_logs(buffer, checkpoint.logs)
+
+
+def read_run(data: bytes, offset: int, outer_skills: Dict[str, OuterSkill]) -> Tuple[RunCheckpoint, int]:
+    stage, offset = read_varint(data, offset)
+    turn, offset = read_varint(data, offset)
+    player, offset = read_actor(data, offset, outer_skills)
+    enemy = None
+    if data[offset]:
+        enemy, offset = read_actor(data, offset + 1, outer_skills)
+    else:
+        offset += 1
+    rng_state, offset = read_rng(data, offset)
+    policy_rng_state = None
+    if data[offset]:
+        policy_rng_state, offset = read_rng(data, offset + 1)
+    else:
+        offset += 1
+    logs, offset = read_logs(data, offset)
+    return RunCheckpoint(RunState(player, enemy, stage, turn), rng_state, policy_rng_state, logs), offset
+
+
+def write_job(buffer: bytearray, checkpoint: JobCheckpoint) -> None:
+    write_signed(buffer, checkpoint.seed)
+    write_text(buffer, checkpoint.policy)
+    write_optional(buffer, checkpoint.max_stages)
+    write_optional(buffer, checkpoint.max_turns)
+    write_varint(buffer, checkpoint.completed)
+    write_varint(buffer, len(checkpoint.stages_by_inner))
+    for inner_skill, counts in checkpoint.stages_by_inner.items():
+        write_text(buffer, inner_skill)
+        write_varint(buffer, len(counts))
+        for stages, count in counts.items():
+            write_varint(buffer, stages)
+            write_varint(buffer, count)
+    buffer.append(0 if checkpoint.run is None else 1)
+    if checkpoint.run is not None:
+        write_run(buffer, checkpoint.run)
+
+
+def read_job(data: bytes, offset: int, outer_skills: Dict[str, OuterSkill]) -> Tuple[JobCheckpoint, int]:
+    seed, offset = read_signed(data, offset)
+    policy, offset = read_text(data, offset)
+    max_stages, offset = read_optional(data, offset)
+    max_turns, offset = read_optional(data, offset)
+    completed, offset = read_varint(data, offset)
+    count, offset = read_varint(data, offset)
+    stages_by_inner: Dict[str, Dict[int, int]] = {}
+    for _ in range(count):
+        inner_skill, offset = read_text(data, offset)
+        size, offset = read_varint(data, offset)
+        counts = stages_by_inner[inner_skill] = {}
+        for _ in range(size):
+            stages, offset = read_varint(data, offset)
+            count, offset = read_varint(data, offset)
+            counts[stages] = count
+    run = None
+    if data[offset]:
+        run, offset = read_run(data, offset + 1, outer_skills)
+    else:
+        offset += 1
+    return JobCheckpoint(seed, policy, max_stages, max_turns, completed, stages_by_inner, run), offset
+
+
+def encode_checkpoint(checkpoint: Checkpoint) -> bytes:
+    buffer = bytearray(CHECKPOINT_MAGIC)
+    if isinstance(checkpoint, RunCheckpoint):
+        buffer.extend((CHECKPOINT_VERSION, KIND_RUN))
+        write_run(buffer, checkpoint)
+    else:
+        buffer.extend((CHECKPOINT_VERSION, KIND_JOB))
+        write_job(buffer, checkpoint)
+    return bytes(buffer)
+
+
+def decode_checkpoint(data: bytes, outer_pool: Optional[List[OuterSkill]] = None) -> Checkpoint:
+    if data[:4] != CHECKPOINT_MAGIC or len(data) < 6:
+        raise CheckpointError("不是有效的检查点文件")
+    if data[4] not in SUPPORTED_VERSIONS:
+        raise CheckpointError(f"不支持的检查点版本: {data[4]}")
+    if data[4] < 2 and data[5] == KIND_JOB:
+        raise CheckpointError("旧版批量模拟检查点的策略种子与当前版本不同，无法续跑")
+    outer_skills = {skill.id: skill for skill in (outer_pool if outer_pool is not None else game_content().outer_skills)}
+    try:
+        if data[5] == KIND_RUN:
+            checkpoint, offset = read_run(data, 6, outer_skills)
+        elif data[5] == KIND_JOB:
+            checkpoint, offset = read_job(data, 6, outer_skills)
+        else:
+            raise CheckpointError(f"未知的检查点类型: {data[5]}")
+    except CheckpointError:
+        raise
+    except (FormatError, struct.error, IndexError, UnicodeDecodeError) as error:
+        raise CheckpointError("检查点数据被截断或已损坏") from error
+    if offset != len(data):
+        raise CheckpointError("检查点末尾有多余数据")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint) -> None:
+    data = encode_checkpoint(checkpoint)
+    directory, name = os.path.split(os.path.abspath(path))
+    handle = tempfile.NamedTemporaryFile(dir=directory, prefix=f"{name}.", suffix=".tmp", delete=False)
+    try:
+        with handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(handle.name, path)
+    except BaseException:
+        os.remove(handle.name)
+        raise
+
+
+def load_checkpoint(path: str, outer_pool: Optional[List[OuterSkill]] = None) -> Checkpoint:
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError as error:
+        raise CheckpointError(f"无法读取检查点 {path}: {error.strerror}") from error
+    return decode_checkpoint(data, outer_pool)
+
+
+def capture_run(state: RunState, ctx: BattleContext, policy: object = None, include_logs: bool = False) -> RunCheckpoint:
+    policy_rng = getattr(policy, "rng", None)
+    return RunCheckpoint(
+        state=state,
+        rng_state=ctx.rng.getstate(),
+        policy_rng_state=policy_rng.getstate() if policy_rng is not None else None,
+        logs=list(ctx.logs) if include_logs else [],
+    )
+
+
+def restore_run(checkpoint: RunCheckpoint, ctx: BattleContext, policy: object = None) -> RunState:
+    ctx.rng.setstate(checkpoint.rng_state)
+    policy_rng = getattr(policy, "rng", None)
+    if checkpoint.policy_rng_state is not None and policy_rng is not None:
+        policy_rng.setstate(checkpoint.policy_rng_state)
+    ctx.stage = checkpoint.state.stage
+    ctx.logs.extend(checkpoint.logs)
+    return checkpoint.state
+
+
+class Checkpointer:
+    def __init__(
+        self,
+        path: str,
+        interval: float = DEFAULT_SAVE_INTERVAL,
+        policy: object = None,
+        job: Optional[JobCheckpoint] = None,
+        include_logs: bool = False,
+    ) -> None:
+        self.path = path
+        self.interval = interval
+        self.policy = policy
+        self.job = job
+        self.include_logs = include_logs
+        self.last_saved = time.monotonic()
+        self.saves = 0
+
+    def due(self) -> bool:
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def __call__(self, state: RunState, ctx: BattleContext) -> None:
+        if self.due():
+            self.save(capture_run(state, ctx, self.policy, self.include_logs))
+
+    def save(self, run: Optional[RunCheckpoint]) -> None:
+        checkpoint: Optional[Checkpoint] = run
+        if self.job is not None:
+            self.job.run = run
+            checkpoint = self.job
+        save_checkpoint(self.path, checkpoint)
+        self.last_saved = time.monotonic()
+        self.saves += 1
+
+
+def play_saved_game(path: str, seed: Optional[int] = None, interval: float = 0.0) -> None:
+    ctx = BattleContext(rng=random.Random(seed), sinks=[console_sink])
+    outer_pool = create_outer_pool()
+    if os.path.exists(path):
+        checkpoint = load_checkpoint(path, outer_pool)
+        if not isinstance(checkpoint, RunCheckpoint):
+            raise CheckpointError(f"{path} 是批量模拟的检查点，不是存档")
+        state = restore_run(checkpoint, ctx)
+        print(f"从 {path} 继续：第 {state.stage} 关，生命 {state.player.hp}/{state.player.max_hp}")
+    else:
+        state = start_run(ctx)
+    play_run(ctx, outer_pool, state=state, checkpoint=Checkpointer(path, interval))
+    log(ctx, "run_over")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def run_job(
+    path: str,
+    runs: int,
+    seed: int = 0,
+    policy_name: str = "random",
+    max_stages: Optional[int] = DEFAULT_MAX_STAGES,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    interval: float = DEFAULT_SAVE_INTERVAL,
+) -> JobCheckpoint:
+    outer_pool = create_outer_pool()
+    job = JobCheckpoint(seed, policy_name, max_stages, max_turns)
+    if os.path.exists(path):
+        saved = load_checkpoint(path, outer_pool)
+        if not isinstance(saved, JobCheckpoint):
+            raise CheckpointError(f"{path} 是游戏存档，不是批量模拟的检查点")
+        if (saved.seed, saved.policy, saved.max_stages, saved.max_turns) != (seed, policy_name, max_stages, max_turns):
+            raise CheckpointError(f"{path} 的模拟参数与本次不一致，无法续跑")
+        job = saved
+    checkpointer = Checkpointer(path, interval, job=job)
+    while job.completed < runs:
+        run_seed = seed + job.completed
+        policy = create_policy(policy_name, run_seed)
+        ctx = BattleContext(rng=random.Random(run_seed), quiet=True)
+        state = restore_run(job.run, ctx, policy) if job.run is not None else None
+        checkpointer.policy = policy
+        player, stages_cleared = play_run(
+            ctx,
+            outer_pool,
+            policy.choose_intent,
+            policy.choose_reward,
+            max_stages,
+            max_turns,
+            state=state,
+            checkpoint=checkpointer,
+        )
+        job.run = None
+        record_stages(job.stages_by_inner, player.inner_skill.id, stages_cleared)
+        job.completed += 1
+        if checkpointer.due():
+            checkpointer.save(None)
+    checkpointer.save(None)
+    return job
+
+
+def describe_checkpoint(checkpoint: Checkpoint) -> List[str]:
+    lines = []
+    run = checkpoint
+    if isinstance(checkpoint, JobCheckpoint):
+        lines.append(
+            f"批量模拟：种子 {checkpoint.seed}，策略 {checkpoint.policy}，已完成 {checkpoint.completed} 局"
+        )
+        run = checkpoint.run
+    if run is not None:
+        state = run.state
+        player = state.player
+        lines.append(f"关卡 {state.stage} 回合 {state.turn}：{player.name} 生命 {player.hp}/{player.max_hp}，内功 {player.inner_skill.id}")
+        lines.append(f"外功：{[skill.id for skill in player.outer_skills]}，日志 {len(run.logs)} 条")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="可存档续玩的文字版游戏与检查点查看")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play = commands.add_parser("play", help="开始或继续一局存档游戏")
+    play.add_argument("save", nargs="?", default=DEFAULT_SAVE_PATH)
+    play.add_argument("--seed", type=int, default=None)
+    play.add_argument("--interval", type=float, default=0.0, help="两次存档之间的最短间隔（秒），0 表示每关都存")
+    simulate = commands.add_parser("simulate", help="可中断续跑的批量模拟")
+    simulate.add_argument("checkpoint")
+    simulate.add_argument("--runs", type=int, default=10000)
+    simulate.add_argument("--seed", type=int, default=0)
+    simulate.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    simulate.add_argument("--max-stages", type=int, default=DEFAULT_MAX_STAGES)
+    simulate.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    simulate.add_argument("--interval", type=float, default=DEFAULT_SAVE_INTERVAL, help="两次写检查点之间的最短间隔（秒）")
+    inspect = commands.add_parser("inspect", help="查看检查点内容与载入耗时")
+    inspect.add_argument("checkpoint")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "play":
+            try:
+                play_saved_game(args.save, args.seed, args.interval)
+            except (KeyboardInterrupt, EOFError):
+                print(f"\n已中断，进度保存在 {args.save}，下次运行同一命令即可继续。")
+            return
+        if args.command == "simulate":
+            started = time.perf_counter()
+            job = run_job(args.checkpoint, args.runs, args.seed, args.policy, args.max_stages, args.max_turns, args.interval)
+            elapsed = time.perf_counter() - started
+            print(f"已完成 {job.completed} 局，本次用时 {elapsed:.2f} 秒，检查点 {args.checkpoint}")
+            for line in summary_lines(job.stages_by_inner):
+                print(line)
+            return
+        started = time.perf_counter()
+        checkpoint = load_checkpoint(args.checkpoint)
+        elapsed = time.perf_counter() - started
+    except CheckpointError as error:
+        parser.error(str(error))
+    print(f"载入 {os.path.getsize(args.checkpoint)} 字节用时 {elapsed * 1000:.2f} 毫秒")
+    for line in describe_checkpoint(checkpoint):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
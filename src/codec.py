@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+
+class FormatError(ValueError):
+    pass
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    if value < 0:
+        raise FormatError(f"varint 不能为负数: {value}")
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise FormatError("数据被截断")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def write_optional(buffer: bytearray, value: Optional[int]) -> None:
+    write_varint(buffer, 0 if value is None else value + 1)
+
+
+def read_optional(data: bytes, offset: int) -> Tuple[Optional[int], int]:
+    value, offset = read_varint(data, offset)
+    return (None if value == 0 else value - 1), offset
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from roguelike import DEFAULT_BALANCE, Balance, InnerSkill, OuterSkill
+from simulate import DEFAULT_MAX_TURNS, POLICIES, battle_seed, create_policy, resolve_build, simulate_battle
+
+
+CHUNK_SIZE = 2000
+Z_95 = 1.96
+
+
+@dataclass
+class BuildStats:
+    battles: int = 0
+    wins: int = 0
+    turns_to_kill: Dict[int, int] = field(default_factory=dict)
+    damage_dealt: Dict[int, int] = field(default_factory=dict)
+    damage_taken: Dict[int, int] = field(default_factory=dict)
+
+    def merge(self, other: BuildStats) -> None:
+        self.battles += other.battles
+        self.wins += other.wins
+        for mine, theirs in (
+            (self.turns_to_kill, other.turns_to_kill),
+            (self.damage_dealt, other.damage_dealt),
+            (self.damage_taken, other.damage_taken),
+        ):
+            for value, count in theirs.items():
+                mine[value] = mine.get(value, 0) + count
+
+
+@dataclass
+class Distribution:
+    count: int
+    mean: float
+    ci_low: float
+    ci_high: float
+    p50: int
+    p90: int
+    p99: int
+
+
+@dataclass
+class BuildReport:
+    inner_skill: str
+    outer_skills: List[str]
+    stage: int
+    battles: int
+    win_rate: float
+    win_rate_ci: Tuple[float, float]
+    turns_to_kill: Optional[Distribution]
+    damage_dealt: Optional[Distribution]
+    damage_taken: Optional[Distribution]
+
+
+def count_value(histogram: Dict[int, int], value: int) -> None:
+    histogram[value] = histogram.get(value, 0) + 1
+
+
+def evaluate_chunk(
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int,
+    policy_name: str,
+    master_seed: int,
+    start: int,
+    stop: int,
+    max_turns: Optional[int],
+) -> BuildStats:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, outer_skill_ids)
+    return run_battles(inner_skill, outer_skills, stage, policy_name, master_seed, start, stop, max_turns)
+
+
+def run_battles(
+    inner_skill: InnerSkill,
+    outer_skills: List[OuterSkill],
+    stage: int,
+    policy_name: str,
+    master_seed: int,
+    start: int,
+    stop: int,
+    max_turns: Optional[int],
+    balance: Balance = DEFAULT_BALANCE,
+) -> BuildStats:
+    stats = BuildStats()
+    for index in range(start, stop):
+        seed = battle_seed(master_seed, index)
+        result = simulate_battle(
+            inner_skill, outer_skills, stage, seed, create_policy(policy_name, seed), max_turns, balance=balance
+        )
+        stats.battles += 1
+        if result.win:
+            stats.wins += 1
+            count_value(stats.turns_to_kill, result.turns)
+        count_value(stats.damage_dealt, result.damage_dealt)
+        count_value(stats.damage_taken, result.damage_taken)
+    return stats
+
+
+def wilson_interval(successes: int, total: int) -> Tuple[float, float]:
+    if total == 0:
+        return 0.0, 0.0
+    rate = successes / total
+    denominator = 1 + Z_95 ** 2 / total
+    center = (rate + Z_95 ** 2 / (2 * total)) / denominator
+    margin = Z_95 * math.sqrt(rate * (1 - rate) / total + Z_95 ** 2 / (4 * total ** 2)) / denominator
+    return center - margin, center + margin
+
+
+def percentile(histogram: Dict[int, int], count: int, fraction: float) -> int:
+    threshold = fraction * count
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= threshold:
+            return value
+    return max(histogram)
+
+
+def summarize(histogram: Dict[int, int]) -> Optional[Distribution]:
+    count = sum(histogram.values())
+    if count == 0:
+        return None
+    mean = sum(value * times for value, times in histogram.items()) / count
+    variance = sum(times * (value - mean) ** 2 for value, times in histogram.items()) / max(1, count - 1)
+    margin = Z_95 * math.sqrt(variance / count)
+    return Distribution(
+        count=count,
+        mean=mean,
+        ci_low=mean - margin,
+        ci_high=mean + margin,
+        p50=percentile(histogram, count, 0.5),
+        p90=percentile(histogram, count, 0.9),
+        p99=percentile(histogram, count, 0.99),
+    )
+
+
+def evaluate_build(
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    battles: int,
+    seed: int = 0,
+    stage: int = 1,
+    policy_name: str = "attack",
+    workers: Optional[int] = None,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+) -> BuildReport:
+    resolve_build(inner_skill_id, outer_skill_ids)
+    tasks = [
+        (inner_skill_id, outer_skill_ids, stage, policy_name, seed, start, min(battles, start + CHUNK_SIZE), max_turns)
+        for start in range(0, battles, CHUNK_SIZE)
+    ]
+    stats = BuildStats()
+    if workers == 1:
+        for task in tasks:
+            stats.merge(evaluate_chunk(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(evaluate_chunk, *zip(*tasks)):
+                stats.merge(chunk)
+    return BuildReport(
+        inner_skill=inner_skill_id,
+        outer_skills=list(outer_skill_ids),
+        stage=stage,
+        battles=stats.battles,
+        win_rate=stats.wins / stats.battles if stats.battles else 0.0,
+        win_rate_ci=wilson_interval(stats.wins, stats.battles),
+        turns_to_kill=summarize(stats.turns_to_kill),
+        damage_dealt=summarize(stats.damage_dealt),
+        damage_taken=summarize(stats.damage_taken),
+    )
+
+
+def format_distribution(label: str, distribution: Optional[Distribution]) -> str:
+    if distribution is None:
+        return f"{label}: 无数据"
+    return (
+        f"{label}: 均值 {distribution.mean:.2f} [{distribution.ci_low:.2f}, {distribution.ci_high:.2f}]"
+        f" | p50 {distribution.p50} p90 {distribution.p90} p99 {distribution.p99}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多进程蒙特卡洛评估构筑强度")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument("--battles", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="attack")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        resolve_build(args.inner_skill, args.outer_skills)
+    except KeyError as error:
+        parser.error(f"未知的内功或外功: {error.args[0]}")
+    started = time.perf_counter()
+    report = evaluate_build(
+        args.inner_skill,
+        args.outer_skills,
+        args.battles,
+        seed=args.seed,
+        stage=args.stage,
+        policy_name=args.policy,
+        workers=args.workers,
+    )
+    elapsed = time.perf_counter() - started
+
+    low, high = report.win_rate_ci
+    print(f"构筑：{report.inner_skill} + {report.outer_skills or '无外功'} | 关卡 {report.stage}")
+    print(f"战斗 {report.battles} 场，用时 {elapsed:.2f} 秒")
+    print(f"胜率: {report.win_rate:.4f} [{low:.4f}, {high:.4f}]")
+    print(format_distribution("击杀回合", report.turns_to_kill))
+    print(format_distribution("造成伤害", report.damage_dealt))
+    print(format_distribution("承受伤害", report.damage_taken))
+
+
+if __name__ == "__main__":
+    main()
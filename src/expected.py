@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from advisor import DEFAULT_ADVISOR_BATTLES, RewardAdvisor
+from roguelike import (
+    BASE_CRIT_CHANCE,
+    BASE_DAMAGE,
+    CRIT_FOCUS,
+    DOUBLE_STRIKE,
+    SHIELD_QI,
+    SHOCK,
+    STATUS_IDS,
+    STATUS_INDEX,
+    VULNERABLE,
+    Actor,
+    InnerSkill,
+    OuterSkill,
+    TriggerType,
+    build_enemy,
+    create_outer_pool,
+    create_player,
+    enemy_profiles,
+    game_content,
+    trigger_chance_bonus,
+)
+from simulate import resolve_build
+
+
+HP_BUCKETS = 4
+STACK_CAP = 4
+TURN_STAGES = ("onTurnStart",)
+ATTACK_STAGES = ("attack", "onAttack", "onHit", "onCrit")
+DEFEND_STAGES = ("defend", "onDefense")
+STAGE_LABELS = {
+    "onTurnStart": "回合开始",
+    "attack": "出招【进】",
+    "onAttack": "出手时",
+    "onHit": "命中后",
+    "onCrit": "暴击后",
+    "defend": "防御【守】",
+    "onDefense": "防御时",
+}
+
+BuildKey = Tuple[str, Tuple[str, ...]]
+
+
+class StatusBucket(NamedTuple):
+    qi: int
+    target_qi: int
+    own: Tuple[int, ...]
+    target: Tuple[int, ...]
+
+
+TableKey = Tuple[BuildKey, int, StatusBucket]
+
+
+class Situation(NamedTuple):
+    hp: int
+    qi: int
+    target_qi: int
+    target: Tuple[int, ...]
+    last_damage: Optional[int] = None
+    crit: bool = False
+
+
+Distribution = Dict[Situation, float]
+
+
+def empty_deltas() -> List[float]:
+    return [0.0] * len(STATUS_IDS)
+
+
+@dataclass
+class Expectation:
+    damage: float = 0.0
+    qi: float = 0.0
+    target_qi: float = 0.0
+    healing: float = 0.0
+    own_statuses: List[float] = field(default_factory=empty_deltas)
+    target_statuses: List[float] = field(default_factory=empty_deltas)
+
+    def add(self, other: Expectation, weight: float = 1.0) -> None:
+        self.damage += other.damage * weight
+        self.qi += other.qi * weight
+        self.target_qi += other.target_qi * weight
+        self.healing += other.healing * weight
+        for index in range(len(STATUS_IDS)):
+            self.own_statuses[index] += other.own_statuses[index] * weight
+            self.target_statuses[index] += other.target_statuses[index] * weight
+
+
+@dataclass
+class TurnExpectation:
+    stages: Dict[str, Expectation]
+    crit_chance: float
+    start_damage: float = field(init=False)
+    attack_damage: float = field(init=False)
+    defend_damage: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.start_damage = sum(self.stages[stage].damage for stage in TURN_STAGES)
+        self.attack_damage = sum(self.stages[stage].damage for stage in ATTACK_STAGES)
+        self.defend_damage = sum(self.stages[stage].damage for stage in DEFEND_STAGES)
+
+    def damage_per_turn(self, attack_share: float = 1.0) -> float:
+        return self.start_damage + attack_share * self.attack_damage + (1 - attack_share) * self.defend_damage
+
+    def per_turn(self, attack_share: float = 1.0) -> Expectation:
+        total = Expectation()
+        for stages, weight in ((TURN_STAGES, 1.0), (ATTACK_STAGES, attack_share), (DEFEND_STAGES, 1 - attack_share)):
+            for stage in stages:
+                total.add(self.stages[stage], weight)
+        return total
+
+
+def capped(stacks: Iterable[int]) -> Tuple[int, ...]:
+    return tuple(min(stack, STACK_CAP) for stack in stacks)
+
+
+def hp_bucket(actor: Actor) -> int:
+    bucket = -(-actor.hp * HP_BUCKETS // actor.max_hp) - 1
+    return min(HP_BUCKETS - 1, max(0, bucket))
+
+
+def status_bucket(actor: Actor, target: Actor) -> StatusBucket:
+    return StatusBucket(actor.qi, target.qi, capped(actor.status_stacks), capped(target.status_stacks))
+
+
+def opening_bucket() -> StatusBucket:
+    inner_skill = game_content().inner_skills[0]
+    return status_bucket(create_player(inner_skill), build_enemy(enemy_profiles(1)[0], inner_skill))
+
+
+def representative_player(inner_skill: InnerSkill, hp_bucket_index: int, bucket: StatusBucket) -> Actor:
+    player = create_player(inner_skill)
+    player.hp = -(-(2 * hp_bucket_index + 1) * player.max_hp // (2 * HP_BUCKETS))
+    player.qi = bucket.qi
+    player.status_stacks = list(bucket.own)
+    return player
+
+
+def accumulate(distribution: Distribution, situation: Situation, weight: float) -> None:
+    distribution[situation] = distribution.get(situation, 0.0) + weight
+
+
+class TurnModel:
+    def __init__(self, inner_skill: InnerSkill, outer_skills: List[OuterSkill], hp_bucket_index: int, bucket: StatusBucket) -> None:
+        self.player = representative_player(inner_skill, hp_bucket_index, bucket)
+        self.hooks = inner_skill.hooks
+        self.bucket = bucket
+        self.bonuses: Dict[int, float] = {}
+        self.triggers: Dict[TriggerType, List[OuterSkill]] = {}
+        for skill in outer_skills:
+            self.triggers.setdefault(skill.trigger, []).append(skill)
+
+    def bonus(self, hp: int) -> float:
+        bonus = self.bonuses.get(hp)
+        if bonus is None:
+            self.player.hp = hp
+            bonus = self.bonuses[hp] = trigger_chance_bonus(self.player)
+        return bonus
+
+    def gain_qi(self, qi: int, amount: int, weight: float, expectation: Expectation) -> int:
+        if amount <= 0:
+            return qi
+        gained = min(self.player.max_qi, qi + amount)
+        overflow = qi + amount - gained
+        if overflow > 0:
+            for effect in self.hooks.get("onQiOverflow", []):
+                if effect["type"] == "addStatus":
+                    expectation.own_statuses[STATUS_INDEX[str(effect["status"])]] += weight * overflow
+        expectation.qi += weight * (gained - qi)
+        return gained
+
+    def apply_damage(self, stacks: List[int], amount: int, true_damage: bool, weight: float, expectation: Expectation) -> None:
+        if amount <= 0:
+            return
+        damage = amount
+        if not true_damage:
+            damage += max(0, stacks[VULNERABLE])
+            absorbed = min(max(0, stacks[SHIELD_QI]), damage)
+            if absorbed > 0:
+                stacks[SHIELD_QI] -= absorbed
+                expectation.target_statuses[SHIELD_QI] -= weight * absorbed
+                damage -= absorbed
+        expectation.damage += weight * damage
+
+    def apply_effect(self, effect: Dict[str, object], state: Situation, weight: float, expectation: Expectation) -> Situation:
+        effect_type = effect["type"]
+        hp = state.hp
+        qi = state.qi
+        stacks = list(state.target)
+        if effect_type == "addStatus":
+            index = STATUS_INDEX[str(effect["status"])]
+            stacks[index] += int(effect["amount"])
+            expectation.target_statuses[index] += weight * int(effect["amount"])
+        elif effect_type == "dealDamage":
+            if effect.get("requires") != "qi" or qi > 0:
+                self.apply_damage(stacks, int(effect["amount"]), bool(effect.get("true", False)), weight, expectation)
+        elif effect_type == "gainQi":
+            qi = self.gain_qi(qi, int(effect["amount"]), weight, expectation)
+        elif effect_type == "consumeStatus":
+            index = STATUS_INDEX[str(effect["status"])]
+            consumed = stacks[index]
+            if consumed > 0:
+                stacks[index] = 0
+                expectation.target_statuses[index] -= weight * consumed
+                self.apply_damage(stacks, consumed * int(effect["perStackDamage"]), True, weight, expectation)
+        elif effect_type == "repeatLastAction":
+            if state.last_damage is not None and (effect.get("requires") != "shock" or stacks[SHOCK] > 0):
+                self.apply_damage(stacks, int(state.last_damage * float(effect["multiplier"])), False, weight, expectation)
+        elif effect_type == "heal":
+            if int(effect["amount"]) > 0:
+                hp = min(self.player.max_hp, hp + int(effect["amount"]))
+                expectation.healing += weight * (hp - state.hp)
+        return state._replace(hp=hp, qi=qi, target=tuple(stacks))
+
+    def resolve(self, distribution: Distribution, trigger: TriggerType, expectation: Expectation) -> Distribution:
+        for skill in self.triggers.get(trigger, []):
+            resolved: Distribution = {}
+            for state, weight in distribution.items():
+                if trigger == "onCrit" and not state.crit:
+                    accumulate(resolved, state, weight)
+                    continue
+                chance = min(1.0, skill.chance * (1 + self.bonus(state.hp)))
+                if chance < 1.0:
+                    accumulate(resolved, state, weight * (1 - chance))
+                if chance > 0.0:
+                    accumulate(resolved, self.apply_effect(skill.effect, state, weight * chance, expectation), weight * chance)
+            distribution = resolved
+        return distribution
+
+    def turn_start(self, expectation: Expectation) -> Distribution:
+        bucket = self.bucket
+        state = Situation(self.player.hp, bucket.qi, bucket.target_qi, bucket.target)
+        for effect in self.hooks.get("onTurnStart", []):
+            state = self.apply_effect(effect, state, 1.0, expectation)
+        return self.resolve({state: 1.0}, "onTurnStart", expectation)
+
+    def steal_qi(self, qi: int, target_qi: int, weight: float, expectation: Expectation) -> Tuple[int, int]:
+        for effect in self.hooks.get("onHit", []):
+            if effect["type"] == "stealQi":
+                amount = int(effect["amount"])
+                if qi < self.player.max_qi * 0.3:
+                    amount *= 2
+                stolen = min(target_qi, amount)
+                target_qi -= stolen
+                expectation.target_qi -= weight * stolen
+                qi = self.gain_qi(qi, stolen, weight, expectation)
+        return qi, target_qi
+
+    def attack(self, distribution: Distribution, stages: Dict[str, Expectation]) -> Distribution:
+        hit = stages["attack"]
+        own = self.bucket.own
+        crit_chance = BASE_CRIT_CHANCE + (0.05 if own[CRIT_FOCUS] > 0 else 0)
+        multiplier = 2 if own[DOUBLE_STRIKE] > 0 else 1
+        hit.own_statuses[DOUBLE_STRIKE] -= own[DOUBLE_STRIKE]
+        paid: Distribution = {}
+        for state, weight in distribution.items():
+            if state.qi > 0:
+                hit.qi -= weight
+                state = state._replace(qi=state.qi - 1)
+            accumulate(paid, state, weight)
+        distribution = self.resolve(paid, "onAttack", stages["onAttack"])
+        landed: Distribution = {}
+        for state, weight in distribution.items():
+            for crit, chance in ((True, crit_chance), (False, 1 - crit_chance)):
+                if chance <= 0:
+                    continue
+                damage = BASE_DAMAGE * (2 if crit else 1) * multiplier
+                stacks = list(state.target)
+                self.apply_damage(stacks, damage, False, weight * chance, hit)
+                qi, target_qi = self.steal_qi(state.qi, state.target_qi, weight * chance, hit)
+                accumulate(landed, Situation(state.hp, qi, target_qi, tuple(stacks), damage, crit), weight * chance)
+        distribution = self.resolve(landed, "onHit", stages["onHit"])
+        return self.resolve(distribution, "onCrit", stages["onCrit"])
+
+    def defend(self, distribution: Distribution, stages: Dict[str, Expectation]) -> Distribution:
+        guard = stages["defend"]
+        rested: Distribution = {}
+        for state, weight in distribution.items():
+            accumulate(rested, state._replace(qi=self.gain_qi(state.qi, 1, weight, guard)), weight)
+        for effect in self.hooks.get("onDefense", []):
+            if effect["type"] == "addStatus":
+                guard.own_statuses[STATUS_INDEX[str(effect["status"])]] += int(effect["amount"])
+        return self.resolve(rested, "onDefense", stages["onDefense"])
+
+
+def evaluate_turn(
+    inner_skill: InnerSkill,
+    outer_skills: List[OuterSkill],
+    hp_bucket_index: int,
+    bucket: StatusBucket,
+) -> TurnExpectation:
+    model = TurnModel(inner_skill, outer_skills, hp_bucket_index, bucket)
+    stages = {stage: Expectation() for stage in TURN_STAGES + ATTACK_STAGES + DEFEND_STAGES}
+    started = model.turn_start(stages["onTurnStart"])
+    model.attack(started, stages)
+    model.defend(started, stages)
+    crit_chance = BASE_CRIT_CHANCE + (0.05 if bucket.own[CRIT_FOCUS] > 0 else 0)
+    return TurnExpectation(stages, crit_chance)
+
+
+class ExpectationTable:
+    def __init__(self) -> None:
+        self.entries: Dict[TableKey, TurnExpectation] = {}
+        self.builds: Dict[BuildKey, Tuple[InnerSkill, List[OuterSkill]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, build: BuildKey) -> Tuple[InnerSkill, List[OuterSkill]]:
+        resolved = self.builds.get(build)
+        if resolved is None:
+            resolved = self.builds[build] = resolve_build(build[0], list(build[1]))
+        return resolved
+
+    def lookup(self, inner_skill_id: str, outer_skill_ids: Iterable[str], hp_bucket_index: int, bucket: StatusBucket) -> TurnExpectation:
+        key = ((inner_skill_id, tuple(outer_skill_ids)), hp_bucket_index, bucket)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        inner_skill, outer_skills = self.resolve(key[0])
+        entry = self.entries[key] = evaluate_turn(inner_skill, outer_skills, hp_bucket_index, bucket)
+        return entry
+
+    def precompute(self, builds: Iterable[BuildKey], buckets: Iterable[StatusBucket], hp_buckets: Iterable[int] = range(HP_BUCKETS)) -> None:
+        buckets = list(buckets)
+        hp_buckets = list(hp_buckets)
+        for inner_skill_id, outer_skill_ids in builds:
+            for hp_bucket_index in hp_buckets:
+                for bucket in buckets:
+                    self.lookup(inner_skill_id, outer_skill_ids, hp_bucket_index, bucket)
+
+    def screen(
+        self,
+        inner_skill_id: str,
+        candidates: Iterable[Tuple[str, ...]],
+        hp_bucket_index: int,
+        bucket: StatusBucket,
+        attack_share: float = 1.0,
+    ) -> List[Tuple[Tuple[str, ...], float]]:
+        scored = [
+            (outer_skill_ids, self.lookup(inner_skill_id, outer_skill_ids, hp_bucket_index, bucket).damage_per_turn(attack_share))
+            for outer_skill_ids in candidates
+        ]
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+
+def format_expectation(label: str, expectation: Expectation) -> str:
+    parts = [f"伤害 {expectation.damage:.3f}", f"气 {expectation.qi:+.3f}"]
+    if expectation.target_qi:
+        parts.append(f"对手气 {expectation.target_qi:+.3f}")
+    if expectation.healing:
+        parts.append(f"回复 {expectation.healing:.3f}")
+    for owner, deltas in (("自身", expectation.own_statuses), ("对手", expectation.target_statuses)):
+        for index, delta in enumerate(deltas):
+            if abs(delta) > 1e-12:
+                parts.append(f"{owner}{STATUS_IDS[index]} {delta:+.3f}")
+    return f"{label}: {'，'.join(parts)}"
+
+
+def parse_statuses(texts: List[str]) -> Tuple[int, ...]:
+    stacks = [0] * len(STATUS_IDS)
+    for text in texts:
+        name, _, value = text.partition("=")
+        if name not in STATUS_INDEX:
+            raise ValueError(f"未知状态 {name}，可选：{', '.join(STATUS_IDS)}")
+        stacks[STATUS_INDEX[name]] = int(value or 1)
+    return capped(stacks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="解析计算构筑每回合的期望收益，快速筛选外功")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument("--candidates", nargs="*", default=None, help="候选外功 id，默认整个外功池")
+    parser.add_argument("--hp-bucket", type=int, default=HP_BUCKETS - 1, help=f"生命分桶 0..{HP_BUCKETS - 1}，按最大生命四等分")
+    parser.add_argument("--qi", type=int, default=None)
+    parser.add_argument("--target-qi", type=int, default=None)
+    parser.add_argument("--status", action="append", default=[], help="自身状态 名称=层数，可重复")
+    parser.add_argument("--target-status", action="append", default=[], help="对手状态 名称=层数，可重复")
+    parser.add_argument("--attack-share", type=float, default=1.0, help="选择【进】的回合比例，其余按【守】计")
+    parser.add_argument("--sample", type=int, default=0, help="对前若干名候选再做抽样评估")
+    parser.add_argument("--battles", type=int, default=DEFAULT_ADVISOR_BATTLES)
+    parser.add_argument("--stage", type=int, default=2)
+    args = parser.parse_args()
+
+    try:
+        resolve_build(args.inner_skill, args.outer_skills)
+        candidates = args.candidates if args.candidates is not None else [skill.id for skill in create_outer_pool()]
+        resolve_build(args.inner_skill, candidates)
+        opening = opening_bucket()
+        bucket = StatusBucket(
+            opening.qi if args.qi is None else args.qi,
+            opening.target_qi if args.target_qi is None else args.target_qi,
+            parse_statuses(args.status),
+            parse_statuses(args.target_status),
+        )
+    except KeyError as error:
+        parser.error(f"未知的内功或外功: {error.args[0]}")
+    except ValueError as error:
+        parser.error(str(error))
+    if not 0 <= args.hp_bucket < HP_BUCKETS:
+        parser.error(f"--hp-bucket 须在 0..{HP_BUCKETS - 1} 之间")
+    if not 0.0 <= args.attack_share <= 1.0:
+        parser.error("--attack-share 须在 0 到 1 之间")
+
+    table = ExpectationTable()
+    current = table.lookup(args.inner_skill, args.outer_skills, args.hp_bucket, bucket)
+    print(f"当前构筑每回合期望伤害 {current.damage_per_turn(args.attack_share):.3f}")
+    for stage, expectation in current.stages.items():
+        print("  " + format_expectation(STAGE_LABELS[stage], expectation))
+
+    builds = [tuple(args.outer_skills) + (candidate,) for candidate in candidates]
+    for attempt in ("建表", "查表"):
+        started = time.perf_counter()
+        ranking = table.screen(args.inner_skill, builds, args.hp_bucket, bucket, args.attack_share)
+        elapsed = time.perf_counter() - started
+        print(f"{attempt}筛选 {len(builds)} 个候选用时 {elapsed * 1e6:.0f} 微秒（每个 {elapsed * 1e6 / len(builds):.1f} 微秒）")
+    baseline = current.damage_per_turn(args.attack_share)
+    for outer_skill_ids, damage in ranking:
+        print(f"{outer_skill_ids[-1]}: 每回合期望伤害 {damage:.3f}（{damage - baseline:+.3f}）")
+
+    if args.sample:
+        advisor = RewardAdvisor(battles=args.battles)
+        print(f"对前 {args.sample} 名各抽样 {args.battles} 场（关卡 {args.stage}）：")
+        for outer_skill_ids, damage in ranking[: args.sample]:
+            valuation = advisor.valuation(args.inner_skill, outer_skill_ids, args.stage)
+            print(f"{outer_skill_ids[-1]}: 胜率 {valuation.win_rate:.4f}，平均承受伤害 {valuation.damage_taken:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,57 @@
 from __future__ import annotations
 
+import argparse
+import importlib
+import json
+import os
 import sys
 import random
+import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass
-from typing import Callable, List
+from functools import lru_cache
+from typing import Callable, Deque, List, Optional, Tuple
 
-import pygame
+IMPORT_STARTED = time.perf_counter()
 
+from checkpoint import CheckpointError, RunCheckpoint, capture_run, load_checkpoint, restore_run, save_checkpoint
 from roguelike import (
     Actor,
     BattleContext,
-    action_phase,
+    Event,
+    RunState,
     apply_player_intent,
     create_enemy,
     create_outer_pool,
     choose_inner_skill,
+    finish_turn,
     log,
     pick_outer_skill_options,
     show_battle_status,
     start_turn,
-    end_turn,
+    format_event,
 )
+from replay import Replay, ReplayError, ReplayPlayer, load_replay, save_replay
 
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-LOG_AREA_RECT = pygame.Rect(20, 380, 760, 200)
+LOG_AREA = (20, 380, 760, 200)
+HUD_AREA = (0, 0, SCREEN_WIDTH, 100)
 MAX_LOG_LINES = 10
+TEXT_CACHE_CAPACITY = 256
+STARTUP_BUDGET_MS = 1000.0
+FONT_NAMES = (
+    "notosanscjksc",
+    "notosanscjk",
+    "sourcehansanssc",
+    "wenquanyizenhei",
+    "wenquanyimicrohei",
+    "microsoftyahei",
+    "simhei",
+    "pingfangsc",
+)
+FONT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", "gui_fonts.json")
 
 COLOR_BG = (20, 24, 36)
 COLOR_PANEL = (30, 40, 60)
@@ -50,48 +75,221 @@ INSTRUCTIONS_TEXT = (
 )
 
 
+Color = Tuple[int, int, int]
+
+pygame = None
+
+
+def load_pygame():
+    global pygame
+    if pygame is None:
+        pygame = importlib.import_module("pygame")
+    return pygame
+
+
+@lru_cache(maxsize=None)
+def resolve_font_path(names: Tuple[str, ...] = FONT_NAMES, cache_path: str = FONT_CACHE_PATH) -> Optional[str]:
+    try:
+        with open(cache_path, encoding="utf-8") as handle:
+            cached = json.load(handle)
+        path = cached["path"]
+        if cached["names"] == list(names) and (path is None or os.path.exists(path)):
+            return path
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    path = load_pygame().font.match_font(list(names))
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({"names": list(names), "path": path}, handle)
+        os.replace(temporary, cache_path)
+    except OSError:
+        pass
+    return path
+
+
+class StartupTimer:
+    def __init__(self, origin: float) -> None:
+        self.origin = origin
+        self.last = origin
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, label: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((label, now - self.last))
+        self.last = now
+
+    def total_ms(self) -> float:
+        return (self.last - self.origin) * 1000
+
+    def report(self) -> str:
+        lines = [f"{label}：{seconds * 1000:.1f} 毫秒" for label, seconds in self.phases]
+        lines.append(f"合计：{self.total_ms():.1f} 毫秒")
+        return "\n".join(lines)
+
+
+class TextCache:
+    def __init__(self, capacity: int = TEXT_CACHE_CAPACITY) -> None:
+        self.capacity = capacity
+        self.surfaces: OrderedDict[Tuple[pygame.font.Font, str, Color], pygame.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font: pygame.font.Font, text: str, color: Color = COLOR_TEXT) -> pygame.Surface:
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
 @dataclass
 class Button:
     rect: pygame.Rect
     label: str
     on_click: Callable[[], None]
+    hovered: bool = False
 
-    def draw(self, surface: pygame.Surface, font: pygame.font.Font, mouse_pos: tuple[int, int]) -> None:
-        is_hover = self.rect.collidepoint(mouse_pos)
-        color = COLOR_BUTTON_HOVER if is_hover else COLOR_BUTTON
+    def update_hover(self, mouse_pos: tuple[int, int]) -> bool:
+        hovered = bool(self.rect.collidepoint(mouse_pos))
+        changed = hovered != self.hovered
+        self.hovered = hovered
+        return changed
+
+    def draw(self, surface: pygame.Surface, font: pygame.font.Font, text_cache: TextCache) -> None:
+        color = COLOR_BUTTON_HOVER if self.hovered else COLOR_BUTTON
         pygame.draw.rect(surface, color, self.rect, border_radius=6)
-        text_surface = font.render(self.label, True, COLOR_TEXT)
+        text_surface = text_cache.render(font, self.label)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
 
 
+def wrap_text(text: str, font: pygame.font.Font, max_width: int) -> List[str]:
+    lines = []
+    current = ""
+    for char in text:
+        test_line = f"{current}{char}"
+        if font.size(test_line)[0] <= max_width:
+            current = test_line
+        else:
+            if current:
+                lines.append(current)
+            current = char
+    if current:
+        lines.append(current)
+    return lines
+
+
+@dataclass
+class LogLine:
+    text: str
+    surface: Optional[pygame.Surface] = None
+
+
+class LogView:
+    def __init__(self, font: pygame.font.Font, text_cache: TextCache, max_width: int, max_lines: int) -> None:
+        self.font = font
+        self.text_cache = text_cache
+        self.max_width = max_width
+        self.max_lines = max_lines
+        self.lines: Deque[LogLine] = deque(maxlen=max_lines)
+        self.pending: List[Event] = []
+
+    def append(self, event: Event) -> None:
+        self.pending.append(event)
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.pending.clear()
+
+    def wrap_entry(self, entry: str) -> List[str]:
+        wrapped: List[str] = []
+        for line in entry.splitlines() or [""]:
+            cleaned = line.strip("\n")
+            if not cleaned:
+                wrapped.append(" ")
+                continue
+            wrapped.extend(wrap_text(cleaned, self.font, self.max_width))
+        return wrapped
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        new_lines: List[str] = []
+        for event in reversed(self.pending):
+            new_lines = self.wrap_entry(format_event(event)) + new_lines
+            if len(new_lines) >= self.max_lines:
+                break
+        self.pending.clear()
+        for text in new_lines[-self.max_lines:]:
+            self.lines.append(LogLine(text))
+
+    def draw(self, surface: pygame.Surface, x: int, y: int, line_height: int) -> None:
+        self.flush()
+        for index, line in enumerate(self.lines):
+            if line.surface is None:
+                line.surface = self.text_cache.render(self.font, line.text)
+            surface.blit(line.surface, (x, y + index * line_height))
+
+
 class GameUI:
     def __init__(self, screen: pygame.Surface) -> None:
+        load_pygame()
         self.screen = screen
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont(None, 24)
-        self.title_font = pygame.font.SysFont(None, 40)
-        self.log_font = pygame.font.SysFont(None, 20)
+        font_path = resolve_font_path()
+        self.font = pygame.font.Font(font_path, 24)
+        self.title_font = pygame.font.Font(font_path, 40)
+        self.log_font = pygame.font.Font(font_path, 20)
+        self.log_area = pygame.Rect(LOG_AREA)
+        self.hud_area = pygame.Rect(HUD_AREA)
         self.buttons: List[Button] = []
+        self.dirty_rects: List[pygame.Rect] = []
         self.state = "menu"
         self.rng = random.Random()
-        self.ctx = BattleContext(rng=self.rng, logs=[])
+        self.text_cache = TextCache()
+        self.log_view = LogView(self.log_font, self.text_cache, self.log_area.width - 10, MAX_LOG_LINES)
+        self.ctx = BattleContext(rng=self.rng, sinks=[self.log_view.append])
         self.outer_pool = create_outer_pool()
         self.player: Actor | None = None
         self.enemy: Actor | None = None
         self.stage = 1
         self.turn = 1
         self.reward_options = []
+        self.replay: Optional[Replay] = None
+        self.record_path: Optional[str] = None
+        self.save_path: Optional[str] = None
+        self.notice = ""
         self.set_state("menu")
 
+    def update_hover(self, mouse_pos: tuple[int, int]) -> None:
+        for button in self.buttons:
+            if button.update_hover(mouse_pos):
+                self.invalidate(button.rect)
+
     def set_state(self, state: str) -> None:
         self.state = state
         self.update_buttons()
+        self.update_hover(pygame.mouse.get_pos())
+        self.invalidate()
+
+    def invalidate(self, *rects: pygame.Rect) -> None:
+        self.dirty_rects.extend(rects or [self.screen.get_rect()])
 
     def update_buttons(self) -> None:
         self.buttons = []
         if self.state == "menu":
-            self.buttons = [
+            if self.save_path and os.path.exists(self.save_path):
+                self.buttons.append(Button(pygame.Rect(300, 150, 200, 50), "继续游戏", self.continue_game))
+            self.buttons += [
                 Button(pygame.Rect(300, 220, 200, 50), "开始游戏", self.start_game),
                 Button(pygame.Rect(300, 290, 200, 50), "说明", self.show_instructions),
                 Button(pygame.Rect(300, 360, 200, 50), "结束游戏", self.exit_game),
@@ -123,7 +321,11 @@ class GameUI:
 
     def start_game(self) -> None:
         self.ctx.logs.clear()
+        self.log_view.clear()
+        seed = self.rng.getrandbits(63)
+        self.rng.seed(seed)
         inner_skill = choose_inner_skill(self.rng)
+        self.replay = Replay(seed=seed, inner_skill=inner_skill.id)
         self.player = Actor(
             name="侠客",
             hp=30,
@@ -134,37 +336,45 @@ class GameUI:
             outer_skills=[],
             attack_probability=0.7,
         )
-        log(self.ctx, f"\n新局开始：内功选择《{inner_skill.name}》")
+        log(self.ctx, "run_start", self.player.name, skill=inner_skill.id)
         self.stage = 1
+        self.begin_stage()
+
+    def begin_stage(self) -> None:
+        self.save_progress()
         self.turn = 1
+        self.ctx.stage = self.stage
         self.enemy = create_enemy(self.stage, self.rng)
-        log(self.ctx, f"\n进入关卡 {self.stage}，遭遇 {self.enemy.name}。")
+        log(self.ctx, "stage_start", self.player.name, self.enemy.name, self.stage)
         self.start_turn()
         self.set_state("battle")
 
     def start_turn(self) -> None:
         if not self.player or not self.enemy:
             return
-        log(self.ctx, f"\n=== 回合 {self.turn} ===")
+        self.ctx.turn = self.turn
+        log(self.ctx, "turn_start", self.player.name, self.enemy.name, self.turn)
         start_turn(self.player, self.enemy, self.ctx)
         start_turn(self.enemy, self.player, self.ctx)
 
     def handle_intent(self, intent: str) -> None:
         if not self.player or not self.enemy:
             return
+        self.invalidate(self.hud_area, self.log_area)
+        if self.replay is not None:
+            self.replay.intents.append(intent)
         show_battle_status(self.player, self.enemy, self.ctx)
         apply_player_intent(self.player, self.enemy, self.ctx, intent)
         show_battle_status(self.player, self.enemy, self.ctx)
-        if self.enemy.is_alive():
-            action_phase(self.enemy, self.player, self.ctx)
-        end_turn(self.player, self.ctx)
-        end_turn(self.enemy, self.ctx)
+        finish_turn(self.player, self.enemy, self.ctx)
         if not self.player.is_alive():
-            log(self.ctx, "\n战斗失败，结算结束。")
+            log(self.ctx, "run_over")
+            self.save_recording()
+            self.clear_progress()
             self.set_state("game_over")
             return
         if not self.enemy.is_alive():
-            log(self.ctx, "\n胜利！进入奖励阶段。")
+            log(self.ctx, "victory", self.player.name)
             self.reward_options = pick_outer_skill_options(self.outer_pool, self.rng, self.ctx)
             self.set_state("reward")
             return
@@ -174,61 +384,94 @@ class GameUI:
     def select_reward(self, reward) -> None:
         if not self.player:
             return
-        self.player.outer_skills.append(reward)
-        log(self.ctx, f"获得外功《{reward.name}》。")
+        if self.replay is not None:
+            self.replay.rewards.append(self.reward_options.index(reward))
+        self.player.add_outer_skill(reward)
+        log(self.ctx, "reward_gain", self.player.name, skill=reward.id)
         self.stage += 1
-        self.turn = 1
-        self.enemy = create_enemy(self.stage, self.rng)
-        log(self.ctx, f"\n进入关卡 {self.stage}，遭遇 {self.enemy.name}。")
-        self.start_turn()
-        self.set_state("battle")
+        self.begin_stage()
 
     def show_instructions(self) -> None:
         self.set_state("instructions")
 
+    def load_replay(self, replay: Replay, stage: int, turn: int = 1) -> None:
+        position = ReplayPlayer(replay, self.outer_pool).seek(stage, turn)
+        self.ctx.logs.clear()
+        self.log_view.clear()
+        self.rng.setstate(position.rng_state)
+        self.player = position.player
+        self.enemy = position.enemy
+        self.stage = position.stage
+        self.turn = position.turn
+        self.ctx.stage = self.stage
+        self.ctx.turn = self.turn
+        self.replay = Replay(
+            seed=replay.seed,
+            inner_skill=replay.inner_skill,
+            intents=replay.intents[:position.intent_index],
+            rewards=replay.rewards[:position.reward_index],
+            max_turns=replay.max_turns,
+            max_stages=replay.max_stages,
+        )
+        log(self.ctx, "stage_start", self.player.name, self.enemy.name, self.stage)
+        log(self.ctx, "turn_start", self.player.name, self.enemy.name, self.turn)
+        self.set_state("battle")
+
+    def resume_game(self, checkpoint: RunCheckpoint) -> None:
+        self.ctx.logs.clear()
+        self.log_view.clear()
+        state = restore_run(checkpoint, self.ctx)
+        for event in self.ctx.logs:
+            self.log_view.append(event)
+        self.player = state.player
+        self.stage = state.stage
+        self.replay = None
+        if state.enemy is None:
+            self.begin_stage()
+            return
+        self.enemy = state.enemy
+        self.turn = state.turn
+        self.start_turn()
+        self.set_state("battle")
+
+    def continue_game(self) -> None:
+        try:
+            checkpoint = load_checkpoint(self.save_path, self.outer_pool)
+        except CheckpointError as error:
+            self.notice = str(error)
+            self.invalidate()
+            return
+        if not isinstance(checkpoint, RunCheckpoint):
+            self.notice = f"{self.save_path} 不是游戏存档"
+            self.invalidate()
+            return
+        self.notice = ""
+        self.resume_game(checkpoint)
+
+    def save_progress(self) -> None:
+        if self.save_path and self.player:
+            save_checkpoint(self.save_path, capture_run(RunState(self.player, stage=self.stage), self.ctx, include_logs=True))
+
+    def clear_progress(self) -> None:
+        if self.save_path and os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+    def save_recording(self) -> None:
+        if self.record_path and self.replay is not None:
+            save_replay(self.record_path, self.replay, compress=True)
+
     def exit_game(self) -> None:
+        self.save_recording()
         pygame.quit()
         sys.exit(0)
 
-    def wrap_text(self, text: str, font: pygame.font.Font, max_width: int) -> List[str]:
-        lines = []
-        current = ""
-        for char in text:
-            test_line = f"{current}{char}"
-            if font.size(test_line)[0] <= max_width:
-                current = test_line
-            else:
-                if current:
-                    lines.append(current)
-                current = char
-        if current:
-            lines.append(current)
-        return lines
-
     def build_log_lines(self) -> List[str]:
-        lines: List[str] = []
-        for entry in self.ctx.logs:
-            split_lines = entry.splitlines() or [""]
-            for line in split_lines:
-                cleaned = line.strip("\n")
-                if cleaned == "" and lines:
-                    lines.append(" ")
-                else:
-                    lines.append(cleaned)
-        wrapped_lines: List[str] = []
-        for line in lines:
-            if not line:
-                wrapped_lines.append(" ")
-                continue
-            wrapped_lines.extend(self.wrap_text(line, self.log_font, LOG_AREA_RECT.width - 10))
-        return wrapped_lines[-MAX_LOG_LINES:]
+        self.log_view.flush()
+        return [line.text for line in self.log_view.lines]
 
     def draw_logs(self) -> None:
-        pygame.draw.rect(self.screen, COLOR_PANEL, LOG_AREA_RECT, border_radius=8)
-        lines = self.build_log_lines()
-        for index, line in enumerate(lines):
-            text_surface = self.log_font.render(line, True, COLOR_TEXT)
-            self.screen.blit(text_surface, (LOG_AREA_RECT.x + 10, LOG_AREA_RECT.y + 10 + index * 18))
+        pygame.draw.rect(self.screen, COLOR_PANEL, self.log_area, border_radius=8)
+        self.log_view.draw(self.screen, self.log_area.x + 10, self.log_area.y + 10, 18)
 
     def draw_battle(self) -> None:
         if not self.player or not self.enemy:
@@ -237,34 +480,32 @@ class GameUI:
         enemy_rect = pygame.Rect(600, 120, 80, 120)
         pygame.draw.rect(self.screen, COLOR_PLAYER, player_rect)
         pygame.draw.rect(self.screen, COLOR_ENEMY, enemy_rect)
-        player_text = self.font.render(
+        player_text = self.text_cache.render(
+            self.font,
             f"{self.player.name} HP:{self.player.hp}/{self.player.max_hp} 气:{self.player.qi}/{self.player.max_qi}",
-            True,
-            COLOR_TEXT,
         )
-        enemy_text = self.font.render(
+        enemy_text = self.text_cache.render(
+            self.font,
             f"{self.enemy.name} HP:{self.enemy.hp}/{self.enemy.max_hp} 气:{self.enemy.qi}/{self.enemy.max_qi}",
-            True,
-            COLOR_TEXT,
         )
         self.screen.blit(player_text, (50, 60))
         self.screen.blit(enemy_text, (420, 60))
-        stage_text = self.font.render(f"关卡 {self.stage} | 回合 {self.turn}", True, COLOR_TEXT)
+        stage_text = self.text_cache.render(self.font, f"关卡 {self.stage} | 回合 {self.turn}")
         self.screen.blit(stage_text, (320, 20))
 
     def draw_instructions(self) -> None:
         y = 80
         for line in INSTRUCTIONS_TEXT.splitlines():
-            text_surface = self.font.render(line, True, COLOR_TEXT)
+            text_surface = self.text_cache.render(self.font, line)
             self.screen.blit(text_surface, (60, y))
             y += 26
 
     def draw(self) -> None:
         self.screen.fill(COLOR_BG)
-        title = self.title_font.render("武学回合战", True, COLOR_TEXT)
+        title = self.text_cache.render(self.title_font, "武学回合战")
         self.screen.blit(title, (280, 20))
         if self.state == "menu":
-            subtitle = self.font.render("选择开始游戏或查看说明", True, COLOR_TEXT)
+            subtitle = self.text_cache.render(self.font, self.notice or "选择开始游戏或查看说明")
             self.screen.blit(subtitle, (260, 80))
         elif self.state == "instructions":
             self.draw_instructions()
@@ -272,43 +513,106 @@ class GameUI:
             self.draw_battle()
             self.draw_logs()
             if self.state == "reward":
-                text = self.font.render("胜利奖励：选择一门外功", True, COLOR_TEXT)
+                text = self.text_cache.render(self.font, "胜利奖励：选择一门外功")
                 self.screen.blit(text, (260, 200))
             elif self.state == "game_over":
-                text = self.font.render("战斗失败，结算结束。", True, COLOR_TEXT)
+                text = self.text_cache.render(self.font, "战斗失败，结算结束。")
                 self.screen.blit(text, (280, 260))
-        mouse_pos = pygame.mouse.get_pos()
         for button in self.buttons:
-            button.draw(self.screen, self.font, mouse_pos)
+            button.draw(self.screen, self.font, self.text_cache)
 
-    def handle_events(self) -> None:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+    def render_dirty(self) -> None:
+        if not self.dirty_rects:
+            return
+        self.screen.set_clip(self.dirty_rects[0].unionall(self.dirty_rects[1:]))
+        self.draw()
+        self.screen.set_clip(None)
+        pygame.display.update(self.dirty_rects)
+        self.dirty_rects = []
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        if event.type == pygame.QUIT:
+            self.exit_game()
+        if event.type == pygame.VIDEOEXPOSE:
+            self.invalidate()
+        if event.type == pygame.MOUSEMOTION:
+            self.update_hover(event.pos)
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            if self.state == "battle":
+                self.set_state("menu")
+            else:
                 self.exit_game()
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                if self.state == "battle":
-                    self.set_state("menu")
-                else:
-                    self.exit_game()
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                for button in self.buttons:
-                    if button.rect.collidepoint(event.pos):
-                        button.on_click()
-                        break
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            for button in self.buttons:
+                if button.rect.collidepoint(event.pos):
+                    button.on_click()
+                    break
 
     def run(self) -> None:
         while True:
-            self.handle_events()
-            self.draw()
-            pygame.display.flip()
+            if not self.dirty_rects:
+                self.handle_event(pygame.event.wait())
+            for event in pygame.event.get():
+                self.handle_event(event)
+            self.render_dirty()
             self.clock.tick(60)
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="武学回合战 GUI")
+    parser.add_argument("--record", default=None, help="将本局录像保存到该路径")
+    parser.add_argument("--replay", default=None, help="载入录像")
+    parser.add_argument("--stage", type=int, default=1, help="载入录像后跳转的关卡")
+    parser.add_argument("--turn", type=int, default=1, help="载入录像后跳转的回合")
+    parser.add_argument("--save", default=None, help="存档路径，每进入新关卡时自动保存")
+    parser.add_argument("--resume", action="store_true", help="启动后直接从 --save 指定的存档继续")
+    parser.add_argument("--startup-report", action="store_true", help="输出启动各阶段耗时并在首帧后退出")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS, help="启动耗时预算（毫秒），超出时以非零状态退出")
+    args = parser.parse_args()
+
+    timer = StartupTimer(IMPORT_STARTED)
+    timer.mark("导入模块")
+    load_pygame()
+    timer.mark("加载 pygame")
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("武学回合战 GUI")
+    timer.mark("初始化显示")
+    resolve_font_path()
+    timer.mark("解析字体")
     ui = GameUI(screen)
+    timer.mark("创建界面")
+    ui.record_path = args.record
+    ui.save_path = args.save
+    ui.update_buttons()
+    if args.resume:
+        if not args.save:
+            pygame.quit()
+            parser.error("--resume 需要同时指定 --save")
+        try:
+            checkpoint = load_checkpoint(args.save, ui.outer_pool)
+        except CheckpointError as error:
+            pygame.quit()
+            parser.error(str(error))
+        if not isinstance(checkpoint, RunCheckpoint):
+            pygame.quit()
+            parser.error(f"{args.save} 不是游戏存档")
+        ui.resume_game(checkpoint)
+    if args.replay:
+        try:
+            ui.load_replay(load_replay(args.replay), args.stage, args.turn)
+        except ReplayError as error:
+            pygame.quit()
+            parser.error(str(error))
+    if args.startup_report:
+        ui.render_dirty()
+        timer.mark("首帧")
+        pygame.quit()
+        print(timer.report())
+        if timer.total_ms() > args.startup_budget:
+            print(f"启动耗时超出预算 {args.startup_budget:.0f} 毫秒")
+            raise SystemExit(1)
+        return
     ui.run()
 
 
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from roguelike import BattleContext, InnerSkill, OuterSkill, battle, create_enemy, create_outer_pool, create_player
+from simulate import DEFAULT_MAX_TURNS, POLICIES, battle_seed, create_policy, resolve_build
+
+
+DEFAULT_MAX_TRACE_EVENTS = 200000
+
+
+@dataclass
+class TimingStat:
+    calls: int = 0
+    seconds: float = 0.0
+
+
+class Profiler:
+    def __init__(self, max_trace_events: int = DEFAULT_MAX_TRACE_EVENTS) -> None:
+        self.max_trace_events = max_trace_events
+        self.stats: Dict[Tuple[str, str], TimingStat] = {}
+        self.trace: List[Dict[str, object]] = []
+        self.rng_draws: List[int] = []
+        self.trigger_sizes: Dict[int, int] = {}
+        self.effect_types = {skill.id: str(skill.effect["type"]) for skill in create_outer_pool()}
+        self.draws = 0
+        self.fired = 0
+        self.origin = time.perf_counter()
+        self.ctx: Optional[BattleContext] = None
+
+    def attach(self, ctx: BattleContext) -> None:
+        self.ctx = ctx
+        ctx.timer = self.record
+        ctx.roller = self.roll
+
+    def roll(self, probability: float, actor: str = "", slot: str = "") -> bool:
+        self.draws += 1
+        return self.ctx.rng.random() < probability
+
+    def record(self, category: str, name: str, started: float, elapsed: float) -> None:
+        self.add(category, name, started, elapsed)
+        if category == "skill":
+            self.add("effect", self.effect_types.get(name, name), started, elapsed)
+            self.fired += 1
+        elif category == "trigger":
+            self.trigger_sizes[self.fired] = self.trigger_sizes.get(self.fired, 0) + 1
+            self.fired = 0
+
+    def add(self, category: str, name: str, started: float, elapsed: float) -> None:
+        stat = self.stats.get((category, name))
+        if stat is None:
+            stat = self.stats[(category, name)] = TimingStat()
+        stat.calls += 1
+        stat.seconds += elapsed
+        if len(self.trace) < self.max_trace_events:
+            self.trace.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (started - self.origin) * 1e6,
+                    "dur": elapsed * 1e6,
+                    "pid": 0,
+                    "tid": 0,
+                }
+            )
+
+    def profile_battle(
+        self,
+        inner_skill: InnerSkill,
+        outer_skills: List[OuterSkill],
+        stage: int,
+        seed: int,
+        policy,
+        max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    ) -> bool:
+        player = create_player(inner_skill)
+        player.outer_skills = list(outer_skills)
+        ctx = BattleContext(rng=random.Random(seed), quiet=True)
+        self.attach(ctx)
+        enemy = create_enemy(stage, ctx.rng)
+        draws = self.draws
+        started = time.perf_counter()
+        win = battle(player, enemy, ctx, policy.choose_intent, max_turns)
+        self.add("battle", "battle", started, time.perf_counter() - started)
+        self.rng_draws.append(self.draws - draws)
+        return win
+
+    def chrome_trace(self) -> Dict[str, object]:
+        return {"traceEvents": self.trace, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.chrome_trace(), handle)
+
+    def summary_rows(self) -> List[Tuple[str, str, int, float, float]]:
+        rows = [
+            (category, name, stat.calls, stat.seconds * 1000, stat.seconds / stat.calls * 1e6)
+            for (category, name), stat in self.stats.items()
+        ]
+        return sorted(rows, key=lambda row: (row[0], -row[3]))
+
+    def summary_table(self) -> str:
+        lines = [f"{'类别':<8}{'名称':<22}{'次数':>10}{'总耗时(毫秒)':>14}{'平均(微秒)':>12}"]
+        for category, name, calls, total_ms, mean_us in self.summary_rows():
+            lines.append(f"{category:<10}{name:<24}{calls:>10}{total_ms:>16.2f}{mean_us:>14.2f}")
+        if self.rng_draws:
+            mean_draws = sum(self.rng_draws) / len(self.rng_draws)
+            lines.append(f"每场随机判定: 平均 {mean_draws:.1f}，最多 {max(self.rng_draws)}（{len(self.rng_draws)} 场）")
+        if self.trigger_sizes:
+            triggers = sum(self.trigger_sizes.values())
+            mean_size = sum(size * count for size, count in self.trigger_sizes.items()) / triggers
+            lines.append(f"每次触发结算的外功数: 平均 {mean_size:.2f}，最多 {max(self.trigger_sizes)}（{triggers} 次触发）")
+        return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按触发器 / 效果 / 外功统计战斗耗时")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument("--battles", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--trace", default=None, help="Chrome trace JSON 输出路径")
+    parser.add_argument("--max-trace-events", type=int, default=DEFAULT_MAX_TRACE_EVENTS)
+    args = parser.parse_args()
+
+    try:
+        inner_skill, outer_skills = resolve_build(args.inner_skill, args.outer_skills)
+    except KeyError as error:
+        parser.error(f"未知的内功或外功: {error.args[0]}")
+    profiler = Profiler(args.max_trace_events)
+    for index in range(args.battles):
+        seed = battle_seed(args.seed, index)
+        profiler.profile_battle(inner_skill, outer_skills, args.stage, seed, create_policy(args.policy, seed))
+
+    print(profiler.summary_table())
+    if args.trace:
+        profiler.write_chrome_trace(args.trace)
+        print(f"已写入 {len(profiler.trace)} 条 trace 事件到 {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
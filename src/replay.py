@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import argparse
+import copy
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from codec import FormatError, read_optional, read_varint, write_optional, write_varint
+from roguelike import (
+    Actor,
+    BattleContext,
+    IntentChooser,
+    OuterSkill,
+    RewardChooser,
+    RunState,
+    apply_player_intent,
+    create_outer_pool,
+    finish_turn,
+    play_run,
+    start_run,
+)
+from simulate import DEFAULT_MAX_STAGES, DEFAULT_MAX_TURNS, POLICIES, create_policy
+from snapshot import rng_from_state
+
+
+REPLAY_MAGIC = b"WXRP"
+REPLAY_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+FLAG_COMPRESSED = 1
+DEFAULT_CHECKPOINT_INTERVAL = 16
+INTENT_CODES = "123"
+
+
+class ReplayError(FormatError):
+    pass
+
+
+class ReplayPause(Exception):
+    pass
+
+
+class ReplayExhausted(Exception):
+    pass
+
+
+@dataclass
+class Replay:
+    seed: int
+    inner_skill: str
+    intents: List[str] = field(default_factory=list)
+    rewards: List[int] = field(default_factory=list)
+    max_turns: Optional[int] = None
+    max_stages: Optional[int] = None
+
+
+def pack_codes(buffer: bytearray, codes: List[int]) -> None:
+    write_varint(buffer, len(codes))
+    for start in range(0, len(codes), 4):
+        byte = 0
+        for position, code in enumerate(codes[start:start + 4]):
+            byte |= code << (position * 2)
+        buffer.append(byte)
+
+
+def unpack_codes(data: bytes, offset: int) -> Tuple[List[int], int]:
+    count, offset = read_varint(data, offset)
+    size = (count + 3) // 4
+    if offset + size > len(data):
+        raise ReplayError("录像数据被截断")
+    codes = [(data[offset + index // 4] >> ((index % 4) * 2)) & 3 for index in range(count)]
+    return codes, offset + size
+
+
+def encode_replay(replay: Replay, compress: bool = False) -> bytes:
+    payload = bytearray()
+    write_varint(payload, replay.seed)
+    name = replay.inner_skill.encode("utf-8")
+    write_varint(payload, len(name))
+    payload.extend(name)
+    write_optional(payload, replay.max_turns)
+    write_optional(payload, replay.max_stages)
+    pack_codes(payload, [INTENT_CODES.index(intent) for intent in replay.intents])
+    pack_codes(payload, replay.rewards)
+    body = zlib.compress(bytes(payload), 9) if compress else bytes(payload)
+    return REPLAY_MAGIC + bytes([REPLAY_VERSION, FLAG_COMPRESSED if compress else 0]) + body
+
+
+def decode_replay(data: bytes) -> Replay:
+    try:
+        return read_replay(data)
+    except ReplayError:
+        raise
+    except FormatError as error:
+        raise ReplayError(f"录像{error}") from error
+
+
+def read_replay(data: bytes) -> Replay:
+    if data[:4] != REPLAY_MAGIC or len(data) < 6:
+        raise ReplayError("不是有效的录像文件")
+    version = data[4]
+    if version not in SUPPORTED_VERSIONS:
+        raise ReplayError(f"不支持的录像版本: {version}")
+    try:
+        payload = zlib.decompress(data[6:]) if data[5] & FLAG_COMPRESSED else data[6:]
+    except zlib.error as error:
+        raise ReplayError(f"录像数据解压失败: {error}") from error
+    seed, offset = read_varint(payload, 0)
+    length, offset = read_varint(payload, offset)
+    if offset + length > len(payload):
+        raise ReplayError("录像数据被截断")
+    try:
+        inner_skill = payload[offset:offset + length].decode("utf-8")
+    except UnicodeDecodeError as error:
+        raise ReplayError("录像中的内功名不是有效的 UTF-8") from error
+    offset += length
+    max_turns, offset = read_optional(payload, offset)
+    max_stages: Optional[int] = None
+    if version >= 2:
+        max_stages, offset = read_optional(payload, offset)
+    intents, offset = unpack_codes(payload, offset)
+    rewards, offset = unpack_codes(payload, offset)
+    if any(code >= len(INTENT_CODES) for code in intents):
+        raise ReplayError("录像中存在无效的出招编码")
+    return Replay(
+        seed=seed,
+        inner_skill=inner_skill,
+        intents=[INTENT_CODES[code] for code in intents],
+        rewards=rewards,
+        max_turns=max_turns,
+        max_stages=max_stages,
+    )
+
+
+def save_replay(path: str, replay: Replay, compress: bool = False) -> None:
+    with open(path, "wb") as handle:
+        handle.write(encode_replay(replay, compress))
+
+
+def load_replay(path: str) -> Replay:
+    with open(path, "rb") as handle:
+        return decode_replay(handle.read())
+
+
+class ReplayRecorder:
+    def __init__(
+        self,
+        seed: int,
+        choose_intent: IntentChooser,
+        choose_reward: RewardChooser,
+        max_turns: Optional[int] = None,
+        max_stages: Optional[int] = None,
+    ) -> None:
+        self.replay = Replay(seed=seed, inner_skill="", max_turns=max_turns, max_stages=max_stages)
+        self.intent_chooser = choose_intent
+        self.reward_chooser = choose_reward
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        self.replay.inner_skill = player.inner_skill.id
+        intent = self.intent_chooser(player, enemy, ctx)
+        self.replay.intents.append(intent if intent in INTENT_CODES else "1")
+        return intent
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        reward = self.reward_chooser(options, player, ctx)
+        self.replay.rewards.append(options.index(reward))
+        return reward
+
+
+@dataclass
+class Checkpoint:
+    stage: int
+    turn: int
+    intent_index: int
+    reward_index: int
+    player: Actor
+    enemy: Actor
+    rng_state: tuple
+
+
+def clone_actor(actor: Actor) -> Actor:
+    clone = copy.copy(actor)
+    clone.outer_skills = list(actor.outer_skills)
+    return clone
+
+
+class ReplayCursor:
+    def __init__(
+        self,
+        replay: Replay,
+        intent_index: int = 0,
+        reward_index: int = 0,
+        stop: Optional[Tuple[int, int]] = None,
+        checkpoints: Optional[List[Checkpoint]] = None,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    ) -> None:
+        self.replay = replay
+        self.intent_index = intent_index
+        self.reward_index = reward_index
+        self.stop = stop
+        self.checkpoints = checkpoints
+        self.interval = interval
+        self.position: Optional[Checkpoint] = None
+
+    def capture(self, player: Actor, enemy: Actor, ctx: BattleContext) -> Checkpoint:
+        return Checkpoint(
+            stage=ctx.stage,
+            turn=ctx.turn,
+            intent_index=self.intent_index,
+            reward_index=self.reward_index,
+            player=clone_actor(player),
+            enemy=clone_actor(enemy),
+            rng_state=ctx.rng.getstate(),
+        )
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        if player.inner_skill.id != self.replay.inner_skill:
+            raise ReplayError(f"录像内功 {self.replay.inner_skill} 与重放结果 {player.inner_skill.id} 不一致")
+        if self.stop is not None and (ctx.stage, ctx.turn) >= self.stop:
+            self.position = self.capture(player, enemy, ctx)
+            raise ReplayPause
+        if self.checkpoints is not None and self.intent_index % self.interval == 0:
+            self.checkpoints.append(self.capture(player, enemy, ctx))
+        if self.intent_index >= len(self.replay.intents):
+            self.position = self.capture(player, enemy, ctx)
+            raise ReplayExhausted
+        intent = self.replay.intents[self.intent_index]
+        self.intent_index += 1
+        return intent
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        if self.reward_index >= len(self.replay.rewards):
+            raise ReplayExhausted
+        choice = self.replay.rewards[self.reward_index]
+        self.reward_index += 1
+        return options[choice]
+
+
+class ReplayPlayer:
+    def __init__(
+        self,
+        replay: Replay,
+        outer_pool: Optional[List[OuterSkill]] = None,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    ) -> None:
+        self.replay = replay
+        self.outer_pool = outer_pool if outer_pool is not None else create_outer_pool()
+        self.interval = interval
+        self.checkpoints: Optional[List[Checkpoint]] = None
+
+    def play(self) -> Tuple[Actor, int]:
+        ctx = BattleContext(rng=random.Random(self.replay.seed), quiet=True)
+        cursor = ReplayCursor(self.replay)
+        return self.run(ctx, cursor)
+
+    def index(self) -> List[Checkpoint]:
+        if self.checkpoints is None:
+            checkpoints: List[Checkpoint] = []
+            ctx = BattleContext(rng=random.Random(self.replay.seed), quiet=True)
+            self.run(ctx, ReplayCursor(self.replay, checkpoints=checkpoints, interval=self.interval))
+            self.checkpoints = checkpoints
+        return self.checkpoints
+
+    def run(self, ctx: BattleContext, cursor: ReplayCursor) -> Tuple[Actor, int]:
+        state = start_run(ctx)
+        try:
+            return play_run(
+                ctx,
+                self.outer_pool,
+                cursor.choose_intent,
+                cursor.choose_reward,
+                max_stages=self.replay.max_stages,
+                max_turns=self.replay.max_turns,
+                state=state,
+            )
+        except ReplayExhausted:
+            return state.player, state.stage - 1
+
+    def seek(self, stage: int, turn: int = 1) -> Checkpoint:
+        target = (stage, turn)
+        checkpoints = self.index()
+        candidates = [checkpoint for checkpoint in checkpoints if (checkpoint.stage, checkpoint.turn) <= target]
+        if not candidates:
+            raise ReplayError("录像中没有该位置")
+        start = candidates[-1]
+        if (start.stage, start.turn) == target:
+            return self.restore(start)
+        ctx = BattleContext(rng=rng_from_state(start.rng_state), quiet=True, turn=start.turn, stage=start.stage)
+        player = clone_actor(start.player)
+        enemy = clone_actor(start.enemy)
+        cursor = ReplayCursor(self.replay, start.intent_index, start.reward_index, stop=target)
+        try:
+            apply_player_intent(player, enemy, ctx, cursor.choose_intent(player, enemy, ctx))
+            finish_turn(player, enemy, ctx)
+            state = RunState(player, enemy, start.stage, start.turn + 1)
+            play_run(
+                ctx,
+                self.outer_pool,
+                cursor.choose_intent,
+                cursor.choose_reward,
+                max_stages=self.replay.max_stages,
+                max_turns=self.replay.max_turns,
+                state=state,
+            )
+        except (ReplayPause, ReplayExhausted):
+            pass
+        if cursor.position is None:
+            raise ReplayError("录像中没有该位置")
+        return cursor.position
+
+    def restore(self, checkpoint: Checkpoint) -> Checkpoint:
+        return Checkpoint(
+            stage=checkpoint.stage,
+            turn=checkpoint.turn,
+            intent_index=checkpoint.intent_index,
+            reward_index=checkpoint.reward_index,
+            player=clone_actor(checkpoint.player),
+            enemy=clone_actor(checkpoint.enemy),
+            rng_state=checkpoint.rng_state,
+        )
+
+
+def record_run(seed: int, policy_name: str, max_stages: Optional[int], max_turns: Optional[int]) -> Tuple[Replay, int]:
+    policy = create_policy(policy_name, seed)
+    recorder = ReplayRecorder(seed, policy.choose_intent, policy.choose_reward, max_turns, max_stages)
+    ctx = BattleContext(rng=random.Random(seed), quiet=True)
+    _, stages_cleared = play_run(ctx, create_outer_pool(), recorder.choose_intent, recorder.choose_reward, max_stages, max_turns)
+    return recorder.replay, stages_cleared
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="录制与回放整局游戏")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="用自动策略录制一局")
+    record.add_argument("output")
+    record.add_argument("--seed", type=int, default=0)
+    record.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    record.add_argument("--max-stages", type=int, default=DEFAULT_MAX_STAGES)
+    record.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    record.add_argument("--compress", action="store_true")
+    play = commands.add_parser("play", help="无界面回放录像")
+    play.add_argument("replay")
+    play.add_argument("--stage", type=int, default=None, help="跳转到指定关卡")
+    play.add_argument("--turn", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        replay, stages_cleared = record_run(args.seed, args.policy, args.max_stages, args.max_turns)
+        save_replay(args.output, replay, args.compress)
+        size = len(encode_replay(replay, args.compress))
+        print(f"录制完成：通关 {stages_cleared} 关，{len(replay.intents)} 次出招，{len(replay.rewards)} 次奖励，{size} 字节")
+        return
+
+    replay = load_replay(args.replay)
+    player = ReplayPlayer(replay)
+    started = time.perf_counter()
+    final_player, stages_cleared = player.play()
+    elapsed = time.perf_counter() - started
+    print(f"回放完成：内功 {replay.inner_skill}，通关 {stages_cleared} 关，用时 {elapsed * 1000:.1f} 毫秒")
+    print(f"最终外功：{[skill.id for skill in final_player.outer_skills]}")
+    if args.stage is not None:
+        started = time.perf_counter()
+        player.index()
+        indexed = time.perf_counter() - started
+        started = time.perf_counter()
+        try:
+            position = player.seek(args.stage, args.turn)
+        except ReplayError as error:
+            parser.error(str(error))
+        elapsed = time.perf_counter() - started
+        print(f"建立 {len(player.checkpoints)} 个检查点用时 {indexed * 1000:.1f} 毫秒，跳转用时 {elapsed * 1000:.2f} 毫秒")
+        print(
+            f"关卡 {position.stage} 回合 {position.turn}：{position.player.name} 生命 {position.player.hp}/{position.player.max_hp}"
+            f" | {position.enemy.name} 生命 {position.enemy.hp}/{position.enemy.max_hp}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,123 @@
 from __future__ import annotations
 
+import json
+import os
+import pickle
 import random
 import select
 import sys
+import time
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, TextIO, Tuple
 
 
 TriggerType = str
 EffectType = str
 
-
-@dataclass
-class Status:
-    id: str
-    stacks: int = 1
-
-
-@dataclass
+BASE_DAMAGE = 5
+BASE_CRIT_CHANCE = 0.1
+DEFAULT_LOG_CAPACITY = 2000
+DEFAULT_CHAIN_BUDGET = 128
+INTERNED_DAMAGE_LIMIT = 256
+
+STATUS_IDS: Tuple[str, ...] = ("shock", "vulnerable", "shield_qi", "frenzy", "crit_focus", "counter_ready", "double_strike")
+STATUS_INDEX: Dict[str, int] = {status_id: index for index, status_id in enumerate(STATUS_IDS)}
+SHOCK = STATUS_INDEX["shock"]
+VULNERABLE = STATUS_INDEX["vulnerable"]
+SHIELD_QI = STATUS_INDEX["shield_qi"]
+FRENZY = STATUS_INDEX["frenzy"]
+CRIT_FOCUS = STATUS_INDEX["crit_focus"]
+COUNTER_READY = STATUS_INDEX["counter_ready"]
+DOUBLE_STRIKE = STATUS_INDEX["double_strike"]
+DECAYING_STATUSES = (VULNERABLE, FRENZY, CRIT_FOCUS)
+CONTENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content.json")
+CONTENT_CACHE_VERSION = 2
+OUTER_TRIGGERS: Tuple[TriggerType, ...] = ("onTurnStart", "onAttack", "onHit", "onCrit", "onDefense")
+EFFECT_FIELDS: Dict[EffectType, Tuple[str, ...]] = {
+    "addStatus": ("status", "amount"),
+    "dealDamage": ("amount",),
+    "gainQi": ("amount",),
+    "consumeStatus": ("status", "perStackDamage"),
+    "repeatLastAction": ("multiplier",),
+    "heal": ("amount",),
+    "stealQi": ("amount",),
+}
+OUTER_EFFECTS: Tuple[EffectType, ...] = ("addStatus", "dealDamage", "gainQi", "consumeStatus", "repeatLastAction", "heal")
+INNER_HOOK_EFFECTS: Dict[str, Tuple[EffectType, ...]] = {
+    "onTurnStart": OUTER_EFFECTS,
+    "onQiOverflow": ("addStatus",),
+    "onHit": ("stealQi",),
+    "onDefense": ("addStatus",),
+}
+TRANSMUTE_TYPES = ("damage", "qi", "heal")
+
+EVENT_TEXT: Dict[str, str] = {
+    "qi_overflow": "{actor} 气溢出，转换为护体真气+{amount}。",
+    "heal": "{actor} 回复 {amount} 生命。",
+    "shield_absorb": "{actor} 护体真气抵消 {amount} 伤害。",
+    "skill_trigger": "{actor} 触发外功《{skill_name}》。",
+    "status_gain": "{target} 获得状态 {status} +{amount}。",
+    "damage": "{target} 受到 {amount} 伤害。",
+    "qi_gain": "{actor} 获得 {amount} 气。",
+    "status_consume": "{target} 被消耗 {status} {extra[0]} 层，受到 {amount} 真实伤害。",
+    "chain_truncated": "{actor} 本次行动的外功结算已达上限，{amount} 个效果未结算。",
+    "chain_damage": "{actor} 连锁攻击造成 {amount} 伤害。",
+    "qi_steal": "{actor} 偷取 {amount} 气。",
+    "counter_stance": "{actor} 进入反击姿态。",
+    "double_strike": "{actor} 枯禅定触发，伤害翻倍！",
+    "attack_hit": "{actor} 攻击命中，造成 {amount} 伤害。",
+    "crit": "{actor} 暴击！",
+    "defend": "{actor} 选择防御。",
+    "zen_charged": "{actor} 枯禅定蓄力完成。",
+    "battle_status": (
+        "{actor} 生命:{extra[0]}/{extra[1]} 气:{extra[2]}/{extra[3]}"
+        " | {target} 生命:{extra[4]}/{extra[5]} 气:{extra[6]}/{extra[7]}"
+    ),
+    "transmute_fail": "{actor} 化劲失败，没有可用状态。",
+    "transmute_damage": "{actor} 化劲消耗 {status} {extra[0]} 层，造成 {amount} 真实伤害。",
+    "transmute_qi": "{actor} 化劲转化气 +{amount}。",
+    "transmute_heal": "{actor} 化劲转化护体，回复 {amount} 生命。",
+    "intent_attack": "{actor} 选择【进】，消耗 1 气。",
+    "intent_attack_no_qi": "{actor} 选择【进】，但气不足。",
+    "intent_defend": "{actor} 选择【守】，回复 1 气。",
+    "intent_transmute": "{actor} 选择【化】，开始转化状态。",
+    "counter": "{actor} 反击发动！",
+    "reward_options": "可选外功：",
+    "reward_option": "{amount}) {skill_name} - {skill_description}",
+    "turn_limit": "\n回合数超过 {amount}，判定战斗失败。",
+    "turn_start": "\n=== 回合 {amount} ===",
+    "run_start": "\n新局开始：内功选择《{skill_name}》",
+    "stage_start": "\n进入关卡 {amount}，遭遇 {target}。",
+    "victory": "\n胜利！进入奖励阶段。",
+    "reward_gain": "获得外功《{skill_name}》。",
+    "run_over": "\n战斗失败，结算结束。",
+}
+
+
+class FrozenDict(dict):
+    def __hash__(self) -> int:
+        return hash(frozenset(self.items()))
+
+    def __reduce__(self) -> Tuple[type, Tuple[Dict[object, object]]]:
+        return FrozenDict, (dict(self),)
+
+    def read_only(self, *args: object, **kwargs: object) -> None:
+        raise TypeError("内容对象不可修改")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = read_only
+
+
+@dataclass(frozen=True)
 class InnerSkill:
     id: str
     name: str
     description: str
-    hooks: Dict[str, List[Dict[str, object]]]
+    hooks: Dict[str, Tuple[Dict[str, object], ...]]
 
 
-@dataclass
+@dataclass(frozen=True)
 class OuterSkill:
     id: str
     name: str
@@ -35,7 +127,22 @@ class OuterSkill:
     chance: float = 1.0
 
 
+EffectFunction = Callable[["Actor", "Actor", "BattleContext", Optional["AttackResult"]], None]
+
+
 @dataclass
+class CompiledSkill:
+    skill: OuterSkill
+    chance: float
+    run: EffectFunction
+    heals_owner: bool
+
+
+def empty_status_stacks() -> List[int]:
+    return [0] * len(STATUS_IDS)
+
+
+@dataclass(slots=True)
 class Actor:
     name: str
     hp: int
@@ -44,134 +151,387 @@ class Actor:
     max_qi: int
     inner_skill: InnerSkill
     outer_skills: List[OuterSkill] = field(default_factory=list)
-    statuses: Dict[str, Status] = field(default_factory=dict)
+    status_stacks: List[int] = field(default_factory=empty_status_stacks)
     turns_without_attack: int = 0
     behavior_profile: str = "均衡"
     attack_probability: float = 0.7
+    dispatch: Optional[Dict[TriggerType, List[CompiledSkill]]] = field(default=None, repr=False, compare=False)
+    dispatch_source: Optional[List[OuterSkill]] = field(default=None, repr=False, compare=False)
+    dispatch_size: int = field(default=0, repr=False, compare=False)
+    turn_start_hooks: Optional[Tuple[EffectFunction, ...]] = field(default=None, repr=False, compare=False)
+    turn_start_source: Optional[InnerSkill] = field(default=None, repr=False, compare=False)
+
+    def __copy__(self) -> Actor:
+        clone = Actor.__new__(Actor)
+        for name in Actor.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone.status_stacks = list(self.status_stacks)
+        return clone
+
+    def __getstate__(self) -> Dict[str, object]:
+        state = {name: getattr(self, name) for name in Actor.__slots__}
+        state.update(dispatch=None, dispatch_source=None, dispatch_size=0, turn_start_hooks=None, turn_start_source=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def is_alive(self) -> bool:
         return self.hp > 0
 
+    def add_outer_skill(self, skill: OuterSkill) -> None:
+        self.outer_skills.append(skill)
+        self.dispatch = None
+
+    def skill_dispatch(self) -> Dict[TriggerType, List[CompiledSkill]]:
+        if (
+            self.dispatch is None
+            or self.dispatch_source is not self.outer_skills
+            or self.dispatch_size != len(self.outer_skills)
+        ):
+            self.dispatch = compile_outer_skills(self.outer_skills)
+            self.dispatch_source = self.outer_skills
+            self.dispatch_size = len(self.outer_skills)
+        return self.dispatch
+
+    def turn_start_effects(self) -> Tuple[EffectFunction, ...]:
+        if self.turn_start_source is not self.inner_skill:
+            self.turn_start_hooks = compile_inner_hook(self.inner_skill, "onTurnStart")
+            self.turn_start_source = self.inner_skill
+        return self.turn_start_hooks
+
     def add_status(self, status_id: str, stacks: int = 1) -> None:
-        if status_id in self.statuses:
-            self.statuses[status_id].stacks += stacks
-        else:
-            self.statuses[status_id] = Status(status_id, stacks)
+        self.status_stacks[STATUS_INDEX[status_id]] += stacks
 
     def consume_status(self, status_id: str) -> int:
-        if status_id not in self.statuses:
-            return 0
-        stacks = self.statuses[status_id].stacks
-        del self.statuses[status_id]
+        index = STATUS_INDEX[status_id]
+        stacks = self.status_stacks[index]
+        self.status_stacks[index] = 0
         return stacks
 
     def get_status_stacks(self, status_id: str) -> int:
-        return self.statuses.get(status_id, Status(status_id, 0)).stacks
+        return self.status_stacks[STATUS_INDEX[status_id]]
+
+    def active_statuses(self) -> Dict[str, int]:
+        return {STATUS_IDS[index]: stacks for index, stacks in enumerate(self.status_stacks) if stacks}
+
+
+class Event(NamedTuple):
+    kind: str
+    actor: str = ""
+    target: str = ""
+    amount: int = 0
+    status: str = ""
+    skill: str = ""
+    extra: Tuple[int, ...] = ()
+
+
+EventSink = Callable[[Event], None]
+EngineTimer = Callable[[str, str, float, float], None]
+
+
+def create_event_log(capacity: Optional[int] = DEFAULT_LOG_CAPACITY) -> Deque[Event]:
+    return deque(maxlen=capacity)
 
 
 @dataclass
-class BattleContext:
-    rng: random.Random
-    logs: List[str]
+class EffectChain:
+    spent: int = 0
+    dropped: int = 0
+
+
+@dataclass(frozen=True)
+class Balance:
+    base_damage: int = BASE_DAMAGE
+    crit_chance: float = BASE_CRIT_CHANCE
+    enemy_hp_scale: float = 1.0
+    enemy_attack_scale: float = 1.0
+
+
+DEFAULT_BALANCE = Balance()
 
 
 @dataclass
+class BattleContext:
+    rng: random.Random
+    logs: Deque[Event] = field(default_factory=create_event_log)
+    sinks: List[EventSink] = field(default_factory=list)
+    quiet: bool = False
+    turn: int = 0
+    stage: int = 0
+    roller: Optional[Callable[[float, str, str], bool]] = None
+    timer: Optional[EngineTimer] = None
+    balance: Balance = DEFAULT_BALANCE
+    chain_budget: Optional[int] = DEFAULT_CHAIN_BUDGET
+    chain: EffectChain = field(default_factory=EffectChain)
+
+
+@dataclass(frozen=True, slots=True)
 class AttackResult:
     hit: bool
     crit: bool
     damage: int
 
 
-def log(ctx: BattleContext, message: str) -> None:
-    ctx.logs.append(message)
-    print(message)
+ATTACK_RESULTS: Tuple[Tuple[AttackResult, ...], ...] = tuple(
+    tuple(AttackResult(hit=True, crit=crit, damage=damage) for damage in range(INTERNED_DAMAGE_LIMIT)) for crit in (False, True)
+)
 
 
-def create_inner_skills() -> List[InnerSkill]:
-    return [
-        InnerSkill(
-            id="nine_sun",
-            name="九阳心法",
-            description="回合开始+2气，气溢出转化护体真气",
-            hooks={
-                "onTurnStart": [{"type": "gainQi", "amount": 2}],
-                "onQiOverflow": [{"type": "addStatus", "status": "shield_qi", "amount": "overflow"}],
-            },
-        ),
-        InnerSkill(
-            id="suction_star",
-            name="吸星大法",
-            description="命中偷气，低气时翻倍",
-            hooks={
-                "onHit": [{"type": "stealQi", "amount": 1}],
-            },
-        ),
-        InnerSkill(
-            id="taiji",
-            name="太极心法",
-            description="防御后下一次攻击必定反击",
-            hooks={
-                "onDefense": [{"type": "addStatus", "status": "counter_ready", "amount": 1}],
-            },
-        ),
-        InnerSkill(
-            id="blood_war",
-            name="血战心诀",
-            description="生命低于50%外功触发率提升",
-            hooks={},
+def attack_result(crit: bool, damage: int) -> AttackResult:
+    if 0 <= damage < INTERNED_DAMAGE_LIMIT:
+        return ATTACK_RESULTS[crit][damage]
+    return AttackResult(hit=True, crit=crit, damage=damage)
+
+
+@dataclass
+class RunState:
+    player: Actor
+    enemy: Optional[Actor] = None
+    stage: int = 1
+    turn: int = 1
+
+
+IntentChooser = Callable[[Actor, Actor, BattleContext], str]
+RewardChooser = Callable[[List[OuterSkill], Actor, BattleContext], OuterSkill]
+StageHook = Callable[[RunState, BattleContext], None]
+
+
+def log(
+    ctx: BattleContext,
+    kind: str,
+    actor: str = "",
+    target: str = "",
+    amount: int = 0,
+    status: str = "",
+    skill: str = "",
+    extra: Tuple[int, ...] = (),
+) -> None:
+    if ctx.quiet:
+        return
+    event = Event(kind, actor, target, amount, status, skill, extra)
+    ctx.logs.append(event)
+    for sink in ctx.sinks:
+        sink(event)
+
+
+@lru_cache(maxsize=None)
+def skill_texts() -> Dict[str, Tuple[str, str]]:
+    texts = {skill.id: (skill.name, skill.description) for skill in create_inner_skills()}
+    texts.update({skill.id: (skill.name, skill.description) for skill in create_outer_pool()})
+    return texts
+
+
+def format_event(event: Event) -> str:
+    skill_name, skill_description = skill_texts().get(event.skill, (event.skill, ""))
+    return EVENT_TEXT[event.kind].format(
+        actor=event.actor,
+        target=event.target,
+        amount=event.amount,
+        status=event.status,
+        extra=event.extra,
+        skill_name=skill_name,
+        skill_description=skill_description,
+    )
+
+
+def format_logs(events: Iterable[Event]) -> List[str]:
+    return [format_event(event) for event in events]
+
+
+def console_sink(event: Event) -> None:
+    print(format_event(event))
+
+
+class FileSink:
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def __call__(self, event: Event) -> None:
+        self.stream.write(format_event(event) + "\n")
+
+
+class ContentError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class EnemyProfile:
+    name: str
+    hp: int
+    hp_per_stage: int
+    attack_probability: float
+
+
+@dataclass(frozen=True)
+class Content:
+    inner_skills: Tuple[InnerSkill, ...]
+    outer_skills: Tuple[OuterSkill, ...]
+    enemy_profiles: Tuple[EnemyProfile, ...]
+    transmute_conversions: Tuple[Tuple[str, int, str], ...]
+
+
+def require(condition: bool, where: str, message: str) -> None:
+    if not condition:
+        raise ContentError(f"{where}: {message}")
+
+
+def is_number(value: object) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_effect(effect: object, where: str, allowed: Iterable[EffectType], overflow: bool = False) -> Dict[str, object]:
+    require(isinstance(effect, dict), where, "效果必须是对象")
+    effect_type = effect.get("type")
+    require(effect_type in allowed, where, f"不支持的效果类型 {effect_type!r}")
+    for name in EFFECT_FIELDS[effect_type]:
+        require(name in effect, where, f"缺少字段 {name}")
+        value = effect[name]
+        if name == "status":
+            require(value in STATUS_INDEX, where, f"未知状态 {value!r}")
+        elif name == "multiplier":
+            require(is_number(value) and value >= 0, where, f"{name} 必须是非负数")
+        elif not (overflow and value == "overflow"):
+            require(isinstance(value, int) and not isinstance(value, bool), where, f"{name} 必须是整数")
+    return FrozenDict(effect)
+
+
+def parse_content(data: Dict[str, object]) -> Content:
+    inner_skills: List[InnerSkill] = []
+    outer_skills: List[OuterSkill] = []
+    seen: Dict[str, str] = {}
+    for entry in data.get("inner_skills", []):
+        where = f"内功 {entry.get('id')!r}"
+        require(isinstance(entry.get("id"), str) and entry["id"] not in seen, where, "id 缺失或重复")
+        hooks: Dict[str, Tuple[Dict[str, object], ...]] = {}
+        for hook, effects in entry.get("hooks", {}).items():
+            require(hook in INNER_HOOK_EFFECTS, where, f"未知钩子 {hook!r}")
+            hooks[hook] = tuple(
+                validate_effect(effect, f"{where}.{hook}", INNER_HOOK_EFFECTS[hook], hook == "onQiOverflow") for effect in effects
+            )
+        seen[entry["id"]] = where
+        inner_skills.append(
+            InnerSkill(entry["id"], str(entry.get("name", entry["id"])), str(entry.get("description", "")), FrozenDict(hooks))
+        )
+    for entry in data.get("outer_skills", []):
+        where = f"外功 {entry.get('id')!r}"
+        require(isinstance(entry.get("id"), str) and entry["id"] not in seen, where, "id 缺失或重复")
+        require(entry.get("trigger") in OUTER_TRIGGERS, where, f"未知触发时机 {entry.get('trigger')!r}")
+        chance = entry.get("chance", 1.0)
+        require(is_number(chance) and 0 < chance <= 1, where, "chance 必须在 (0, 1] 之间")
+        effect = validate_effect(entry.get("effect"), where, OUTER_EFFECTS)
+        seen[entry["id"]] = where
+        outer_skills.append(
+            OuterSkill(entry["id"], str(entry.get("name", entry["id"])), str(entry.get("description", "")), entry["trigger"], effect, float(chance))
+        )
+    profiles: List[EnemyProfile] = []
+    for entry in data.get("enemy_profiles", []):
+        where = f"敌人 {entry.get('name')!r}"
+        require(isinstance(entry.get("name"), str), where, "缺少 name")
+        require(isinstance(entry.get("hp"), int) and entry["hp"] > 0, where, "hp 必须是正整数")
+        require(isinstance(entry.get("hp_per_stage", 0), int), where, "hp_per_stage 必须是整数")
+        probability = entry.get("attack_probability")
+        require(is_number(probability) and 0 <= probability <= 1, where, "attack_probability 必须在 [0, 1] 之间")
+        profiles.append(EnemyProfile(entry["name"], entry["hp"], entry.get("hp_per_stage", 0), float(probability)))
+    conversions: List[Tuple[str, int, str]] = []
+    for entry in data.get("transmute_conversions", []):
+        where = f"化劲转化 {entry.get('status')!r}"
+        require(entry.get("status") in STATUS_INDEX, where, "未知状态")
+        require(isinstance(entry.get("value"), int) and entry["value"] > 0, where, "value 必须是正整数")
+        require(entry.get("type") in TRANSMUTE_TYPES, where, f"type 必须是 {', '.join(TRANSMUTE_TYPES)} 之一")
+        conversions.append((entry["status"], entry["value"], entry["type"]))
+    require(bool(inner_skills), "内容文件", "至少需要一个内功")
+    require(bool(profiles), "内容文件", "至少需要一个敌人")
+    return Content(tuple(inner_skills), tuple(outer_skills), tuple(profiles), tuple(conversions))
+
+
+def content_cache_path(path: str) -> str:
+    return os.path.join(os.path.dirname(path), "__pycache__", f"{os.path.basename(path)}.pickle")
+
+
+def content_data(content: Content) -> Tuple[list, list, list, list]:
+    return (
+        [
+            (skill.id, skill.name, skill.description, {hook: [dict(effect) for effect in effects] for hook, effects in skill.hooks.items()})
+            for skill in content.inner_skills
+        ],
+        [(skill.id, skill.name, skill.description, skill.trigger, dict(skill.effect), skill.chance) for skill in content.outer_skills],
+        [(profile.name, profile.hp, profile.hp_per_stage, profile.attack_probability) for profile in content.enemy_profiles],
+        list(content.transmute_conversions),
+    )
+
+
+def content_from_data(data: Tuple[list, list, list, list]) -> Content:
+    inner_skills, outer_skills, profiles, conversions = data
+    return Content(
+        tuple(
+            InnerSkill(skill_id, name, description, FrozenDict({hook: tuple(map(FrozenDict, effects)) for hook, effects in hooks.items()}))
+            for skill_id, name, description, hooks in inner_skills
         ),
-        InnerSkill(
-            id="withered_zen",
-            name="枯禅定",
-            description="连续2回合不攻击，下次攻击伤害翻倍",
-            hooks={},
+        tuple(
+            OuterSkill(skill_id, name, description, trigger, FrozenDict(effect), chance)
+            for skill_id, name, description, trigger, effect, chance in outer_skills
         ),
-    ]
+        tuple(EnemyProfile(*profile) for profile in profiles),
+        tuple(tuple(conversion) for conversion in conversions),
+    )
+
+
+def load_content(path: str = CONTENT_PATH, use_cache: bool = True) -> Content:
+    status = os.stat(path)
+    key = (CONTENT_CACHE_VERSION, status.st_mtime_ns, status.st_size)
+    cache_path = content_cache_path(path)
+    if use_cache:
+        try:
+            with open(cache_path, "rb") as handle:
+                cached_key, data = pickle.load(handle)
+            if cached_key == key:
+                return content_from_data(data)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, TypeError, ValueError):
+            pass
+    with open(path, encoding="utf-8") as handle:
+        content = parse_content(json.load(handle))
+    if not use_cache:
+        return content
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as handle:
+            pickle.dump((key, content_data(content)), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, cache_path)
+    except OSError:
+        pass
+    return content
+
+
+@lru_cache(maxsize=None)
+def game_content() -> Content:
+    return load_content(CONTENT_PATH)
+
+
+def create_inner_skills() -> List[InnerSkill]:
+    return list(game_content().inner_skills)
 
 
 def create_outer_pool() -> List[OuterSkill]:
-    return [
-        OuterSkill("shock", "震伤", "命中后附加1层震伤。", "onHit", {"type": "addStatus", "status": "shock", "amount": 1}),
-        OuterSkill(
-            "combo",
-            "连击",
-            "目标有震伤时，追加上次攻击50%伤害。",
-            "onHit",
-            {"type": "repeatLastAction", "multiplier": 0.5, "requires": "shock"},
-            0.7,
-        ),
-        OuterSkill("consume_shock", "化劲", "消耗目标震伤层数，每层造成3点真实伤害。", "onHit", {"type": "consumeStatus", "status": "shock", "perStackDamage": 3}),
-        OuterSkill("recover_qi", "回气", "回合开始时获得1点气。", "onTurnStart", {"type": "gainQi", "amount": 1}),
-        OuterSkill("counter_shock", "反震", "防御触发时给对手附加1层震伤。", "onDefense", {"type": "addStatus", "status": "shock", "amount": 1}),
-        OuterSkill("quick_strike", "快斩", "出手时追加2点伤害。", "onAttack", {"type": "dealDamage", "amount": 2}, 0.6),
-        OuterSkill("bleed", "破甲", "命中后附加1层易伤。", "onHit", {"type": "addStatus", "status": "vulnerable", "amount": 1}, 0.7),
-        OuterSkill("drain", "引气", "命中后获得1点气。", "onHit", {"type": "gainQi", "amount": 1}, 0.7),
-        OuterSkill("surge", "气爆", "有气时出手追加3点伤害。", "onAttack", {"type": "dealDamage", "amount": 3, "requires": "qi"}, 0.5),
-        OuterSkill("steady", "稳守", "防御触发时获得1层护体真气。", "onDefense", {"type": "addStatus", "status": "shield_qi", "amount": 1}, 0.6),
-        OuterSkill("frenzy", "狂躁", "回合开始时获得1层狂躁。", "onTurnStart", {"type": "addStatus", "status": "frenzy", "amount": 1}, 0.4),
-        OuterSkill("riposte", "回风", "防御触发时反击造成上次攻击40%伤害。", "onDefense", {"type": "repeatLastAction", "multiplier": 0.4}, 0.5),
-        OuterSkill("crit_focus", "凝神", "回合开始时获得1层凝神。", "onTurnStart", {"type": "addStatus", "status": "crit_focus", "amount": 1}, 0.6),
-        OuterSkill("pierce", "破势", "命中后造成2点真实伤害。", "onHit", {"type": "dealDamage", "amount": 2, "true": True}, 0.6),
-        OuterSkill("echo", "回响", "命中后追加上次攻击30%伤害。", "onHit", {"type": "repeatLastAction", "multiplier": 0.3}, 0.5),
-        OuterSkill("shield_break", "破盾", "消耗对手护体真气，每层造成2点真实伤害。", "onHit", {"type": "consumeStatus", "status": "shield_qi", "perStackDamage": 2}),
-        OuterSkill("focus", "聚气", "回合开始时获得2点气。", "onTurnStart", {"type": "gainQi", "amount": 2}, 0.4),
-        OuterSkill("sunder", "碎甲", "命中后附加2层易伤。", "onHit", {"type": "addStatus", "status": "vulnerable", "amount": 2}, 0.4),
-        OuterSkill("vitality", "回春", "回合开始时回复2点生命。", "onTurnStart", {"type": "heal", "amount": 2}, 0.5),
-        OuterSkill("backlash", "内伤反噬", "防御触发时对对手造成2点伤害。", "onDefense", {"type": "dealDamage", "amount": 2}, 0.6),
-    ]
+    return list(game_content().outer_skills)
 
 
 def gain_qi(actor: Actor, amount: int, ctx: BattleContext) -> None:
     if amount <= 0:
         return
-    actor.qi += amount
-    overflow = max(0, actor.qi - actor.max_qi)
-    if overflow > 0:
-        actor.qi = actor.max_qi
-        for effect in actor.inner_skill.hooks.get("onQiOverflow", []):
-            if effect["type"] == "addStatus":
-                actor.add_status(str(effect["status"]), overflow)
-                log(ctx, f"{actor.name} 气溢出，转换为护体真气+{overflow}。")
+    qi = actor.qi + amount
+    if qi <= actor.max_qi:
+        actor.qi = qi
+        return
+    overflow = qi - actor.max_qi
+    actor.qi = actor.max_qi
+    for effect in actor.inner_skill.hooks.get("onQiOverflow", []):
+        if effect["type"] == "addStatus":
+            actor.add_status(str(effect["status"]), overflow)
+            if not ctx.quiet:
+                log(ctx, "qi_overflow", actor.name, amount=overflow, status="shield_qi")
 
 
 def heal(actor: Actor, amount: int, ctx: BattleContext) -> None:
@@ -179,7 +539,7 @@ def heal(actor: Actor, amount: int, ctx: BattleContext) -> None:
         return
     before = actor.hp
     actor.hp = min(actor.max_hp, actor.hp + amount)
-    log(ctx, f"{actor.name} 回复 {actor.hp - before} 生命。")
+    log(ctx, "heal", actor.name, amount=actor.hp - before)
 
 
 def apply_damage(actor: Actor, amount: int, ctx: BattleContext, true_damage: bool = False) -> int:
@@ -187,21 +547,36 @@ def apply_damage(actor: Actor, amount: int, ctx: BattleContext, true_damage: boo
         return 0
     damage = amount
     if not true_damage:
-        vulnerable = actor.get_status_stacks("vulnerable")
+        stacks = actor.status_stacks
+        vulnerable = stacks[VULNERABLE]
         if vulnerable > 0:
             damage += vulnerable
-        shield = actor.get_status_stacks("shield_qi")
+        shield = stacks[SHIELD_QI]
         if shield > 0:
             absorbed = min(shield, damage)
-            actor.statuses["shield_qi"].stacks -= absorbed
-            if actor.statuses["shield_qi"].stacks <= 0:
-                del actor.statuses["shield_qi"]
+            stacks[SHIELD_QI] = shield - absorbed
             damage -= absorbed
-            log(ctx, f"{actor.name} 护体真气抵消 {absorbed} 伤害。")
-    actor.hp = max(0, actor.hp - damage)
+            log(ctx, "shield_absorb", actor.name, amount=absorbed, status="shield_qi")
+    hp = actor.hp - damage
+    actor.hp = hp if hp > 0 else 0
     return damage
 
 
+def roll(ctx: BattleContext, probability: float, inclusive: bool = False, actor: str = "", slot: str = "") -> bool:
+    if ctx.roller is not None:
+        return ctx.roller(probability, actor, slot)
+    value = ctx.rng.random()
+    return value <= probability if inclusive else value < probability
+
+
+def trigger_chance_bonus(actor: Actor) -> float:
+    bonus = 0.0
+    if actor.inner_skill.id == "blood_war" and actor.hp <= actor.max_hp * 0.5:
+        bonus += 0.5
+    bonus += actor.status_stacks[FRENZY] * 0.1
+    return bonus
+
+
 def trigger_outer_skills(
     actor: Actor,
     target: Actor,
@@ -209,61 +584,160 @@ def trigger_outer_skills(
     ctx: BattleContext,
     last_attack: Optional[AttackResult],
 ) -> None:
-    for skill in actor.outer_skills:
-        if skill.trigger != trigger:
-            continue
-        bonus = 0.0
-        if actor.inner_skill.id == "blood_war" and actor.hp <= actor.max_hp * 0.5:
-            bonus += 0.5
-        bonus += actor.get_status_stacks("frenzy") * 0.1
-        chance = min(1.0, skill.chance * (1 + bonus))
-        if ctx.rng.random() > chance:
-            continue
-        execute_effect(actor, target, skill.effect, ctx, last_attack)
-        log(ctx, f"{actor.name} 触发外功《{skill.name}》。")
+    if not actor.outer_skills:
+        return
+    compiled_skills = actor.skill_dispatch().get(trigger)
+    if not compiled_skills:
+        return
+    if ctx.timer is None:
+        resolve_chain(actor, target, compiled_skills, last_attack, ctx)
+    else:
+        timed(ctx.timer, "trigger", trigger, resolve_chain, actor, target, compiled_skills, last_attack, ctx)
 
 
-def execute_effect(
+def resolve_chain(
     actor: Actor,
     target: Actor,
-    effect: Dict[str, object],
-    ctx: BattleContext,
+    compiled_skills: List[CompiledSkill],
     last_attack: Optional[AttackResult],
+    ctx: BattleContext,
 ) -> None:
+    chain = ctx.chain
+    budget = ctx.chain_budget
+    timer = ctx.timer
+    bonus = trigger_chance_bonus(actor)
+    for index, compiled in enumerate(compiled_skills):
+        if budget is not None and chain.spent >= budget:
+            chain.dropped += len(compiled_skills) - index
+            return
+        chain.spent += 1
+        if not roll(ctx, min(1.0, compiled.chance * (1 + bonus)), True, actor.name, compiled.skill.id):
+            continue
+        if timer is None:
+            compiled.run(actor, target, ctx, last_attack)
+        else:
+            timed(timer, "skill", compiled.skill.id, compiled.run, actor, target, ctx, last_attack)
+        if not ctx.quiet:
+            log(ctx, "skill_trigger", actor.name, target.name, skill=compiled.skill.id)
+        if compiled.heals_owner:
+            bonus = trigger_chance_bonus(actor)
+
+
+def timed(timer: EngineTimer, category: str, name: str, function: Callable[..., None], *args: object) -> None:
+    started = time.perf_counter()
+    function(*args)
+    timer(category, name, started, time.perf_counter() - started)
+
+
+def end_action(actor: Actor, ctx: BattleContext) -> None:
+    chain = ctx.chain
+    chain.spent = 0
+    if chain.dropped:
+        log(ctx, "chain_truncated", actor.name, amount=chain.dropped)
+        chain.dropped = 0
+
+
+def compile_outer_skills(skills: List[OuterSkill]) -> Dict[TriggerType, List[CompiledSkill]]:
+    dispatch: Dict[TriggerType, List[CompiledSkill]] = {}
+    for skill in skills:
+        compiled = CompiledSkill(
+            skill=skill,
+            chance=skill.chance,
+            run=compile_effect(skill.effect, skill.id),
+            heals_owner=skill.effect["type"] == "heal",
+        )
+        dispatch.setdefault(skill.trigger, []).append(compiled)
+    return dispatch
+
+
+def compile_inner_hook(skill: InnerSkill, hook: str) -> Tuple[EffectFunction, ...]:
+    return tuple(compile_effect(effect) for effect in skill.hooks.get(hook, ()))
+
+
+def compile_effect(effect: Dict[str, object], source: str = "") -> EffectFunction:
     effect_type = effect["type"]
     if effect_type == "addStatus":
         status = str(effect["status"])
+        index = STATUS_INDEX[status]
         amount = int(effect["amount"])
-        target.add_status(status, amount)
-        log(ctx, f"{target.name} 获得状态 {status} +{amount}。")
-    elif effect_type == "dealDamage":
+
+        def add_status(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+            target.status_stacks[index] += amount
+            if not ctx.quiet:
+                log(ctx, "status_gain", actor.name, target.name, amount, status)
+
+        return add_status
+    if effect_type == "dealDamage":
         amount = int(effect["amount"])
-        if effect.get("requires") == "qi" and actor.qi <= 0:
-            return
+        requires_qi = effect.get("requires") == "qi"
         true_damage = bool(effect.get("true", False))
-        dealt = apply_damage(target, amount, ctx, true_damage=true_damage)
-        log(ctx, f"{target.name} 受到 {dealt} 伤害。")
-    elif effect_type == "gainQi":
+
+        def deal_damage(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+            if requires_qi and actor.qi <= 0:
+                return
+            dealt = apply_damage(target, amount, ctx, true_damage=true_damage)
+            if not ctx.quiet:
+                log(ctx, "damage", actor.name, target.name, dealt, skill=source)
+
+        return deal_damage
+    if effect_type == "gainQi":
         amount = int(effect["amount"])
-        gain_qi(actor, amount, ctx)
-        log(ctx, f"{actor.name} 获得 {amount} 气。")
-    elif effect_type == "consumeStatus":
+
+        def gain(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+            gain_qi(actor, amount, ctx)
+            if not ctx.quiet:
+                log(ctx, "qi_gain", actor.name, amount=amount)
+
+        return gain
+    if effect_type == "consumeStatus":
         status = str(effect["status"])
-        stacks = target.consume_status(status)
-        if stacks > 0:
-            damage = stacks * int(effect["perStackDamage"])
-            dealt = apply_damage(target, damage, ctx, true_damage=True)
-            log(ctx, f"{target.name} 被消耗 {status} {stacks} 层，受到 {dealt} 真实伤害。")
-    elif effect_type == "repeatLastAction" and last_attack:
-        if effect.get("requires") == "shock" and target.get_status_stacks("shock") <= 0:
-            return
+        index = STATUS_INDEX[status]
+        per_stack_damage = int(effect["perStackDamage"])
+
+        def consume(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+            stacks = target.status_stacks[index]
+            if stacks > 0:
+                target.status_stacks[index] = 0
+                dealt = apply_damage(target, stacks * per_stack_damage, ctx, true_damage=True)
+                log(ctx, "status_consume", actor.name, target.name, dealt, status, source, (stacks,))
+
+        return consume
+    if effect_type == "repeatLastAction":
         multiplier = float(effect["multiplier"])
-        damage = int(last_attack.damage * multiplier)
-        dealt = apply_damage(target, damage, ctx)
-        log(ctx, f"{actor.name} 连锁攻击造成 {dealt} 伤害。")
-    elif effect_type == "heal":
+        requires_shock = effect.get("requires") == "shock"
+
+        def repeat(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+            if not last_attack:
+                return
+            if requires_shock and target.status_stacks[SHOCK] <= 0:
+                return
+            dealt = apply_damage(target, int(last_attack.damage * multiplier), ctx)
+            if not ctx.quiet:
+                log(ctx, "chain_damage", actor.name, target.name, dealt, skill=source)
+
+        return repeat
+    if effect_type == "heal":
         amount = int(effect["amount"])
-        heal(actor, amount, ctx)
+
+        def restore(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+            heal(actor, amount, ctx)
+
+        return restore
+
+    def noop(actor: Actor, target: Actor, ctx: BattleContext, last_attack: Optional[AttackResult]) -> None:
+        return
+
+    return noop
+
+
+def execute_effect(
+    actor: Actor,
+    target: Actor,
+    effect: Dict[str, object],
+    ctx: BattleContext,
+    last_attack: Optional[AttackResult],
+) -> None:
+    compile_effect(effect)(actor, target, ctx, last_attack)
 
 
 def resolve_inner_on_hit(actor: Actor, target: Actor, ctx: BattleContext) -> None:
@@ -275,76 +749,87 @@ def resolve_inner_on_hit(actor: Actor, target: Actor, ctx: BattleContext) -> Non
             stolen = min(target.qi, amount)
             target.qi -= stolen
             gain_qi(actor, stolen, ctx)
-            log(ctx, f"{actor.name} 偷取 {stolen} 气。")
+            log(ctx, "qi_steal", actor.name, target.name, stolen)
 
 
 def resolve_inner_on_defense(actor: Actor, ctx: BattleContext) -> None:
     for effect in actor.inner_skill.hooks.get("onDefense", []):
         if effect["type"] == "addStatus":
             actor.add_status(str(effect["status"]), int(effect["amount"]))
-            log(ctx, f"{actor.name} 进入反击姿态。")
+            log(ctx, "counter_stance", actor.name, status="counter_ready")
 
 
 def start_turn(actor: Actor, enemy: Actor, ctx: BattleContext) -> None:
-    for effect in actor.inner_skill.hooks.get("onTurnStart", []):
-        execute_effect(actor, enemy, effect, ctx, None)
-    trigger_outer_skills(actor, enemy, "onTurnStart", ctx, None)
+    for run in actor.turn_start_effects():
+        run(actor, enemy, ctx, None)
+    if actor.outer_skills:
+        trigger_outer_skills(actor, enemy, "onTurnStart", ctx, None)
+        end_action(actor, ctx)
 
 
 def end_turn(actor: Actor, ctx: BattleContext) -> None:
-    if "vulnerable" in actor.statuses:
-        actor.statuses["vulnerable"].stacks = max(0, actor.statuses["vulnerable"].stacks - 1)
-        if actor.statuses["vulnerable"].stacks == 0:
-            del actor.statuses["vulnerable"]
-    if "frenzy" in actor.statuses:
-        actor.statuses["frenzy"].stacks = max(0, actor.statuses["frenzy"].stacks - 1)
-        if actor.statuses["frenzy"].stacks == 0:
-            del actor.statuses["frenzy"]
-    if "crit_focus" in actor.statuses:
-        actor.statuses["crit_focus"].stacks = max(0, actor.statuses["crit_focus"].stacks - 1)
-        if actor.statuses["crit_focus"].stacks == 0:
-            del actor.statuses["crit_focus"]
+    stacks = actor.status_stacks
+    for index in DECAYING_STATUSES:
+        if stacks[index] > 0:
+            stacks[index] -= 1
 
 
 def perform_attack(attacker: Actor, defender: Actor, ctx: BattleContext) -> AttackResult:
-    base_damage = 5
-    crit_chance = 0.1 + (0.05 if attacker.get_status_stacks("crit_focus") > 0 else 0)
-    crit = ctx.rng.random() < crit_chance
+    balance = ctx.balance
+    base_damage = balance.base_damage
+    stacks = attacker.status_stacks
+    crit_chance = balance.crit_chance + (0.05 if stacks[CRIT_FOCUS] > 0 else 0)
+    roller = ctx.roller
+    crit = ctx.rng.random() < crit_chance if roller is None else roller(crit_chance, attacker.name, "crit")
     multiplier = 2 if crit else 1
-    if attacker.get_status_stacks("double_strike") > 0:
+    if stacks[DOUBLE_STRIKE] > 0:
         multiplier *= 2
-        attacker.consume_status("double_strike")
-        log(ctx, f"{attacker.name} 枯禅定触发，伤害翻倍！")
+        stacks[DOUBLE_STRIKE] = 0
+        log(ctx, "double_strike", attacker.name, defender.name, status="double_strike")
     damage = base_damage * multiplier
     dealt = apply_damage(defender, damage, ctx)
-    log(ctx, f"{attacker.name} 攻击命中，造成 {dealt} 伤害。")
-    if crit:
-        log(ctx, f"{attacker.name} 暴击！")
+    if not ctx.quiet:
+        log(ctx, "attack_hit", attacker.name, defender.name, dealt)
+        if crit:
+            log(ctx, "crit", attacker.name, defender.name, damage)
+    if 0 <= damage < INTERNED_DAMAGE_LIMIT:
+        return ATTACK_RESULTS[crit][damage]
     return AttackResult(hit=True, crit=crit, damage=damage)
 
 
+def strike(actor: Actor, enemy: Actor, ctx: BattleContext) -> None:
+    trigger_outer_skills(actor, enemy, "onAttack", ctx, None)
+    last_attack = perform_attack(actor, enemy, ctx)
+    if "onHit" in actor.inner_skill.hooks:
+        resolve_inner_on_hit(actor, enemy, ctx)
+    trigger_outer_skills(actor, enemy, "onHit", ctx, last_attack)
+    if last_attack.crit:
+        trigger_outer_skills(actor, enemy, "onCrit", ctx, last_attack)
+    if enemy.status_stacks[COUNTER_READY] > 0:
+        handle_counter(enemy, actor, ctx)
+
+
 def action_phase(actor: Actor, enemy: Actor, ctx: BattleContext) -> None:
-    action_attack = ctx.rng.random() < actor.attack_probability
+    roller = ctx.roller
+    probability = actor.attack_probability
+    action_attack = ctx.rng.random() < probability if roller is None else roller(probability, actor.name, "action")
     if action_attack:
         actor.turns_without_attack = 0
-        trigger_outer_skills(actor, enemy, "onAttack", ctx, None)
-        last_attack = perform_attack(actor, enemy, ctx)
-        resolve_inner_on_hit(actor, enemy, ctx)
-        trigger_outer_skills(actor, enemy, "onHit", ctx, last_attack)
-        if last_attack.crit:
-            trigger_outer_skills(actor, enemy, "onCrit", ctx, last_attack)
-        handle_counter(enemy, actor, ctx)
+        strike(actor, enemy, ctx)
     else:
         actor.turns_without_attack += 1
-        log(ctx, f"{actor.name} 选择防御。")
-        resolve_inner_on_defense(actor, ctx)
+        if not ctx.quiet:
+            log(ctx, "defend", actor.name, enemy.name)
+        if "onDefense" in actor.inner_skill.hooks:
+            resolve_inner_on_defense(actor, ctx)
         trigger_outer_skills(actor, enemy, "onDefense", ctx, None)
         if actor.inner_skill.id == "withered_zen" and actor.turns_without_attack >= 2:
             actor.add_status("double_strike", 1)
-            log(ctx, f"{actor.name} 枯禅定蓄力完成。")
+            log(ctx, "zen_charged", actor.name, status="double_strike")
+    end_action(actor, ctx)
 
 
-def choose_player_intent() -> str:
+def choose_player_intent(player: Actor, enemy: Actor, ctx: BattleContext) -> str:
     print("\n请选择出招意图：1【进】2【守】3【化】")
     print("PC: 1/2/3 | 手柄: X/Y/B | 手机: 点击按钮")
     choice = input("请输入选择: ").strip()
@@ -354,52 +839,48 @@ def choose_player_intent() -> str:
 
 
 def show_battle_status(player: Actor, enemy: Actor, ctx: BattleContext) -> None:
+    if ctx.quiet:
+        return
     log(
         ctx,
-        (
-            f"{player.name} 生命:{player.hp}/{player.max_hp} 气:{player.qi}/{player.max_qi}"
-            f" | {enemy.name} 生命:{enemy.hp}/{enemy.max_hp} 气:{enemy.qi}/{enemy.max_qi}"
-        ),
+        "battle_status",
+        player.name,
+        enemy.name,
+        extra=(player.hp, player.max_hp, player.qi, player.max_qi, enemy.hp, enemy.max_hp, enemy.qi, enemy.max_qi),
     )
 
 
 def resolve_transmute(actor: Actor, enemy: Actor, ctx: BattleContext) -> None:
-    conversions = [
-        {"status": "shock", "value": 3, "type": "damage"},
-        {"status": "vulnerable", "value": 2, "type": "damage"},
-        {"status": "frenzy", "value": 1, "type": "qi"},
-        {"status": "shield_qi", "value": 1, "type": "heal"},
-    ]
-    best = None
+    best: Optional[Tuple[str, int, str]] = None
     best_score = 0
-    for conversion in conversions:
-        stacks = actor.get_status_stacks(conversion["status"])
-        score = stacks * conversion["value"]
+    for conversion in game_content().transmute_conversions:
+        score = actor.get_status_stacks(conversion[0]) * conversion[1]
         if score > best_score:
             best_score = score
-            best = {"conversion": conversion, "stacks": stacks}
-    if not best or best_score == 0:
-        log(ctx, f"{actor.name} 化劲失败，没有可用状态。")
+            best = conversion
+    if best is None:
+        log(ctx, "transmute_fail", actor.name)
         return
-    status = best["conversion"]["status"]
-    stacks = best["stacks"]
-    actor.consume_status(status)
-    if best["conversion"]["type"] == "damage":
-        damage = stacks * best["conversion"]["value"]
-        dealt = apply_damage(enemy, damage, ctx, true_damage=True)
-        log(ctx, f"{actor.name} 化劲消耗 {status} {stacks} 层，造成 {dealt} 真实伤害。")
-    elif best["conversion"]["type"] == "qi":
+    status, value, conversion_type = best
+    stacks = actor.consume_status(status)
+    if conversion_type == "damage":
+        dealt = apply_damage(enemy, stacks * value, ctx, true_damage=True)
+        log(ctx, "transmute_damage", actor.name, enemy.name, dealt, status, extra=(stacks,))
+    elif conversion_type == "qi":
         gain_qi(actor, stacks, ctx)
-        log(ctx, f"{actor.name} 化劲转化气 +{stacks}。")
-    elif best["conversion"]["type"] == "heal":
+        log(ctx, "transmute_qi", actor.name, amount=stacks, status=status)
+    elif conversion_type == "heal":
         heal(actor, stacks, ctx)
-        log(ctx, f"{actor.name} 化劲转化护体，回复 {stacks} 生命。")
+        log(ctx, "transmute_heal", actor.name, amount=stacks, status=status)
 
 
-def player_action_phase(actor: Actor, enemy: Actor, ctx: BattleContext) -> None:
+def player_action_phase(actor: Actor, enemy: Actor, ctx: BattleContext, choose_intent: IntentChooser) -> None:
     show_battle_status(actor, enemy, ctx)
-    intent = choose_player_intent()
-    apply_player_intent(actor, enemy, ctx, intent)
+    intent = choose_intent(actor, enemy, ctx)
+    if ctx.timer is None:
+        apply_player_intent(actor, enemy, ctx, intent)
+    else:
+        timed(ctx.timer, "action", f"intent_{intent}", apply_player_intent, actor, enemy, ctx, intent)
     show_battle_status(actor, enemy, ctx)
 
 
@@ -408,53 +889,64 @@ def apply_player_intent(actor: Actor, enemy: Actor, ctx: BattleContext, intent:
         actor.turns_without_attack = 0
         if actor.qi > 0:
             actor.qi -= 1
-            log(ctx, f"{actor.name} 选择【进】，消耗 1 气。")
-        else:
-            log(ctx, f"{actor.name} 选择【进】，但气不足。")
-        trigger_outer_skills(actor, enemy, "onAttack", ctx, None)
-        last_attack = perform_attack(actor, enemy, ctx)
-        resolve_inner_on_hit(actor, enemy, ctx)
-        trigger_outer_skills(actor, enemy, "onHit", ctx, last_attack)
-        if last_attack.crit:
-            trigger_outer_skills(actor, enemy, "onCrit", ctx, last_attack)
-        handle_counter(enemy, actor, ctx)
+            if not ctx.quiet:
+                log(ctx, "intent_attack", actor.name, enemy.name, 1)
+        elif not ctx.quiet:
+            log(ctx, "intent_attack_no_qi", actor.name, enemy.name)
+        strike(actor, enemy, ctx)
     elif intent == "2":
         actor.turns_without_attack += 1
         gain_qi(actor, 1, ctx)
-        log(ctx, f"{actor.name} 选择【守】，回复 1 气。")
-        resolve_inner_on_defense(actor, ctx)
+        if not ctx.quiet:
+            log(ctx, "intent_defend", actor.name, enemy.name, 1)
+        if "onDefense" in actor.inner_skill.hooks:
+            resolve_inner_on_defense(actor, ctx)
         trigger_outer_skills(actor, enemy, "onDefense", ctx, None)
         if actor.inner_skill.id == "withered_zen" and actor.turns_without_attack >= 2:
             actor.add_status("double_strike", 1)
-            log(ctx, f"{actor.name} 枯禅定蓄力完成。")
+            log(ctx, "zen_charged", actor.name, status="double_strike")
     else:
         actor.turns_without_attack += 1
-        log(ctx, f"{actor.name} 选择【化】，开始转化状态。")
+        log(ctx, "intent_transmute", actor.name, enemy.name)
         resolve_transmute(actor, enemy, ctx)
         if actor.inner_skill.id == "withered_zen" and actor.turns_without_attack >= 2:
             actor.add_status("double_strike", 1)
-            log(ctx, f"{actor.name} 枯禅定蓄力完成。")
+            log(ctx, "zen_charged", actor.name, status="double_strike")
+    end_action(actor, ctx)
 
 
 def handle_counter(defender: Actor, attacker: Actor, ctx: BattleContext) -> None:
-    if defender.get_status_stacks("counter_ready") <= 0:
-        return
-    defender.consume_status("counter_ready")
-    log(ctx, f"{defender.name} 反击发动！")
+    defender.status_stacks[COUNTER_READY] = 0
+    log(ctx, "counter", defender.name, attacker.name, status="counter_ready")
     last_attack = perform_attack(defender, attacker, ctx)
-    resolve_inner_on_hit(defender, attacker, ctx)
+    if "onHit" in defender.inner_skill.hooks:
+        resolve_inner_on_hit(defender, attacker, ctx)
     trigger_outer_skills(defender, attacker, "onHit", ctx, last_attack)
 
 
-def create_enemy(stage: int, rng: random.Random) -> Actor:
-    profiles = [
-        ("高攻", 18 + stage * 2, 0.75),
-        ("高防", 26 + stage * 3, 0.55),
-        ("高频", 20 + stage * 2, 0.85),
-    ]
-    name, hp, attack_probability = rng.choice(profiles)
-    inner_skills = create_inner_skills()
-    inner_skill = rng.choice(inner_skills)
+def stage_profile(profile: EnemyProfile, stage: int, balance: Balance = DEFAULT_BALANCE) -> Tuple[str, int, float]:
+    hp = profile.hp + stage * profile.hp_per_stage
+    attack_probability = profile.attack_probability
+    if balance.enemy_hp_scale != 1.0:
+        hp = max(1, round(hp * balance.enemy_hp_scale))
+    if balance.enemy_attack_scale != 1.0:
+        attack_probability = min(1.0, attack_probability * balance.enemy_attack_scale)
+    return profile.name, hp, attack_probability
+
+
+def enemy_profiles(stage: int, balance: Balance = DEFAULT_BALANCE) -> List[Tuple[str, int, float]]:
+    return [stage_profile(profile, stage, balance) for profile in game_content().enemy_profiles]
+
+
+def create_enemy(stage: int, rng: random.Random, balance: Balance = DEFAULT_BALANCE) -> Actor:
+    content = game_content()
+    profile = rng.choice(content.enemy_profiles)
+    inner_skill = rng.choice(content.inner_skills)
+    return build_enemy(stage_profile(profile, stage, balance), inner_skill)
+
+
+def build_enemy(profile: Tuple[str, int, float], inner_skill: InnerSkill) -> Actor:
+    name, hp, attack_probability = profile
     return Actor(
         name=f"敌人-{name}",
         hp=hp,
@@ -469,12 +961,23 @@ def create_enemy(stage: int, rng: random.Random) -> Actor:
 
 
 def choose_inner_skill(rng: random.Random) -> InnerSkill:
-    skills = create_inner_skills()
-    return rng.choice(skills)
+    return rng.choice(game_content().inner_skills)
 
 
-def choose_outer_skill(pool: List[OuterSkill], rng: random.Random, ctx: BattleContext) -> OuterSkill:
-    options = pick_outer_skill_options(pool, rng, ctx)
+def create_player(inner_skill: InnerSkill) -> Actor:
+    return Actor(
+        name="侠客",
+        hp=30,
+        max_hp=30,
+        qi=3,
+        max_qi=8,
+        inner_skill=inner_skill,
+        outer_skills=[],
+        attack_probability=0.7,
+    )
+
+
+def choose_outer_skill(options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
     choice = ""
     while choice not in {"1", "2", "3"}:
         choice = input("请选择外功 (1/2/3): ").strip()
@@ -483,26 +986,95 @@ def choose_outer_skill(pool: List[OuterSkill], rng: random.Random, ctx: BattleCo
 
 def pick_outer_skill_options(pool: List[OuterSkill], rng: random.Random, ctx: BattleContext) -> List[OuterSkill]:
     options = rng.sample(pool, 3)
-    log(ctx, "可选外功：")
+    log(ctx, "reward_options")
     for index, skill in enumerate(options, start=1):
-        log(ctx, f"{index}) {skill.name} - {skill.description}")
+        log(ctx, "reward_option", amount=index, skill=skill.id)
     return options
 
 
-def battle(player: Actor, enemy: Actor, ctx: BattleContext) -> bool:
-    turn = 1
-    while player.is_alive() and enemy.is_alive():
-        log(ctx, f"\n=== 回合 {turn} ===")
-        start_turn(player, enemy, ctx)
-        start_turn(enemy, player, ctx)
-        player_action_phase(player, enemy, ctx)
-        if not enemy.is_alive():
-            break
-        action_phase(enemy, player, ctx)
-        end_turn(player, ctx)
-        end_turn(enemy, ctx)
+def battle(
+    player: Actor,
+    enemy: Actor,
+    ctx: BattleContext,
+    choose_intent: IntentChooser = choose_player_intent,
+    max_turns: Optional[int] = None,
+    first_turn: int = 1,
+) -> bool:
+    turn = first_turn
+    while player.hp > 0 and enemy.hp > 0:
+        if max_turns is not None and turn > max_turns:
+            log(ctx, "turn_limit", player.name, enemy.name, max_turns)
+            return False
+        ctx.turn = turn
+        if not ctx.quiet:
+            log(ctx, "turn_start", player.name, enemy.name, turn)
+        play_turn(player, enemy, ctx, choose_intent)
         turn += 1
-    return player.is_alive()
+    return player.hp > 0
+
+
+def play_turn(player: Actor, enemy: Actor, ctx: BattleContext, choose_intent: IntentChooser) -> None:
+    start_turn(player, enemy, ctx)
+    start_turn(enemy, player, ctx)
+    player_action_phase(player, enemy, ctx, choose_intent)
+    finish_turn(player, enemy, ctx)
+
+
+def finish_turn(player: Actor, enemy: Actor, ctx: BattleContext) -> None:
+    if enemy.hp <= 0:
+        return
+    if ctx.timer is None:
+        action_phase(enemy, player, ctx)
+    else:
+        timed(ctx.timer, "action", "enemy_action", action_phase, enemy, player, ctx)
+    end_turn(player, ctx)
+    end_turn(enemy, ctx)
+
+
+def start_run(ctx: BattleContext) -> RunState:
+    inner_skill = choose_inner_skill(ctx.rng)
+    state = RunState(create_player(inner_skill))
+    log(ctx, "run_start", state.player.name, skill=inner_skill.id)
+    return state
+
+
+def play_run(
+    ctx: BattleContext,
+    outer_pool: List[OuterSkill],
+    choose_intent: IntentChooser = choose_player_intent,
+    choose_reward: RewardChooser = choose_outer_skill,
+    max_stages: Optional[int] = None,
+    max_turns: Optional[int] = None,
+    state: Optional[RunState] = None,
+    checkpoint: Optional[StageHook] = None,
+) -> Tuple[Actor, int]:
+    if state is None:
+        state = start_run(ctx)
+    player = state.player
+    stage = state.stage
+    while player.is_alive():
+        ctx.stage = stage
+        enemy = state.enemy
+        if enemy is None:
+            if checkpoint is not None:
+                checkpoint(state, ctx)
+            enemy = create_enemy(stage, ctx.rng, ctx.balance)
+            log(ctx, "stage_start", player.name, enemy.name, stage)
+        win = battle(player, enemy, ctx, choose_intent, max_turns, state.turn)
+        state.enemy = None
+        state.turn = 1
+        if not win:
+            break
+        if max_stages is not None and stage >= max_stages:
+            return player, stage
+        log(ctx, "victory", player.name)
+        options = pick_outer_skill_options(outer_pool, ctx.rng, ctx)
+        reward = choose_reward(options, player, ctx)
+        player.add_outer_skill(reward)
+        log(ctx, "reward_gain", player.name, skill=reward.id)
+        stage += 1
+        state.stage = stage
+    return player, stage - 1
 
 
 def show_instructions() -> None:
@@ -543,7 +1115,7 @@ def show_instructions() -> None:
 
 def run_game(seed: Optional[int] = None) -> None:
     rng = random.Random(seed)
-    ctx = BattleContext(rng=rng, logs=[])
+    ctx = BattleContext(rng=rng, sinks=[console_sink])
     outer_pool = create_outer_pool()
 
     while True:
@@ -562,31 +1134,8 @@ def run_game(seed: Optional[int] = None) -> None:
             print("无效选择，请重试。")
             continue
         ctx.logs.clear()
-        inner_skill = choose_inner_skill(rng)
-        player = Actor(
-            name="侠客",
-            hp=30,
-            max_hp=30,
-            qi=3,
-            max_qi=8,
-            inner_skill=inner_skill,
-            outer_skills=[],
-            attack_probability=0.7,
-        )
-        log(ctx, f"\n新局开始：内功选择《{inner_skill.name}》")
-        stage = 1
-        while player.is_alive():
-            enemy = create_enemy(stage, rng)
-            log(ctx, f"\n进入关卡 {stage}，遭遇 {enemy.name}。")
-            win = battle(player, enemy, ctx)
-            if not win:
-                break
-            log(ctx, f"\n胜利！进入奖励阶段。")
-            reward = choose_outer_skill(outer_pool, rng, ctx)
-            player.outer_skills.append(reward)
-            log(ctx, f"获得外功《{reward.name}》。")
-            stage += 1
-        log(ctx, "\n战斗失败，结算结束。")
+        play_run(ctx, outer_pool)
+        log(ctx, "run_over")
         restart = input("是否重开？(y/n): ").strip().lower()
         if restart != "y":
             print("返回主菜单。")
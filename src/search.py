@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import argparse
+import copy
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from roguelike import Actor, BattleContext, OuterSkill, apply_player_intent, create_outer_pool, finish_turn, start_turn
+from simulate import DEFAULT_MAX_STAGES, DEFAULT_MAX_TURNS, policy_seed, simulate_run
+from snapshot import BattleSnapshot, capture_battle, fork_battle
+
+
+INTENTS = ("1", "2", "3")
+DEFAULT_ITERATIONS = 300
+DEFAULT_HORIZON = 12
+DEFAULT_EXPLORATION = 1.4
+
+
+@dataclass
+class SearchNode:
+    visits: int = 0
+    value: float = 0.0
+    children: Dict[str, SearchNode] = field(default_factory=dict)
+
+    def select(self, exploration: float) -> str:
+        for intent in INTENTS:
+            if intent not in self.children:
+                return intent
+        log_visits = math.log(self.visits)
+        return max(INTENTS, key=lambda intent: self.children[intent].score(log_visits, exploration))
+
+    def score(self, log_visits: float, exploration: float) -> float:
+        return self.value / self.visits + exploration * math.sqrt(log_visits / self.visits)
+
+    def best_intent(self) -> str:
+        return max(self.children, key=lambda intent: (self.children[intent].visits, self.children[intent].value))
+
+    def absorb(self, other: SearchNode, base: Optional[SearchNode]) -> None:
+        self.visits += other.visits - (base.visits if base else 0)
+        self.value += other.value - (base.value if base else 0.0)
+        for intent, child in other.children.items():
+            mine = self.children.setdefault(intent, SearchNode())
+            mine.absorb(child, base.children.get(intent) if base else None)
+
+
+def advance(player: Actor, enemy: Actor, ctx: BattleContext, intent: str) -> bool:
+    apply_player_intent(player, enemy, ctx, intent)
+    finish_turn(player, enemy, ctx)
+    if not player.is_alive() or not enemy.is_alive():
+        return True
+    ctx.turn += 1
+    start_turn(player, enemy, ctx)
+    start_turn(enemy, player, ctx)
+    return not player.is_alive() or not enemy.is_alive()
+
+
+def evaluate_position(player: Actor, enemy: Actor) -> float:
+    if not player.is_alive():
+        return 0.0
+    if not enemy.is_alive():
+        return 0.5 + 0.5 * player.hp / player.max_hp
+    return 0.25 * (player.hp / player.max_hp + 1 - enemy.hp / enemy.max_hp)
+
+
+def rollout_intent(player: Actor, rng: random.Random) -> str:
+    return "1" if rng.random() < player.attack_probability else "2"
+
+
+def playout(
+    root: SearchNode,
+    snapshot: BattleSnapshot,
+    player: Actor,
+    enemy: Actor,
+    rng: random.Random,
+    horizon: int,
+    exploration: float,
+) -> None:
+    player, enemy, ctx = fork_battle(snapshot, player, enemy, rng)
+    node = root
+    path = [root]
+    expanded = False
+    for _ in range(horizon):
+        if expanded:
+            intent = rollout_intent(player, rng)
+        else:
+            intent = node.select(exploration)
+            if intent not in node.children:
+                node.children[intent] = SearchNode()
+                expanded = True
+            node = node.children[intent]
+            path.append(node)
+        if advance(player, enemy, ctx, intent):
+            break
+    value = evaluate_position(player, enemy)
+    for visited in path:
+        visited.visits += 1
+        visited.value += value
+
+
+def run_search(
+    root: SearchNode,
+    snapshot: BattleSnapshot,
+    player: Actor,
+    enemy: Actor,
+    seed: int,
+    iterations: Optional[int],
+    time_limit: Optional[float],
+    horizon: int = DEFAULT_HORIZON,
+    exploration: float = DEFAULT_EXPLORATION,
+) -> SearchNode:
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    count = 0
+    while (iterations is None or count < iterations) and (deadline is None or time.perf_counter() < deadline):
+        playout(root, snapshot, player, enemy, rng, horizon, exploration)
+        count += 1
+    return root
+
+
+class SearchPolicy:
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        iterations: Optional[int] = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None,
+        workers: int = 1,
+        horizon: int = DEFAULT_HORIZON,
+        exploration: float = DEFAULT_EXPLORATION,
+        pool: Optional[ProcessPoolExecutor] = None,
+    ) -> None:
+        if iterations is None and time_limit is None:
+            raise ValueError("iterations 与 time_limit 至少需要设置一个")
+        self.rng = random.Random(seed)
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.workers = workers
+        self.horizon = horizon
+        self.exploration = exploration
+        self.pool = pool
+        self.owns_pool = pool is None
+        self.root = SearchNode()
+        self.enemy: Optional[Actor] = None
+        self.turn = 0
+        self.decisions = 0
+        self.search_time = 0.0
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        started = time.perf_counter()
+        if enemy is not self.enemy or ctx.turn != self.turn + 1:
+            self.root = SearchNode()
+        snapshot = capture_battle(player, enemy, ctx, include_rng=False)
+        if self.workers > 1:
+            self.search_parallel(snapshot, player, enemy)
+        else:
+            run_search(
+                self.root,
+                snapshot,
+                player,
+                enemy,
+                self.rng.getrandbits(64),
+                self.iterations,
+                self.time_limit,
+                self.horizon,
+                self.exploration,
+            )
+        intent = self.root.best_intent()
+        self.root = self.root.children[intent]
+        self.enemy = enemy
+        self.turn = ctx.turn
+        self.decisions += 1
+        self.search_time += time.perf_counter() - started
+        return intent
+
+    def search_parallel(self, snapshot: BattleSnapshot, player: Actor, enemy: Actor) -> None:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        share = None if self.iterations is None else max(1, self.iterations // self.workers)
+        futures = [
+            self.pool.submit(
+                run_search,
+                self.root,
+                snapshot,
+                player,
+                enemy,
+                self.rng.getrandbits(64),
+                share,
+                self.time_limit,
+                self.horizon,
+                self.exploration,
+            )
+            for _ in range(self.workers)
+        ]
+        base = copy.deepcopy(self.root)
+        for future in futures:
+            self.root.absorb(future.result(), base)
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        return options[0]
+
+    def close(self) -> None:
+        if self.pool is not None and self.owns_pool:
+            self.pool.shutdown()
+        self.pool = None
+
+    def __enter__(self) -> SearchPolicy:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="蒙特卡洛树搜索自动选择出招意图")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=None, help=f"每步迭代次数，默认 {DEFAULT_ITERATIONS}")
+    parser.add_argument("--time-limit", type=float, default=None, help="每步思考时间（秒）")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON)
+    parser.add_argument("--max-stages", type=int, default=DEFAULT_MAX_STAGES)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    args = parser.parse_args()
+
+    iterations = args.iterations if args.iterations is not None or args.time_limit is not None else DEFAULT_ITERATIONS
+    outer_pool = create_outer_pool()
+    stages_by_inner: Dict[str, List[int]] = {}
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    decisions = 0
+    search_time = 0.0
+    started = time.perf_counter()
+    try:
+        for index in range(args.runs):
+            seed = args.seed + index
+            with SearchPolicy(policy_seed(seed), iterations, args.time_limit, args.workers, args.horizon, pool=pool) as policy:
+                result = simulate_run(seed, policy, outer_pool, args.max_stages, args.max_turns)
+            stages_by_inner.setdefault(result.inner_skill, []).append(result.stages_cleared)
+            decisions += policy.decisions
+            search_time += policy.search_time
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - started
+
+    print(f"模拟 {args.runs} 局，用时 {elapsed:.2f} 秒，共 {decisions} 次决策")
+    if decisions:
+        print(f"平均每步思考 {search_time / decisions * 1000:.1f} 毫秒")
+    for inner_skill, stages in sorted(stages_by_inner.items()):
+        print(f"{inner_skill}: {len(stages)} 局，平均通关 {sum(stages) / len(stages):.2f}，最高 {max(stages)}")
+
+
+if __name__ == "__main__":
+    main()
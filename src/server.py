@@ -0,0 +1,470 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import random
+import secrets
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from checkpoint import read_actor, write_actor
+from codec import FormatError
+from replay import rng_from_state
+from roguelike import (
+    Actor,
+    BattleContext,
+    Event,
+    OuterSkill,
+    apply_player_intent,
+    create_enemy,
+    create_event_log,
+    create_outer_pool,
+    finish_turn,
+    format_event,
+    log,
+    pick_outer_skill_options,
+    show_battle_status,
+    start_run,
+    start_turn,
+)
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_SWEEP_INTERVAL = 5.0
+SESSION_LOG_CAPACITY = 200
+SESSION_VERSION = 2
+INTENTS = ("1", "2", "3")
+
+
+class SessionError(ValueError):
+    pass
+
+
+def actor_state(actor: Optional[Actor]) -> Optional[Dict[str, object]]:
+    if actor is None:
+        return None
+    return {
+        "name": actor.name,
+        "hp": actor.hp,
+        "max_hp": actor.max_hp,
+        "qi": actor.qi,
+        "max_qi": actor.max_qi,
+        "inner_skill": actor.inner_skill.id,
+        "outer_skills": [skill.id for skill in actor.outer_skills],
+        "statuses": actor.active_statuses(),
+    }
+
+
+def encode_actor(actor: Optional[Actor]) -> Optional[bytes]:
+    if actor is None:
+        return None
+    buffer = bytearray()
+    write_actor(buffer, actor)
+    return bytes(buffer)
+
+
+def decode_actor(data: Optional[bytes], outer_skills: Dict[str, OuterSkill]) -> Optional[Actor]:
+    if data is None:
+        return None
+    try:
+        actor, offset = read_actor(data, 0, outer_skills)
+    except (FormatError, struct.error, IndexError, UnicodeDecodeError) as error:
+        raise SessionError(f"会话存档中的角色无法读取：{error}") from None
+    if offset != len(data):
+        raise SessionError("会话存档中的角色末尾有多余数据")
+    return actor
+
+
+class Session:
+    def __init__(self, session_id: str, seed: int, outer_pool: List[OuterSkill]) -> None:
+        self.id = session_id
+        self.seed = seed
+        self.outer_pool = outer_pool
+        self.outbox: List[Event] = []
+        self.ctx = BattleContext(
+            rng=random.Random(seed),
+            logs=create_event_log(SESSION_LOG_CAPACITY),
+            sinks=[self.outbox.append],
+        )
+        self.state = "battle"
+        self.player: Optional[Actor] = None
+        self.enemy: Optional[Actor] = None
+        self.stage = 1
+        self.turn = 1
+        self.reward_options: List[OuterSkill] = []
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def start(self) -> None:
+        self.player = start_run(self.ctx).player
+        self.begin_stage()
+
+    def begin_stage(self) -> None:
+        self.turn = 1
+        self.ctx.stage = self.stage
+        self.enemy = create_enemy(self.stage, self.ctx.rng)
+        log(self.ctx, "stage_start", self.player.name, self.enemy.name, self.stage)
+        self.begin_turn()
+        self.state = "battle"
+
+    def begin_turn(self) -> None:
+        self.ctx.turn = self.turn
+        log(self.ctx, "turn_start", self.player.name, self.enemy.name, self.turn)
+        start_turn(self.player, self.enemy, self.ctx)
+        start_turn(self.enemy, self.player, self.ctx)
+
+    def player_step(self, intent: object) -> None:
+        if self.state != "battle":
+            raise SessionError("当前不在战斗中")
+        if intent not in INTENTS:
+            raise SessionError("意图只能是 1【进】、2【守】或 3【化】")
+        show_battle_status(self.player, self.enemy, self.ctx)
+        apply_player_intent(self.player, self.enemy, self.ctx, intent)
+        show_battle_status(self.player, self.enemy, self.ctx)
+
+    def enemy_step(self) -> None:
+        finish_turn(self.player, self.enemy, self.ctx)
+        if not self.player.is_alive():
+            log(self.ctx, "run_over")
+            self.state = "over"
+        elif not self.enemy.is_alive():
+            log(self.ctx, "victory", self.player.name)
+            self.reward_options = pick_outer_skill_options(self.outer_pool, self.ctx.rng, self.ctx)
+            self.state = "reward"
+        else:
+            self.turn += 1
+            self.begin_turn()
+
+    def choose_reward(self, index: object) -> None:
+        if self.state != "reward":
+            raise SessionError("当前不在奖励阶段")
+        if not isinstance(index, int) or not 0 <= index < len(self.reward_options):
+            raise SessionError("奖励序号无效")
+        reward = self.reward_options[index]
+        self.player.add_outer_skill(reward)
+        log(self.ctx, "reward_gain", self.player.name, skill=reward.id)
+        self.reward_options = []
+        self.stage += 1
+        self.begin_stage()
+
+    def drain_events(self) -> List[Dict[str, object]]:
+        events = [dict(event._asdict(), text=format_event(event)) for event in self.outbox]
+        self.outbox.clear()
+        return events
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            "type": "state",
+            "id": self.id,
+            "state": self.state,
+            "stage": self.stage,
+            "turn": self.turn,
+            "player": actor_state(self.player),
+            "enemy": actor_state(self.enemy),
+            "options": [
+                {"id": skill.id, "name": skill.name, "description": skill.description} for skill in self.reward_options
+            ],
+        }
+
+    def dump(self) -> Tuple[object, ...]:
+        return (
+            SESSION_VERSION,
+            self.id,
+            self.seed,
+            self.state,
+            self.stage,
+            self.turn,
+            encode_actor(self.player),
+            encode_actor(self.enemy),
+            [skill.id for skill in self.reward_options],
+            self.ctx.rng.getstate(),
+        )
+
+    @classmethod
+    def restore(cls, data: Tuple[object, ...], outer_pool: List[OuterSkill]) -> Session:
+        version, session_id, seed, state, stage, turn, player, enemy, option_ids, rng_state = data
+        if version != SESSION_VERSION:
+            raise SessionError("会话存档版本不兼容")
+        session = cls(session_id, seed, outer_pool)
+        session.ctx.rng = rng_from_state(rng_state)
+        session.state = state
+        session.stage = stage
+        session.turn = turn
+        session.ctx.stage = stage
+        session.ctx.turn = turn
+        pool = {skill.id: skill for skill in outer_pool}
+        session.player = decode_actor(player, pool)
+        session.enemy = decode_actor(enemy, pool)
+        missing = [skill_id for skill_id in option_ids if skill_id not in pool]
+        if missing:
+            raise SessionError(f"会话存档中的外功已不存在：{', '.join(missing)}")
+        session.reward_options = [pool[skill_id] for skill_id in option_ids]
+        return session
+
+
+class Connection:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.session: Optional[Session] = None
+
+    async def send(self, *messages: Dict[str, object]) -> None:
+        self.writer.write(b"".join(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n" for message in messages))
+        await self.writer.drain()
+
+    async def reply(self) -> None:
+        session = self.session
+        events = session.drain_events()
+        if events:
+            await self.send({"type": "events", "events": events}, session.describe())
+        else:
+            await self.send(session.describe())
+
+
+class GameServer:
+    def __init__(
+        self,
+        sessions_dir: str = "sessions",
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+    ) -> None:
+        self.sessions_dir = sessions_dir
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.outer_pool = create_outer_pool()
+        self.sessions: Dict[str, Session] = {}
+        self.attached: Dict[str, Connection] = {}
+        self.evicted = 0
+        self.loaded = 0
+        self.sweeper: Optional[asyncio.Task] = None
+
+    def session_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{session_id}.session")
+
+    def create_session(self, seed: Optional[int]) -> Session:
+        session = Session(secrets.token_hex(8), seed if seed is not None else random.getrandbits(63), self.outer_pool)
+        session.start()
+        self.sessions[session.id] = session
+        return session
+
+    def find_session(self, session_id: object) -> Session:
+        if not isinstance(session_id, str) or not session_id.isalnum():
+            raise SessionError("会话 id 无效")
+        session = self.sessions.get(session_id)
+        if session is not None:
+            return session
+        path = self.session_path(session_id)
+        try:
+            with open(path, "rb") as handle:
+                session = Session.restore(pickle.load(handle), self.outer_pool)
+        except FileNotFoundError:
+            raise SessionError("会话不存在或已结束") from None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as error:
+            raise SessionError(f"会话存档无法读取：{error}") from None
+        os.remove(path)
+        self.sessions[session.id] = session
+        self.loaded += 1
+        return session
+
+    def evict(self, session: Session) -> None:
+        del self.sessions[session.id]
+        self.evicted += 1
+        if session.state == "over":
+            return
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        path = self.session_path(session.id)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as handle:
+            pickle.dump(session.dump(), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def evict_idle(self) -> int:
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [
+            session
+            for session in self.sessions.values()
+            if session.id not in self.attached and session.last_active < deadline
+        ]
+        for session in idle:
+            self.evict(session)
+        return len(idle)
+
+    async def sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.evict_idle()
+
+    def attach(self, connection: Connection, session: Session) -> None:
+        self.detach(connection)
+        previous = self.attached.get(session.id)
+        if previous is not None:
+            previous.session = None
+        self.attached[session.id] = connection
+        connection.session = session
+
+    def detach(self, connection: Connection) -> None:
+        if connection.session is not None and self.attached.get(connection.session.id) is connection:
+            del self.attached[connection.session.id]
+        connection.session = None
+
+    async def dispatch(self, connection: Connection, message: Dict[str, object]) -> None:
+        kind = message.get("type")
+        if kind == "new":
+            seed = message.get("seed")
+            self.attach(connection, self.create_session(seed if isinstance(seed, int) else None))
+        elif kind == "resume":
+            self.attach(connection, self.find_session(message.get("id")))
+        elif connection.session is None:
+            raise SessionError("请先发送 new 或 resume")
+        elif kind == "intent":
+            session = connection.session
+            async with session.lock:
+                session.player_step(message.get("intent"))
+                await asyncio.sleep(0)
+                session.enemy_step()
+        elif kind == "reward":
+            async with connection.session.lock:
+                connection.session.choose_reward(message.get("index"))
+        elif kind != "state":
+            raise SessionError(f"未知消息类型 {kind!r}")
+        connection.session.last_active = time.monotonic()
+        await connection.reply()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = Connection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise SessionError("消息必须是 JSON 对象")
+                    await self.dispatch(connection, message)
+                except ValueError as error:
+                    await connection.send({"type": "error", "message": str(error)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if connection.session is not None:
+                connection.session.last_active = time.monotonic()
+            self.detach(connection)
+            writer.close()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        self.sweeper = asyncio.create_task(self.sweep())
+        return server
+
+    def close(self) -> None:
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+
+
+class GameClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.events: List[Dict[str, object]] = []
+
+    @classmethod
+    async def connect(cls, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> GameClient:
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, message: Dict[str, object]) -> Dict[str, object]:
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        while True:
+            reply = json.loads(await self.reader.readline())
+            if reply["type"] == "events":
+                self.events.extend(reply["events"])
+            elif reply["type"] in ("state", "error"):
+                return reply
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_client(host: str, port: int, seed: int, max_steps: int, latencies: List[float]) -> int:
+    client = await GameClient.connect(host, port)
+    rng = random.Random(seed)
+    try:
+        state = await client.request({"type": "new", "seed": seed})
+        steps = 0
+        while state["state"] != "over" and steps < max_steps:
+            if state["state"] == "battle":
+                message = {"type": "intent", "intent": rng.choice(INTENTS)}
+            else:
+                message = {"type": "reward", "index": rng.randrange(len(state["options"]))}
+            started = time.perf_counter()
+            state = await client.request(message)
+            latencies.append(time.perf_counter() - started)
+            steps += 1
+        return steps
+    finally:
+        await client.close()
+
+
+async def run_load_test(clients: int, max_steps: int, seed: int) -> None:
+    server = GameServer()
+    listener = await server.start(DEFAULT_HOST, 0)
+    port = listener.sockets[0].getsockname()[1]
+    latencies: List[float] = []
+    started = time.perf_counter()
+    steps = await asyncio.gather(*(play_client(DEFAULT_HOST, port, seed + index, max_steps, latencies) for index in range(clients)))
+    elapsed = time.perf_counter() - started
+    live_sessions = len(server.sessions)
+    server.close()
+    listener.close()
+    await listener.wait_closed()
+    latencies.sort()
+    total = sum(steps)
+    print(f"{clients} 个并发会话，共 {total} 步，用时 {elapsed:.2f} 秒，{total / elapsed:.0f} 步/秒")
+    print(
+        f"单步往返延迟：p50 {latencies[len(latencies) // 2] * 1000:.2f} 毫秒"
+        f" p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.2f} 毫秒"
+    )
+    print(f"结束时内存中会话 {live_sessions} 个")
+
+
+async def serve(host: str, port: int, sessions_dir: str, idle_timeout: float) -> None:
+    server = GameServer(sessions_dir, idle_timeout)
+    listener = await server.start(host, port)
+    print(f"监听 {host}:{port}，空闲 {idle_timeout:.0f} 秒的会话写入 {sessions_dir}/")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多会话异步对战服务器（每行一条 JSON 消息）")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="启动服务器")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--sessions-dir", default="sessions")
+    serve_parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, help="空闲多少秒后写入磁盘")
+    load_parser = commands.add_parser("load", help="在本机启动服务器并用大量并发客户端压测")
+    load_parser.add_argument("--clients", type=int, default=1000)
+    load_parser.add_argument("--steps", type=int, default=30, help="每个客户端最多发送的操作数")
+    load_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.host, args.port, args.sessions_dir, args.idle_timeout))
+    else:
+        asyncio.run(run_load_test(args.clients, args.steps, args.seed))
+
+
+if __name__ == "__main__":
+    main()
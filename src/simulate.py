@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from roguelike import (
+    DEFAULT_BALANCE,
+    Actor,
+    Balance,
+    BattleContext,
+    InnerSkill,
+    OuterSkill,
+    battle,
+    create_enemy,
+    create_inner_skills,
+    create_outer_pool,
+    create_player,
+    play_run,
+)
+
+
+DEFAULT_MAX_STAGES = 50
+DEFAULT_MAX_TURNS = 200
+MASK_64 = (1 << 64) - 1
+UNIT_53 = 1.0 / (1 << 53)
+POLICY_STREAM = 1 << 32
+
+
+def battle_seed(master_seed: int, index: int) -> int:
+    value = (master_seed * 0x9E3779B97F4A7C15 + index + 1) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+@lru_cache(maxsize=None)
+def slot_key(actor: str, slot: str) -> int:
+    return zlib.crc32(f"{actor}/{slot}".encode("utf-8"))
+
+
+class CommonRandomRoller:
+    def __init__(self, seed: int, ctx: BattleContext) -> None:
+        self.seed = seed
+        self.ctx = ctx
+        self.turn = -1
+        self.turn_seed = 0
+        self.occurrences: Dict[Tuple[str, str], int] = {}
+
+    def __call__(self, probability: float, actor: str = "", slot: str = "") -> bool:
+        if self.ctx.turn != self.turn:
+            self.turn = self.ctx.turn
+            self.turn_seed = battle_seed(self.seed, self.turn)
+            self.occurrences.clear()
+        key = (actor, slot)
+        occurrence = self.occurrences.get(key, 0)
+        self.occurrences[key] = occurrence + 1
+        value = battle_seed(self.turn_seed ^ slot_key(actor, slot), occurrence)
+        return (value >> 11) * UNIT_53 < probability
+
+
+class AttackPolicy:
+    def __init__(self, seed: Optional[int] = None) -> None:
+        pass
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        return "1"
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        return options[0]
+
+
+class RandomPolicy:
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.rng = random.Random(seed)
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        return self.rng.choice("123")
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        return self.rng.choice(options)
+
+
+class ScriptedPolicy:
+    def __init__(self, intents: List[str], rewards: List[int]) -> None:
+        self.intents = list(intents)
+        self.rewards = list(rewards)
+        self.intent_index = 0
+        self.reward_index = 0
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        intent = self.intents[self.intent_index] if self.intent_index < len(self.intents) else "1"
+        self.intent_index += 1
+        return intent
+
+    def choose_reward(self, options: List[OuterSkill], player: Actor, ctx: BattleContext) -> OuterSkill:
+        choice = self.rewards[self.reward_index] if self.reward_index < len(self.rewards) else 0
+        self.reward_index += 1
+        return options[choice]
+
+
+POLICIES: Dict[str, Callable[[Optional[int]], object]] = {
+    "attack": AttackPolicy,
+    "random": RandomPolicy,
+}
+
+
+def policy_seed(seed: Optional[int]) -> Optional[int]:
+    return None if seed is None else battle_seed(seed, POLICY_STREAM)
+
+
+def create_policy(policy_name: str, seed: Optional[int]):
+    return POLICIES[policy_name](policy_seed(seed))
+
+
+@dataclass
+class BattleResult:
+    win: bool
+    turns: int
+    damage_dealt: int
+    damage_taken: int
+
+
+@dataclass
+class RunResult:
+    seed: Optional[int]
+    inner_skill: str
+    stages_cleared: int
+    outer_skills: List[str]
+
+
+def resolve_build(inner_skill_id: str, outer_skill_ids: List[str]) -> Tuple[InnerSkill, List[OuterSkill]]:
+    inner_skills = {skill.id: skill for skill in create_inner_skills()}
+    outer_skills = {skill.id: skill for skill in create_outer_pool()}
+    return inner_skills[inner_skill_id], [outer_skills[skill_id] for skill_id in outer_skill_ids]
+
+
+def simulate_battle(
+    inner_skill: InnerSkill,
+    outer_skills: List[OuterSkill],
+    stage: int,
+    seed: int,
+    policy,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    common_random: bool = False,
+    balance: Balance = DEFAULT_BALANCE,
+) -> BattleResult:
+    player = create_player(inner_skill)
+    player.outer_skills = list(outer_skills)
+    ctx = BattleContext(rng=random.Random(seed), quiet=True, balance=balance)
+    if common_random:
+        ctx.roller = CommonRandomRoller(seed, ctx)
+    enemy = create_enemy(stage, ctx.rng, balance)
+    win = battle(player, enemy, ctx, policy.choose_intent, max_turns)
+    return BattleResult(
+        win=win,
+        turns=ctx.turn,
+        damage_dealt=enemy.max_hp - enemy.hp,
+        damage_taken=player.max_hp - player.hp,
+    )
+
+
+def simulate_run(
+    seed: Optional[int],
+    policy,
+    outer_pool: Optional[List[OuterSkill]] = None,
+    max_stages: Optional[int] = DEFAULT_MAX_STAGES,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+) -> RunResult:
+    ctx = BattleContext(rng=random.Random(seed), quiet=True)
+    player, stages_cleared = play_run(
+        ctx,
+        outer_pool if outer_pool is not None else create_outer_pool(),
+        policy.choose_intent,
+        policy.choose_reward,
+        max_stages=max_stages,
+        max_turns=max_turns,
+    )
+    return RunResult(
+        seed=seed,
+        inner_skill=player.inner_skill.id,
+        stages_cleared=stages_cleared,
+        outer_skills=[skill.id for skill in player.outer_skills],
+    )
+
+
+def record_stages(stages_by_inner: Dict[str, Dict[int, int]], inner_skill: str, stages_cleared: int) -> None:
+    counts = stages_by_inner.setdefault(inner_skill, {})
+    counts[stages_cleared] = counts.get(stages_cleared, 0) + 1
+
+
+def summary_lines(stages_by_inner: Dict[str, Dict[int, int]]) -> List[str]:
+    lines = []
+    for inner_skill, counts in sorted(stages_by_inner.items()):
+        runs = sum(counts.values())
+        mean = sum(stages * count for stages, count in counts.items()) / runs
+        lines.append(f"{inner_skill}: {runs} 局，平均通关 {mean:.2f}，最高 {max(counts)}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="无界面批量模拟整局游戏")
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-stages", type=int, default=DEFAULT_MAX_STAGES)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    args = parser.parse_args()
+
+    outer_pool = create_outer_pool()
+    stages_by_inner: Dict[str, Dict[int, int]] = {}
+    started = time.perf_counter()
+    for index in range(args.runs):
+        seed = args.seed + index
+        result = simulate_run(seed, create_policy(args.policy, seed), outer_pool, args.max_stages, args.max_turns)
+        record_stages(stages_by_inner, result.inner_skill, result.stages_cleared)
+    elapsed = time.perf_counter() - started
+
+    print(f"模拟 {args.runs} 局，用时 {elapsed:.2f} 秒（{args.runs / elapsed:.0f} 局/秒）")
+    for line in summary_lines(stages_by_inner):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
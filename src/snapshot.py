@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import copy
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from roguelike import (
+    DEFAULT_BALANCE,
+    DEFAULT_CHAIN_BUDGET,
+    Actor,
+    Balance,
+    BattleContext,
+    build_enemy,
+    create_inner_skills,
+    create_player,
+    enemy_profiles,
+)
+
+
+ActorState = Tuple[int, int, int, Tuple[int, ...]]
+
+
+@dataclass(frozen=True)
+class BattleSnapshot:
+    player: ActorState
+    enemy: ActorState
+    turn: int
+    rng_state: Optional[tuple] = None
+    stage: int = 0
+    balance: Balance = DEFAULT_BALANCE
+    chain_budget: Optional[int] = DEFAULT_CHAIN_BUDGET
+
+
+def capture_actor(actor: Actor, base: Optional[ActorState] = None) -> ActorState:
+    state = (actor.hp, actor.qi, min(actor.turns_without_attack, 2), tuple(actor.status_stacks))
+    return base if base == state else state
+
+
+def restore_actor(actor: Actor, state: ActorState) -> None:
+    actor.hp, actor.qi, actor.turns_without_attack, stacks = state
+    actor.status_stacks = list(stacks)
+
+
+def rng_from_state(state: tuple) -> random.Random:
+    rng = random.Random.__new__(random.Random)
+    rng.setstate(state)
+    return rng
+
+
+def capture_battle(
+    player: Actor,
+    enemy: Actor,
+    ctx: BattleContext,
+    include_rng: bool = True,
+    base: Optional[BattleSnapshot] = None,
+) -> BattleSnapshot:
+    return BattleSnapshot(
+        player=capture_actor(player, base.player if base else None),
+        enemy=capture_actor(enemy, base.enemy if base else None),
+        turn=ctx.turn,
+        rng_state=ctx.rng.getstate() if include_rng else None,
+        stage=ctx.stage,
+        balance=ctx.balance,
+        chain_budget=ctx.chain_budget,
+    )
+
+
+def restore_battle(snapshot: BattleSnapshot, player: Actor, enemy: Actor, ctx: BattleContext) -> None:
+    restore_actor(player, snapshot.player)
+    restore_actor(enemy, snapshot.enemy)
+    ctx.turn = snapshot.turn
+    if snapshot.rng_state is not None:
+        ctx.rng.setstate(snapshot.rng_state)
+
+
+def fork_battle(
+    snapshot: BattleSnapshot,
+    player: Actor,
+    enemy: Actor,
+    rng: Optional[random.Random] = None,
+) -> Tuple[Actor, Actor, BattleContext]:
+    forked_player = copy.copy(player)
+    forked_enemy = copy.copy(enemy)
+    if rng is None:
+        rng = random.Random() if snapshot.rng_state is None else rng_from_state(snapshot.rng_state)
+    ctx = BattleContext(
+        rng=rng,
+        quiet=True,
+        turn=snapshot.turn,
+        stage=snapshot.stage,
+        balance=snapshot.balance,
+        chain_budget=snapshot.chain_budget,
+    )
+    restore_actor(forked_player, snapshot.player)
+    restore_actor(forked_enemy, snapshot.enemy)
+    return forked_player, forked_enemy, ctx
+
+
+def main() -> None:
+    inner_skills = create_inner_skills()
+    player = create_player(inner_skills[0])
+    enemy = build_enemy(enemy_profiles(1)[0], inner_skills[1])
+    player.add_status("shield_qi", 3)
+    enemy.add_status("shock", 2)
+    ctx = BattleContext(rng=random.Random(0), quiet=True)
+    rounds = 20000
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        copy.deepcopy((player, enemy, ctx))
+    deepcopy_time = time.perf_counter() - started
+
+    snapshot = capture_battle(player, enemy, ctx)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fork_battle(snapshot, player, enemy)
+    fork_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        restore_battle(snapshot, player, enemy, ctx)
+    restore_time = time.perf_counter() - started
+
+    print(f"deepcopy: {deepcopy_time / rounds * 1e6:.1f} 微秒/次")
+    print(f"fork_battle: {fork_time / rounds * 1e6:.1f} 微秒/次")
+    print(f"restore_battle: {restore_time / rounds * 1e6:.1f} 微秒/次")
+
+
+if __name__ == "__main__":
+    main()
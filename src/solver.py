@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from roguelike import (
+    CRIT_FOCUS,
+    FRENZY,
+    SHIELD_QI,
+    STATUS_IDS,
+    STATUS_INDEX,
+    VULNERABLE,
+    Actor,
+    BattleContext,
+    InnerSkill,
+    IntentChooser,
+    OuterSkill,
+    build_enemy,
+    create_inner_skills,
+    create_player,
+    enemy_profiles,
+    finish_turn,
+    game_content,
+    player_action_phase,
+    start_turn,
+)
+from simulate import DEFAULT_MAX_TURNS, resolve_build
+from snapshot import ActorState, capture_actor, restore_actor
+
+
+IntentDistribution = Callable[[Actor, Actor], Dict[str, float]]
+BattleState = Tuple[ActorState, ActorState]
+Outcome = Union[BattleState, str]
+Phase = Callable[[Actor, Actor, BattleContext, IntentChooser], None]
+StatusCaps = Tuple[Tuple[int, int], ...]
+
+WIN = "win"
+LOSS = "loss"
+DEFAULT_MAX_STATES = 100000
+
+
+class SolverError(ValueError):
+    pass
+
+
+def attack_intents(player: Actor, enemy: Actor) -> Dict[str, float]:
+    return {"1": 1.0}
+
+
+def random_intents(player: Actor, enemy: Actor) -> Dict[str, float]:
+    return {"1": 1 / 3, "2": 1 / 3, "3": 1 / 3}
+
+
+INTENT_DISTRIBUTIONS: Dict[str, IntentDistribution] = {
+    "attack": attack_intents,
+    "random": random_intents,
+}
+
+
+def player_turn_start(player: Actor, enemy: Actor, ctx: BattleContext, choose_intent: IntentChooser) -> None:
+    start_turn(player, enemy, ctx)
+
+
+def enemy_turn_start(player: Actor, enemy: Actor, ctx: BattleContext, choose_intent: IntentChooser) -> None:
+    start_turn(enemy, player, ctx)
+
+
+def enemy_turn(player: Actor, enemy: Actor, ctx: BattleContext, choose_intent: IntentChooser) -> None:
+    finish_turn(player, enemy, ctx)
+
+
+TURN_PHASES: Tuple[Phase, ...] = (player_turn_start, enemy_turn_start, player_action_phase, enemy_turn)
+
+
+def status_caps(actor: Actor, opponent: Actor, transmutes: bool) -> StatusCaps:
+    counted = {VULNERABLE, SHIELD_QI, CRIT_FOCUS}
+    counted.update(
+        STATUS_INDEX[str(skill.effect["status"])] for skill in opponent.outer_skills if skill.effect["type"] == "consumeStatus"
+    )
+    if transmutes:
+        counted.update(STATUS_INDEX[status] for status, _, _ in game_content().transmute_conversions)
+    if actor.outer_skills:
+        counted.add(FRENZY)
+    return tuple((index, 0 if index == FRENZY else 1) for index in range(len(STATUS_IDS)) if index not in counted)
+
+
+def canonical_actor(state: ActorState, caps: StatusCaps) -> ActorState:
+    stacks = state[3]
+    for index, cap in caps:
+        if stacks[index] > cap:
+            break
+    else:
+        return state
+    capped = list(stacks)
+    for index, cap in caps:
+        if capped[index] > cap:
+            capped[index] = cap
+    return state[0], state[1], state[2], tuple(capped)
+
+
+def acts_on_turn_start(actor: Actor) -> bool:
+    return bool(actor.turn_start_effects()) or bool(actor.skill_dispatch().get("onTurnStart"))
+
+
+class Branch(Exception):
+    pass
+
+
+class BranchOracle:
+    def __init__(self, prefix: Tuple[object, ...], policy: IntentDistribution) -> None:
+        self.prefix = prefix
+        self.policy = policy
+        self.index = 0
+        self.probability = 1.0
+        self.options: List[Tuple[object, float]] = []
+
+    def decide(self, options: List[Tuple[object, float]]) -> object:
+        options = [(option, probability) for option, probability in options if probability > 0]
+        if len(options) == 1:
+            return options[0][0]
+        if self.index < len(self.prefix):
+            choice = self.prefix[self.index]
+            self.index += 1
+            self.probability *= dict(options)[choice]
+            return choice
+        self.options = options
+        raise Branch
+
+    def roll(self, probability: float, actor: str = "", slot: str = "") -> bool:
+        if probability >= 1.0:
+            return True
+        if probability <= 0.0:
+            return False
+        if self.index < len(self.prefix):
+            choice = self.prefix[self.index]
+            self.index += 1
+            self.probability *= probability if choice else 1.0 - probability
+            return choice
+        self.options = [(True, probability), (False, 1.0 - probability)]
+        raise Branch
+
+    def choose_intent(self, player: Actor, enemy: Actor, ctx: BattleContext) -> str:
+        return str(self.decide(list(self.policy(player, enemy).items())))
+
+
+@dataclass
+class BattleDistribution:
+    win_probability: float = 0.0
+    loss_probability: float = 0.0
+    turn_limit_probability: float = 0.0
+    pruned_probability: float = 0.0
+    unsolved_probability: float = 0.0
+    win_turns: Dict[int, float] = field(default_factory=dict)
+    loss_turns: Dict[int, float] = field(default_factory=dict)
+    unsolved: List[str] = field(default_factory=list)
+    states: int = 0
+
+    def merge(self, other: BattleDistribution, weight: float) -> None:
+        self.win_probability += other.win_probability * weight
+        self.loss_probability += other.loss_probability * weight
+        self.turn_limit_probability += other.turn_limit_probability * weight
+        self.pruned_probability += other.pruned_probability * weight
+        for mine, theirs in ((self.win_turns, other.win_turns), (self.loss_turns, other.loss_turns)):
+            for turn, probability in theirs.items():
+                mine[turn] = mine.get(turn, 0.0) + probability * weight
+        self.states += other.states
+
+
+class BattleSolver:
+    def __init__(self, player: Actor, enemy: Actor, policy: IntentDistribution, max_states: int = DEFAULT_MAX_STATES) -> None:
+        self.player = player
+        self.enemy = enemy
+        self.policy = policy
+        self.max_states = max_states
+        self.ctx = BattleContext(rng=random.Random(0), quiet=True)
+        self.player_caps = status_caps(player, enemy, transmutes=True)
+        self.enemy_caps = status_caps(enemy, player, transmutes=False)
+        self.transitions: Dict[BattleState, List[Tuple[float, Outcome]]] = {}
+        self.phase_transitions: List[Dict[BattleState, List[Tuple[float, BattleState]]]] = [{} for _ in TURN_PHASES]
+        self.phases = [index for index in range(len(TURN_PHASES)) if index > 1 or acts_on_turn_start((player, enemy)[index])]
+        self.stored = 0
+
+    def capture(self) -> BattleState:
+        return (
+            canonical_actor(capture_actor(self.player), self.player_caps),
+            canonical_actor(capture_actor(self.enemy), self.enemy_caps),
+        )
+
+    def restore(self, state: BattleState) -> None:
+        restore_actor(self.player, state[0])
+        restore_actor(self.enemy, state[1])
+
+    def reserve(self, count: int) -> None:
+        self.stored += count
+        if self.stored > self.max_states:
+            raise SolverError(f"状态数超过上限 {self.max_states}，请改用 --tolerance 剪枝、减少 --max-turns 或采样评估")
+
+    def expand_phase(self, index: int, state: BattleState) -> List[Tuple[float, BattleState]]:
+        memo = self.phase_transitions[index]
+        cached = memo.get(state)
+        if cached is not None:
+            return cached
+        phase = TURN_PHASES[index]
+        outcomes: Dict[BattleState, float] = {}
+        prefixes: List[Tuple[object, ...]] = [()]
+        while prefixes:
+            prefix = prefixes.pop()
+            oracle = BranchOracle(prefix, self.policy)
+            self.ctx.roller = oracle.roll
+            self.restore(state)
+            try:
+                phase(self.player, self.enemy, self.ctx, oracle.choose_intent)
+            except Branch:
+                prefixes.extend(prefix + (option,) for option, _ in oracle.options)
+                continue
+            outcome = self.capture()
+            outcomes[outcome] = outcomes.get(outcome, 0.0) + oracle.probability
+        self.reserve(1)
+        transitions = [(probability, outcome) for outcome, probability in outcomes.items()]
+        memo[state] = transitions
+        return transitions
+
+    def expand(self, state: BattleState) -> List[Tuple[float, Outcome]]:
+        cached = self.transitions.get(state)
+        if cached is not None:
+            return cached
+        reached: Dict[BattleState, float] = {state: 1.0}
+        for index in self.phases:
+            following: Dict[BattleState, float] = {}
+            for current, mass in reached.items():
+                for probability, outcome in self.expand_phase(index, current):
+                    following[outcome] = following.get(outcome, 0.0) + mass * probability
+            reached = following
+        outcomes: Dict[Outcome, float] = {}
+        for (player, enemy), probability in reached.items():
+            outcome: Outcome = LOSS if player[0] <= 0 else WIN if enemy[0] <= 0 else (player, enemy)
+            outcomes[outcome] = outcomes.get(outcome, 0.0) + probability
+        self.reserve(1)
+        transitions = [(probability, outcome) for outcome, probability in outcomes.items()]
+        self.transitions[state] = transitions
+        return transitions
+
+    def solve(self, max_turns: int = DEFAULT_MAX_TURNS, tolerance: float = 0.0) -> BattleDistribution:
+        initial = self.capture()
+        try:
+            return self.propagate(initial, max_turns, tolerance)
+        finally:
+            self.restore(initial)
+
+    def propagate(self, initial: BattleState, max_turns: int, tolerance: float) -> BattleDistribution:
+        result = BattleDistribution()
+        frontier: Dict[BattleState, float] = {initial: 1.0}
+        for turn in range(1, max_turns + 1):
+            next_frontier: Dict[BattleState, float] = {}
+            for state, mass in frontier.items():
+                for probability, outcome in self.expand(state):
+                    weight = mass * probability
+                    if outcome == WIN:
+                        result.win_turns[turn] = result.win_turns.get(turn, 0.0) + weight
+                    elif outcome == LOSS:
+                        result.loss_turns[turn] = result.loss_turns.get(turn, 0.0) + weight
+                    else:
+                        next_frontier[outcome] = next_frontier.get(outcome, 0.0) + weight
+            frontier = {}
+            for state, mass in next_frontier.items():
+                if mass < tolerance:
+                    result.pruned_probability += mass
+                else:
+                    frontier[state] = mass
+            if not frontier:
+                break
+        result.win_probability = sum(result.win_turns.values())
+        result.turn_limit_probability = sum(frontier.values())
+        result.loss_probability = sum(result.loss_turns.values()) + result.turn_limit_probability
+        result.states = len(self.transitions)
+        return result
+
+
+def solve_battle(
+    inner_skill: InnerSkill,
+    outer_skills: List[OuterSkill],
+    enemy: Actor,
+    policy: IntentDistribution,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    tolerance: float = 0.0,
+    max_states: int = DEFAULT_MAX_STATES,
+) -> BattleDistribution:
+    player = create_player(inner_skill)
+    player.outer_skills = list(outer_skills)
+    return BattleSolver(player, enemy, policy, max_states).solve(max_turns, tolerance)
+
+
+def solve_stage(
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int,
+    policy_name: str = "attack",
+    max_turns: int = DEFAULT_MAX_TURNS,
+    tolerance: float = 0.0,
+    max_states: int = DEFAULT_MAX_STATES,
+) -> BattleDistribution:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, outer_skill_ids)
+    profiles = enemy_profiles(stage)
+    enemy_inner_skills = create_inner_skills()
+    weight = 1 / (len(profiles) * len(enemy_inner_skills))
+    result = BattleDistribution()
+    failure: Optional[SolverError] = None
+    for profile in profiles:
+        for enemy_inner_skill in enemy_inner_skills:
+            enemy = build_enemy(profile, enemy_inner_skill)
+            try:
+                solved = solve_battle(
+                    inner_skill, outer_skills, enemy, INTENT_DISTRIBUTIONS[policy_name], max_turns, tolerance, max_states
+                )
+            except SolverError as error:
+                failure = error
+                result.unsolved.append(f"{enemy.name}·{enemy_inner_skill.id}")
+                result.unsolved_probability += weight
+                continue
+            result.merge(solved, weight)
+    if failure is not None and len(result.unsolved) == len(profiles) * len(enemy_inner_skills):
+        raise failure
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="动态规划精确求解单场战斗结果分布")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(INTENT_DISTRIBUTIONS), default="attack")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument("--tolerance", type=float, default=0.0, help="低于该概率的状态直接剪枝")
+    parser.add_argument("--max-states", type=int, default=DEFAULT_MAX_STATES, help="单场战斗最多展开的状态数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        result = solve_stage(
+            args.inner_skill, args.outer_skills, args.stage, args.policy, args.max_turns, args.tolerance, args.max_states
+        )
+    except KeyError as error:
+        parser.error(f"未知的内功或外功: {error.args[0]}")
+    except SolverError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - started
+
+    print(f"关卡 {args.stage} | 状态数 {result.states} | 用时 {elapsed * 1000:.1f} 毫秒")
+    print(f"胜率 {result.win_probability:.6f} | 败率 {result.loss_probability:.6f}（含超时 {result.turn_limit_probability:.6f}）")
+    if result.pruned_probability:
+        print(f"剪枝概率 {result.pruned_probability:.2e}")
+    if result.unsolved:
+        print(f"未能求解的敌人（状态数超过 {args.max_states}，概率 {result.unsolved_probability:.6f} 未计入上述结果）:")
+        print("  " + "，".join(result.unsolved))
+    for turn in sorted(result.win_turns):
+        print(f"第 {turn} 回合获胜: {result.win_turns[turn]:.6f}")
+
+
+if __name__ == "__main__":
+    main()
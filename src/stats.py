@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from roguelike import BattleContext, Event, create_event_log, create_outer_pool, play_run
+from simulate import DEFAULT_MAX_STAGES, DEFAULT_MAX_TURNS, POLICIES, battle_seed, create_policy
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+CHUNK_SIZE = 2000
+EFFECT_DAMAGE_EVENTS = frozenset({"damage", "status_consume", "chain_damage"})
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+@dataclass
+class RunningStat:
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other: RunningStat) -> None:
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def total(self) -> float:
+        return self.mean * self.count
+
+
+@dataclass
+class QuantileSketch:
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY
+    count: int = 0
+    zeros: int = 0
+    positive: Dict[int, int] = field(default_factory=dict)
+    negative: Dict[int, int] = field(default_factory=dict)
+    log_gamma: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.log_gamma = math.log((1 + self.relative_accuracy) / (1 - self.relative_accuracy))
+
+    def key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def value(self, key: int) -> float:
+        return 2 * math.exp(key * self.log_gamma) / (1 + math.exp(self.log_gamma))
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value > 0:
+            buckets = self.positive
+        elif value < 0:
+            buckets = self.negative
+            value = -value
+        else:
+            self.zeros += 1
+            return
+        key = self.key(value)
+        buckets[key] = buckets.get(key, 0) + 1
+
+    def merge(self, other: QuantileSketch) -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("只能合并精度相同的分位数草图")
+        self.count += other.count
+        self.zeros += other.zeros
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self.value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self.value(key)
+        return self.value(max(self.positive))
+
+
+@dataclass
+class Metric:
+    stat: RunningStat = field(default_factory=RunningStat)
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def add(self, value: float) -> None:
+        self.stat.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other: Metric) -> None:
+        self.stat.merge(other.stat)
+        self.sketch.merge(other.sketch)
+
+
+def merge_metrics(mine: Dict[str, Metric], theirs: Dict[str, Metric]) -> None:
+    for name, metric in theirs.items():
+        if name in mine:
+            mine[name].merge(metric)
+        else:
+            mine[name] = metric
+
+
+class StatsCollector:
+    def __init__(self) -> None:
+        self.runs = 0
+        self.events: Dict[str, int] = {}
+        self.skill_damage: Dict[str, Metric] = {}
+        self.attack_damage: Dict[str, Metric] = {}
+        self.stage_reached: Dict[str, Metric] = {}
+        self.battle_turns = Metric()
+        self.pending: Dict[str, int] = {}
+        self.player = ""
+        self.inner_skill: Optional[str] = None
+        self.stage = 0
+        self.turn = 0
+
+    def __call__(self, event: Event) -> None:
+        kind = event.kind
+        self.events[kind] = self.events.get(kind, 0) + 1
+        if kind in EFFECT_DAMAGE_EVENTS:
+            if event.skill:
+                self.pending[event.skill] = self.pending.get(event.skill, 0) + event.amount
+        elif kind == "skill_trigger":
+            metric = self.skill_damage.get(event.skill)
+            if metric is None:
+                metric = self.skill_damage[event.skill] = Metric()
+            metric.add(self.pending.pop(event.skill, 0))
+        elif kind == "attack_hit":
+            side = "玩家" if event.actor == self.player else "敌人"
+            metric = self.attack_damage.get(side)
+            if metric is None:
+                metric = self.attack_damage[side] = Metric()
+            metric.add(event.amount)
+        elif kind == "turn_start":
+            self.turn = event.amount
+        elif kind == "victory":
+            self.battle_turns.add(self.turn)
+        elif kind == "stage_start":
+            self.stage = event.amount
+        elif kind == "run_start":
+            self.finish_run()
+            self.player = event.actor
+            self.inner_skill = event.skill
+
+    def finish_run(self) -> None:
+        if self.inner_skill is not None:
+            metric = self.stage_reached.get(self.inner_skill)
+            if metric is None:
+                metric = self.stage_reached[self.inner_skill] = Metric()
+            metric.add(self.stage)
+            self.runs += 1
+        self.inner_skill = None
+        self.stage = 0
+        self.pending.clear()
+
+    def close(self) -> StatsCollector:
+        self.finish_run()
+        return self
+
+    def merge(self, other: StatsCollector) -> None:
+        self.runs += other.runs
+        for kind, count in other.events.items():
+            self.events[kind] = self.events.get(kind, 0) + count
+        merge_metrics(self.skill_damage, other.skill_damage)
+        merge_metrics(self.attack_damage, other.attack_damage)
+        merge_metrics(self.stage_reached, other.stage_reached)
+        self.battle_turns.merge(other.battle_turns)
+
+    def total_events(self) -> int:
+        return sum(self.events.values())
+
+
+def collect_runs(
+    seed: int,
+    policy_name: str,
+    start: int,
+    stop: int,
+    max_stages: Optional[int] = DEFAULT_MAX_STAGES,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+) -> StatsCollector:
+    collector = StatsCollector()
+    outer_pool = create_outer_pool()
+    for index in range(start, stop):
+        run_seed = battle_seed(seed, index)
+        policy = create_policy(policy_name, run_seed)
+        ctx = BattleContext(rng=random.Random(run_seed), logs=create_event_log(0), sinks=[collector])
+        play_run(ctx, outer_pool, policy.choose_intent, policy.choose_reward, max_stages, max_turns)
+    return collector.close()
+
+
+def collect_stats(
+    runs: int,
+    seed: int = 0,
+    policy_name: str = "random",
+    max_stages: Optional[int] = DEFAULT_MAX_STAGES,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    workers: Optional[int] = None,
+) -> StatsCollector:
+    tasks = [
+        (seed, policy_name, start, min(runs, start + CHUNK_SIZE), max_stages, max_turns)
+        for start in range(0, runs, CHUNK_SIZE)
+    ]
+    collector = StatsCollector()
+    if workers == 1:
+        for task in tasks:
+            collector.merge(collect_runs(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(collect_runs, *zip(*tasks)):
+                collector.merge(chunk)
+    return collector
+
+
+def format_metric(label: str, metric: Metric) -> str:
+    stat = metric.stat
+    if stat.count == 0:
+        return f"{label}: 无数据"
+    quantiles = " ".join(f"p{round(q * 100)} {metric.sketch.quantile(q):.0f}" for q in QUANTILES)
+    return f"{label}: {stat.count} 次，均值 {stat.mean:.2f} ± {math.sqrt(stat.variance()):.2f}，{quantiles}，最高 {stat.maximum:g}"
+
+
+def report_lines(collector: StatsCollector) -> List[str]:
+    lines = [f"共 {collector.runs} 局，{collector.total_events()} 个事件"]
+    lines.append("到达关卡：")
+    for inner_skill, metric in sorted(collector.stage_reached.items()):
+        lines.append("  " + format_metric(inner_skill, metric))
+    lines.append(format_metric("获胜所需回合", collector.battle_turns))
+    lines.append("普通攻击伤害：")
+    for side, metric in sorted(collector.attack_damage.items()):
+        lines.append("  " + format_metric(side, metric))
+    lines.append("外功每次触发的伤害（按总伤害排序）：")
+    for skill_id, metric in sorted(collector.skill_damage.items(), key=lambda item: -item[1].stat.total()):
+        lines.append(f"  {format_metric(skill_id, metric)}，总计 {metric.stat.total():.0f}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="不保留日志，边模拟边在线统计事件")
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-stages", type=int, default=DEFAULT_MAX_STAGES)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    collector = collect_stats(args.runs, args.seed, args.policy, args.max_stages, args.max_turns, args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"用时 {elapsed:.2f} 秒（{collector.total_events() / elapsed:.0f} 事件/秒）")
+    for line in report_lines(collector):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from evaluate import BuildStats, percentile, run_battles, wilson_interval
+from roguelike import BASE_CRIT_CHANCE, BASE_DAMAGE, Balance, OuterSkill
+from simulate import DEFAULT_MAX_TURNS, POLICIES, resolve_build
+
+
+DEFAULT_POINT_BATTLES = 2000
+WINDOW_PER_WORKER = 4
+STAT_COLUMNS = (
+    "battles",
+    "wins",
+    "win_rate",
+    "win_rate_low",
+    "win_rate_high",
+    "turns_mean",
+    "damage_dealt_mean",
+    "damage_taken_mean",
+    "damage_taken_p90",
+)
+
+
+@dataclass(frozen=True)
+class Tuning:
+    base_damage: int = BASE_DAMAGE
+    crit_chance: float = BASE_CRIT_CHANCE
+    enemy_hp_scale: float = 1.0
+    enemy_attack_scale: float = 1.0
+    skill_chance_scale: float = 1.0
+
+    def __post_init__(self) -> None:
+        for name, value in asdict(self).items():
+            check_value(name, value)
+
+    def balance(self) -> Balance:
+        return Balance(self.base_damage, self.crit_chance, self.enemy_hp_scale, self.enemy_attack_scale)
+
+    def scale_skills(self, outer_skills: List[OuterSkill]) -> List[OuterSkill]:
+        return [replace(skill, chance=min(1.0, skill.chance * self.skill_chance_scale)) for skill in outer_skills]
+
+
+PARAMETERS: Dict[str, type] = {field.name: type(field.default) for field in fields(Tuning)}
+PARAMETER_RANGES: Dict[str, Tuple[float, float]] = {
+    "base_damage": (0, math.inf),
+    "crit_chance": (0.0, 1.0),
+    "enemy_hp_scale": (0.0, math.inf),
+    "enemy_attack_scale": (0.0, math.inf),
+    "skill_chance_scale": (0.0, math.inf),
+}
+
+Values = Union[List[Union[int, float]], Tuple[float, float]]
+
+
+@dataclass
+class PointResult:
+    index: int
+    tuning: Tuning
+    stats: BuildStats
+
+
+def evaluate_point(
+    index: int,
+    tuning: Tuning,
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int,
+    policy_name: str,
+    seed: int,
+    battles: int,
+    max_turns: Optional[int],
+) -> PointResult:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, outer_skill_ids)
+    outer_skills = tuning.scale_skills(outer_skills)
+    stats = run_battles(inner_skill, outer_skills, stage, policy_name, seed, 0, battles, max_turns, tuning.balance())
+    return PointResult(index, tuning, stats)
+
+
+def check_value(name: str, value: Union[int, float]) -> None:
+    low, high = PARAMETER_RANGES[name]
+    if not low <= value <= high:
+        bounds = f"不小于 {low}" if math.isinf(high) else f"在 [{low}, {high}] 之间"
+        raise ValueError(f"参数 {name} 的取值 {value} 无效，应{bounds}")
+
+
+def parse_param(text: str) -> Tuple[str, Values]:
+    name, separator, spec = text.partition("=")
+    if not separator or name not in PARAMETERS:
+        raise ValueError(f"参数格式应为 名称=值1,值2 或 名称=下限:上限，可选名称：{', '.join(PARAMETERS)}")
+    kind = PARAMETERS[name]
+    if ":" in spec:
+        low, high = (kind(value) for value in spec.split(":", 1))
+        check_value(name, low)
+        check_value(name, high)
+        if low > high:
+            raise ValueError(f"参数 {name} 的区间下限 {low} 大于上限 {high}")
+        return name, (low, high)
+    values = [kind(value) for value in spec.split(",")]
+    for value in values:
+        check_value(name, value)
+    return name, values
+
+
+def grid_points(params: Dict[str, Values]) -> Iterator[Tuning]:
+    for name, values in params.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"网格搜索不支持区间参数 {name}，请改用 --samples 随机搜索")
+    names = list(params)
+    return (Tuning(**dict(zip(names, combination))) for combination in itertools.product(*params.values()))
+
+
+def random_points(params: Dict[str, Values], samples: int, seed: int) -> Iterator[Tuning]:
+    rng = random.Random(seed)
+    for _ in range(samples):
+        values: Dict[str, Union[int, float]] = {}
+        for name, spec in params.items():
+            if isinstance(spec, list):
+                values[name] = rng.choice(spec)
+            elif PARAMETERS[name] is int:
+                values[name] = rng.randint(*spec)
+            else:
+                values[name] = rng.uniform(*spec)
+        yield Tuning(**values)
+
+
+def format_value(value: Union[int, float]) -> str:
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def point_row(result: PointResult, names: Sequence[str]) -> List[str]:
+    stats = result.stats
+    low, high = wilson_interval(stats.wins, stats.battles)
+    kills = sum(stats.turns_to_kill.values())
+    values = asdict(result.tuning)
+    return [
+        str(result.index),
+        *(format_value(values[name]) for name in names),
+        str(stats.battles),
+        str(stats.wins),
+        format_value(stats.wins / stats.battles if stats.battles else 0.0),
+        format_value(low),
+        format_value(high),
+        format_value(sum(turns * count for turns, count in stats.turns_to_kill.items()) / kills if kills else 0.0),
+        format_value(sum(value * count for value, count in stats.damage_dealt.items()) / max(1, stats.battles)),
+        format_value(sum(value * count for value, count in stats.damage_taken.items()) / max(1, stats.battles)),
+        str(percentile(stats.damage_taken, stats.battles, 0.9) if stats.battles else 0),
+    ]
+
+
+def resume_output(path: str, header: List[str]) -> Tuple[int, Optional[List[str]]]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            csv.writer(handle).writerow(header)
+        return 0, None
+    with open(path, "rb+") as handle:
+        existing = next(csv.reader([handle.readline().decode("utf-8")]), [])
+        if existing != header:
+            raise ValueError(f"{path} 的列与本次扫描不一致，无法续跑")
+        rows = 0
+        last: Optional[bytes] = None
+        end = handle.tell()
+        for line in handle:
+            if not line.endswith(b"\n"):
+                break
+            rows += 1
+            last = line
+            end += len(line)
+        handle.truncate(end)
+    return rows, next(csv.reader([last.decode("utf-8")])) if last else None
+
+
+def evaluate_points(
+    points: Iterator[Tuple[int, Tuning]],
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int,
+    policy_name: str,
+    seed: int,
+    battles: int,
+    max_turns: Optional[int],
+    workers: Optional[int],
+) -> Iterator[PointResult]:
+    arguments = (inner_skill_id, outer_skill_ids, stage, policy_name, seed, battles, max_turns)
+    if workers == 1:
+        for index, tuning in points:
+            yield evaluate_point(index, tuning, *arguments)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window: Deque[Future] = deque()
+        limit = (workers or os.cpu_count() or 1) * WINDOW_PER_WORKER
+        for index, tuning in points:
+            window.append(pool.submit(evaluate_point, index, tuning, *arguments))
+            if len(window) >= limit:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def run_sweep(
+    path: str,
+    tunings: Iterator[Tuning],
+    names: List[str],
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int = 1,
+    policy_name: str = "attack",
+    seed: int = 0,
+    battles: int = DEFAULT_POINT_BATTLES,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    workers: Optional[int] = None,
+) -> Tuple[int, int]:
+    resolve_build(inner_skill_id, outer_skill_ids)
+    header = ["point", *names, *STAT_COLUMNS]
+    done, last = resume_output(path, header)
+    points = enumerate(tunings)
+    if done:
+        skipped = list(itertools.islice(points, done - 1, done))
+        if not skipped or last[: len(names) + 1] != [str(done - 1), *(format_value(getattr(skipped[0][1], name)) for name in names)]:
+            raise ValueError(f"{path} 已有的扫描点与本次参数不一致，无法续跑")
+    written = 0
+    with open(path, "a", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        for result in evaluate_points(points, inner_skill_id, outer_skill_ids, stage, policy_name, seed, battles, max_turns, workers):
+            writer.writerow(point_row(result, names))
+            handle.flush()
+            written += 1
+    return done, written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="对平衡参数做网格 / 随机扫描，逐点统计写入 CSV")
+    parser.add_argument("output", help="CSV 输出路径，已存在时从中断处续跑")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help=f"名称=值1,值2（网格）或 名称=下限:上限（随机），可选：{', '.join(PARAMETERS)}",
+    )
+    parser.add_argument("--samples", type=int, default=None, help="随机搜索的点数，不设则做网格搜索")
+    parser.add_argument("--battles", type=int, default=DEFAULT_POINT_BATTLES, help="每个扫描点的战斗场数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="attack")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        params = dict(parse_param(text) for text in args.param)
+        tunings = random_points(params, args.samples, args.seed) if args.samples else grid_points(params)
+        started = time.perf_counter()
+        done, written = run_sweep(
+            args.output,
+            tunings,
+            list(params),
+            args.inner_skill,
+            args.outer_skills,
+            stage=args.stage,
+            policy_name=args.policy,
+            seed=args.seed,
+            battles=args.battles,
+            workers=args.workers,
+        )
+    except KeyError as error:
+        parser.error(f"未知的内功或外功: {error.args[0]}")
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - started
+    if done:
+        print(f"跳过已完成的 {done} 个扫描点")
+    print(f"完成 {written} 个扫描点，用时 {elapsed:.2f} 秒，结果写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
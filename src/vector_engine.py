@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from roguelike import (
+    BASE_CRIT_CHANCE,
+    BASE_DAMAGE,
+    COUNTER_READY,
+    CRIT_FOCUS,
+    DOUBLE_STRIKE,
+    FRENZY,
+    SHIELD_QI,
+    SHOCK,
+    STATUS_IDS,
+    STATUS_INDEX,
+    VULNERABLE,
+    InnerSkill,
+    OuterSkill,
+    create_inner_skills,
+    create_outer_pool,
+    create_player,
+    enemy_profiles,
+    game_content,
+)
+from simulate import DEFAULT_MAX_TURNS, battle_seed, create_policy, resolve_build, simulate_battle
+
+
+DECAYING_STATUSES = [VULNERABLE, FRENZY, CRIT_FOCUS]
+Z_LIMIT = 3.0
+
+SUPPORTED_INNER_HOOKS = {
+    ("onTurnStart", "gainQi"),
+    ("onQiOverflow", "addStatus"),
+    ("onHit", "stealQi"),
+    ("onDefense", "addStatus"),
+}
+
+
+@dataclass(frozen=True)
+class InnerHooks:
+    turn_start_qi: np.ndarray
+    overflow_status: np.ndarray
+    steal_qi: np.ndarray
+    defense_status: np.ndarray
+    defense_amount: np.ndarray
+
+
+def hook_effect(skill: InnerSkill, hook: str) -> Optional[Dict[str, object]]:
+    effects = skill.hooks.get(hook, [])
+    if len(effects) > 1:
+        raise ValueError(f"向量化引擎不支持内功 {skill.id} 的 {hook} 挂多个效果")
+    return effects[0] if effects else None
+
+
+def compile_inner_hooks(skills: List[InnerSkill]) -> InnerHooks:
+    for skill in skills:
+        for hook, effects in skill.hooks.items():
+            for effect in effects:
+                if (hook, effect["type"]) not in SUPPORTED_INNER_HOOKS:
+                    raise ValueError(f"向量化引擎不支持内功 {skill.id} 的 {hook}/{effect['type']} 效果")
+    turn_start = [hook_effect(skill, "onTurnStart") for skill in skills]
+    overflow = [hook_effect(skill, "onQiOverflow") for skill in skills]
+    on_hit = [hook_effect(skill, "onHit") for skill in skills]
+    on_defense = [hook_effect(skill, "onDefense") for skill in skills]
+    return InnerHooks(
+        turn_start_qi=np.array([int(effect["amount"]) if effect else 0 for effect in turn_start]),
+        overflow_status=np.array([STATUS_INDEX[str(effect["status"])] if effect else -1 for effect in overflow]),
+        steal_qi=np.array([int(effect["amount"]) if effect else 0 for effect in on_hit]),
+        defense_status=np.array([STATUS_INDEX[str(effect["status"])] if effect else -1 for effect in on_defense]),
+        defense_amount=np.array([int(effect["amount"]) if effect else 0 for effect in on_defense]),
+    )
+
+
+INNER_SKILLS = create_inner_skills()
+INNER_IDS = [skill.id for skill in INNER_SKILLS]
+INNER_INDEX = {inner_id: index for index, inner_id in enumerate(INNER_IDS)}
+INNER_HOOKS = compile_inner_hooks(INNER_SKILLS)
+BLOOD_WAR = INNER_INDEX["blood_war"]
+WITHERED_ZEN = INNER_INDEX["withered_zen"]
+
+TRANSMUTE_CONVERSIONS = game_content().transmute_conversions
+TRANSMUTE_VALUES = np.array([value for _, value, _ in TRANSMUTE_CONVERSIONS])
+TRANSMUTE_STATUSES = [STATUS_INDEX[status] for status, _, _ in TRANSMUTE_CONVERSIONS]
+TRANSMUTE_KINDS = {
+    kind: np.array([conversion_type == kind for _, _, conversion_type in TRANSMUTE_CONVERSIONS])
+    for kind in ("damage", "qi", "heal")
+}
+
+POLICY_INTENT_WEIGHTS: Dict[str, Tuple[float, float, float]] = {
+    "attack": (1.0, 0.0, 0.0),
+    "random": (1.0, 1.0, 1.0),
+}
+
+
+@dataclass
+class Side:
+    hp: np.ndarray
+    max_hp: np.ndarray
+    qi: np.ndarray
+    max_qi: np.ndarray
+    inner: np.ndarray
+    statuses: np.ndarray
+    turns_without_attack: np.ndarray
+    skills: Dict[str, List[OuterSkill]]
+
+    def take(self, rows: np.ndarray) -> Side:
+        return Side(
+            hp=self.hp[rows],
+            max_hp=self.max_hp[rows],
+            qi=self.qi[rows],
+            max_qi=self.max_qi[rows],
+            inner=self.inner[rows],
+            statuses=self.statuses[:, rows],
+            turns_without_attack=self.turns_without_attack[rows],
+            skills=self.skills,
+        )
+
+
+@dataclass
+class BatchResult:
+    win: np.ndarray
+    turns: np.ndarray
+    damage_dealt: np.ndarray
+    damage_taken: np.ndarray
+
+
+def create_side(count: int, hp: np.ndarray, qi: int, max_qi: int, inner: np.ndarray, skills: List[OuterSkill]) -> Side:
+    by_trigger: Dict[str, List[OuterSkill]] = {}
+    for skill in skills:
+        by_trigger.setdefault(skill.trigger, []).append(skill)
+    return Side(
+        hp=hp.copy(),
+        max_hp=hp.copy(),
+        qi=np.full(count, qi),
+        max_qi=np.full(count, max_qi),
+        inner=inner,
+        statuses=np.zeros((len(STATUS_IDS), count), dtype=np.int64),
+        turns_without_attack=np.zeros(count, dtype=np.int64),
+        skills=by_trigger,
+    )
+
+
+class VectorBattle:
+    def __init__(
+        self,
+        inner_skill: InnerSkill,
+        outer_skills: List[OuterSkill],
+        stage: int,
+        count: int,
+        seed: int,
+        intent_weights: Tuple[float, float, float] = POLICY_INTENT_WEIGHTS["attack"],
+    ) -> None:
+        self.rng = np.random.default_rng(seed)
+        self.count = count
+        weights = np.array(intent_weights, dtype=float)
+        self.intent_weights = weights / weights.sum()
+        template = create_player(inner_skill)
+        self.player = create_side(
+            count,
+            np.full(count, template.hp),
+            template.qi,
+            template.max_qi,
+            np.full(count, INNER_INDEX[inner_skill.id]),
+            outer_skills,
+        )
+        profiles = enemy_profiles(stage)
+        profile = self.rng.integers(0, len(profiles), count)
+        self.enemy_attack_probability = np.array([profiles[index][2] for index in range(len(profiles))])[profile]
+        enemy_hp = np.array([profiles[index][1] for index in range(len(profiles))])[profile]
+        enemy_inner = self.rng.integers(0, len(INNER_IDS), count)
+        self.enemy = create_side(count, enemy_hp, 2, 6, enemy_inner, [])
+
+    def uniform(self) -> np.ndarray:
+        return self.rng.random(self.count)
+
+    def gain_qi(self, actor: Side, amount, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        qi = actor.qi + np.where(mask, amount, 0)
+        overflow = np.maximum(0, qi - actor.max_qi)
+        actor.qi = np.minimum(qi, actor.max_qi)
+        overflow_status = INNER_HOOKS.overflow_status[actor.inner]
+        for status in np.unique(overflow_status[overflow > 0]):
+            if status >= 0:
+                actor.statuses[status] += np.where(overflow_status == status, overflow, 0)
+
+    def heal(self, actor: Side, amount, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        actor.hp = np.where(mask, np.minimum(actor.max_hp, actor.hp + amount), actor.hp)
+
+    def apply_damage(self, actor: Side, amount, mask: np.ndarray, true_damage: bool = False) -> None:
+        if not mask.any():
+            return
+        damage = np.where(mask, amount, 0)
+        hit = damage > 0
+        if not true_damage:
+            damage = damage + np.where(hit, actor.statuses[VULNERABLE], 0)
+            absorbed = np.where(hit, np.minimum(actor.statuses[SHIELD_QI], damage), 0)
+            actor.statuses[SHIELD_QI] -= absorbed
+            damage = damage - absorbed
+        actor.hp = np.maximum(0, actor.hp - np.where(hit, damage, 0))
+
+    def trigger(self, actor: Side, target: Side, trigger: str, mask: np.ndarray, last_damage: Optional[np.ndarray]) -> None:
+        for skill in actor.skills.get(trigger, []):
+            bonus = np.where((actor.inner == BLOOD_WAR) & (actor.hp <= actor.max_hp * 0.5), 0.5, 0.0)
+            bonus = bonus + actor.statuses[FRENZY] * 0.1
+            chance = np.minimum(1.0, skill.chance * (1 + bonus))
+            fired = mask & (self.uniform() <= chance)
+            if fired.any():
+                self.execute(actor, target, skill.effect, fired, last_damage)
+
+    def execute(self, actor: Side, target: Side, effect: Dict[str, object], fired: np.ndarray, last_damage: Optional[np.ndarray]) -> None:
+        effect_type = effect["type"]
+        if effect_type == "addStatus":
+            target.statuses[STATUS_INDEX[str(effect["status"])]] += np.where(fired, int(effect["amount"]), 0)
+        elif effect_type == "dealDamage":
+            if effect.get("requires") == "qi":
+                fired = fired & (actor.qi > 0)
+            self.apply_damage(target, int(effect["amount"]), fired, true_damage=bool(effect.get("true", False)))
+        elif effect_type == "gainQi":
+            self.gain_qi(actor, int(effect["amount"]), fired)
+        elif effect_type == "consumeStatus":
+            status = STATUS_INDEX[str(effect["status"])]
+            stacks = np.where(fired, target.statuses[status], 0)
+            target.statuses[status] -= stacks
+            self.apply_damage(target, stacks * int(effect["perStackDamage"]), stacks > 0, true_damage=True)
+        elif effect_type == "repeatLastAction" and last_damage is not None:
+            if effect.get("requires") == "shock":
+                fired = fired & (target.statuses[SHOCK] > 0)
+            damage = (last_damage * float(effect["multiplier"])).astype(np.int64)
+            self.apply_damage(target, damage, fired)
+        elif effect_type == "heal":
+            self.heal(actor, int(effect["amount"]), fired)
+
+    def perform_attack(self, attacker: Side, defender: Side, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        crit_chance = BASE_CRIT_CHANCE + np.where(attacker.statuses[CRIT_FOCUS] > 0, 0.05, 0.0)
+        crit = mask & (self.uniform() < crit_chance)
+        multiplier = np.where(crit, 2, 1)
+        double_strike = mask & (attacker.statuses[DOUBLE_STRIKE] > 0)
+        multiplier = np.where(double_strike, multiplier * 2, multiplier)
+        attacker.statuses[DOUBLE_STRIKE, double_strike] = 0
+        damage = BASE_DAMAGE * multiplier
+        self.apply_damage(defender, damage, mask)
+        return crit, damage
+
+    def inner_on_hit(self, actor: Side, target: Side, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        base = INNER_HOOKS.steal_qi[actor.inner]
+        steal = mask & (base > 0)
+        amount = np.where(actor.qi < actor.max_qi * 0.3, base * 2, base)
+        stolen = np.where(steal, np.minimum(target.qi, amount), 0)
+        target.qi -= stolen
+        self.gain_qi(actor, stolen, steal)
+
+    def charge_withered_zen(self, actor: Side, mask: np.ndarray) -> None:
+        charged = mask & (actor.inner == WITHERED_ZEN) & (actor.turns_without_attack >= 2)
+        actor.statuses[DOUBLE_STRIKE] += charged
+
+    def start_turn(self, actor: Side, target: Side, mask: np.ndarray) -> None:
+        amount = INNER_HOOKS.turn_start_qi[actor.inner]
+        self.gain_qi(actor, amount, mask & (amount > 0))
+        self.trigger(actor, target, "onTurnStart", mask, None)
+
+    def attack(self, actor: Side, target: Side, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        actor.turns_without_attack[mask] = 0
+        self.trigger(actor, target, "onAttack", mask, None)
+        crit, damage = self.perform_attack(actor, target, mask)
+        self.inner_on_hit(actor, target, mask)
+        self.trigger(actor, target, "onHit", mask, damage)
+        self.trigger(actor, target, "onCrit", crit, damage)
+        self.handle_counter(target, actor, mask)
+
+    def defend(self, actor: Side, target: Side, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        actor.turns_without_attack[mask] += 1
+        defense_status = INNER_HOOKS.defense_status[actor.inner]
+        defense_amount = np.where(mask, INNER_HOOKS.defense_amount[actor.inner], 0)
+        for status in np.unique(defense_status[mask]):
+            if status >= 0:
+                actor.statuses[status] += np.where(defense_status == status, defense_amount, 0)
+        self.trigger(actor, target, "onDefense", mask, None)
+        self.charge_withered_zen(actor, mask)
+
+    def transmute(self, actor: Side, target: Side, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        actor.turns_without_attack[mask] += 1
+        stacks = actor.statuses[TRANSMUTE_STATUSES]
+        scores = stacks * TRANSMUTE_VALUES[:, None]
+        best = np.argmax(scores, axis=0)
+        columns = np.arange(self.count)
+        converted = mask & (scores[best, columns] > 0)
+        used = np.where(converted, stacks[best, columns], 0)
+        for row, status in enumerate(TRANSMUTE_STATUSES):
+            actor.statuses[status] -= np.where(best == row, used, 0)
+        damage = used * TRANSMUTE_VALUES[best]
+        self.apply_damage(target, damage, converted & TRANSMUTE_KINDS["damage"][best], true_damage=True)
+        self.gain_qi(actor, used, converted & TRANSMUTE_KINDS["qi"][best])
+        self.heal(actor, used, converted & TRANSMUTE_KINDS["heal"][best])
+        self.charge_withered_zen(actor, mask)
+
+    def handle_counter(self, defender: Side, attacker: Side, mask: np.ndarray) -> None:
+        ready = mask & (defender.statuses[COUNTER_READY] > 0)
+        if not ready.any():
+            return
+        defender.statuses[COUNTER_READY, ready] = 0
+        _, damage = self.perform_attack(defender, attacker, ready)
+        self.inner_on_hit(defender, attacker, ready)
+        self.trigger(defender, attacker, "onHit", ready, damage)
+
+    def end_turn(self, actor: Side, mask: np.ndarray) -> None:
+        decayed = actor.statuses[DECAYING_STATUSES]
+        actor.statuses[DECAYING_STATUSES] = np.where(mask, np.maximum(0, decayed - 1), decayed)
+
+    def compact(self, rows: np.ndarray) -> None:
+        self.player = self.player.take(rows)
+        self.enemy = self.enemy.take(rows)
+        self.enemy_attack_probability = self.enemy_attack_probability[rows]
+        self.count = len(rows)
+
+    def record(self, result: BatchResult, ids: np.ndarray, rows: np.ndarray, turns: np.ndarray) -> None:
+        player, enemy = self.player, self.enemy
+        result.win[ids[rows]] = (player.hp[rows] > 0) & (enemy.hp[rows] <= 0)
+        result.turns[ids[rows]] = turns[rows]
+        result.damage_dealt[ids[rows]] = enemy.max_hp[rows] - enemy.hp[rows]
+        result.damage_taken[ids[rows]] = player.max_hp[rows] - player.hp[rows]
+
+    def run(self, max_turns: int = DEFAULT_MAX_TURNS) -> BatchResult:
+        result = BatchResult(
+            win=np.zeros(self.count, dtype=bool),
+            turns=np.zeros(self.count, dtype=np.int64),
+            damage_dealt=np.zeros(self.count, dtype=np.int64),
+            damage_taken=np.zeros(self.count, dtype=np.int64),
+        )
+        ids = np.arange(self.count)
+        turns = np.zeros(self.count, dtype=np.int64)
+        for turn in range(1, max_turns + 1):
+            live = (self.player.hp > 0) & (self.enemy.hp > 0)
+            if not live.any():
+                break
+            if live.sum() * 2 < self.count:
+                self.record(result, ids, np.flatnonzero(~live), turns)
+                rows = np.flatnonzero(live)
+                self.compact(rows)
+                ids, turns, live = ids[rows], turns[rows], live[rows]
+            player, enemy = self.player, self.enemy
+            turns[live] = turn
+            self.start_turn(player, enemy, live)
+            self.start_turn(enemy, player, live)
+            intent = self.rng.choice(3, size=self.count, p=self.intent_weights)
+            player_attack = live & (intent == 0)
+            player.qi = np.where(player_attack & (player.qi > 0), player.qi - 1, player.qi)
+            self.attack(player, enemy, player_attack)
+            player_defend = live & (intent == 1)
+            self.gain_qi(player, 1, player_defend)
+            self.defend(player, enemy, player_defend)
+            self.transmute(player, enemy, live & (intent == 2))
+            acting = live & (enemy.hp > 0)
+            enemy_attack = acting & (self.uniform() < self.enemy_attack_probability)
+            self.attack(enemy, player, enemy_attack)
+            self.defend(enemy, player, acting & ~enemy_attack)
+            self.end_turn(player, acting)
+            self.end_turn(enemy, acting)
+        self.record(result, ids, np.arange(self.count), turns)
+        return result
+
+
+def simulate_batch(
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int,
+    count: int,
+    seed: int = 0,
+    policy_name: str = "attack",
+    max_turns: int = DEFAULT_MAX_TURNS,
+) -> BatchResult:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, outer_skill_ids)
+    engine = VectorBattle(inner_skill, outer_skills, stage, count, seed, POLICY_INTENT_WEIGHTS[policy_name])
+    return engine.run(max_turns)
+
+
+def compare_with_reference(
+    inner_skill_id: str,
+    outer_skill_ids: List[str],
+    stage: int,
+    battles: int,
+    seed: int = 0,
+    policy_name: str = "attack",
+) -> Dict[str, Tuple[float, float, float]]:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, outer_skill_ids)
+    reference = [
+        simulate_battle(inner_skill, outer_skills, stage, battle_seed(seed, index), create_policy(policy_name, battle_seed(seed, index)))
+        for index in range(battles)
+    ]
+    vector = simulate_batch(inner_skill_id, outer_skill_ids, stage, battles, seed, policy_name)
+    report = {}
+    for metric in ("win", "turns", "damage_dealt", "damage_taken"):
+        expected = np.array([float(getattr(result, metric)) for result in reference])
+        actual = getattr(vector, metric).astype(float)
+        standard_error = math.sqrt(expected.var(ddof=1) / battles + actual.var(ddof=1) / battles) or 1.0
+        report[metric] = (expected.mean(), actual.mean(), (actual.mean() - expected.mean()) / standard_error)
+    return report
+
+
+def sweep_outer_pool(
+    inner_skill_id: str,
+    base_outer_ids: List[str],
+    stage: int,
+    count: int,
+    seed: int = 0,
+    policy_name: str = "attack",
+) -> List[Tuple[str, float]]:
+    results = []
+    for skill in create_outer_pool():
+        batch = simulate_batch(inner_skill_id, base_outer_ids + [skill.id], stage, count, seed, policy_name)
+        results.append((skill.id, float(batch.win.mean())))
+    return sorted(results, key=lambda item: item[1], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NumPy 向量化批量战斗引擎")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument("--battles", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICY_INTENT_WEIGHTS), default="attack")
+    parser.add_argument("--check", type=int, default=0, help="与参考引擎对比的战斗场数")
+    parser.add_argument("--sweep", action="store_true", help="逐个加入外功池中的外功并比较胜率")
+    args = parser.parse_args()
+
+    if args.check:
+        report = compare_with_reference(args.inner_skill, args.outer_skills, args.stage, args.check, args.seed, args.policy)
+        for metric, (expected, actual, z_score) in report.items():
+            status = "一致" if abs(z_score) < Z_LIMIT else "偏差过大"
+            print(f"{metric}: 参考 {expected:.3f} | 向量 {actual:.3f} | z={z_score:+.2f} {status}")
+        if any(abs(z_score) >= Z_LIMIT for _, _, z_score in report.values()):
+            raise SystemExit(1)
+        return
+
+    started = time.perf_counter()
+    if args.sweep:
+        ranking = sweep_outer_pool(args.inner_skill, args.outer_skills, args.stage, args.battles, args.seed, args.policy)
+        elapsed = time.perf_counter() - started
+        for skill_id, win_rate in ranking:
+            print(f"+{skill_id}: 胜率 {win_rate:.4f}")
+        print(f"共 {len(ranking) * args.battles} 场，用时 {elapsed:.2f} 秒")
+        return
+    batch = simulate_batch(args.inner_skill, args.outer_skills, args.stage, args.battles, args.seed, args.policy)
+    elapsed = time.perf_counter() - started
+    print(f"战斗 {args.battles} 场，用时 {elapsed:.2f} 秒（{args.battles / elapsed:.0f} 场/秒）")
+    print(f"胜率 {batch.win.mean():.4f} | 平均回合 {batch.turns.mean():.2f} | 平均伤害 {batch.damage_dealt.mean():.2f}")
+
+
+if __name__ == "__main__":
+    main()
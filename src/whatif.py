@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from evaluate import CHUNK_SIZE, Z_95
+from simulate import DEFAULT_MAX_TURNS, POLICIES, BattleResult, battle_seed, create_policy, resolve_build, simulate_battle
+from stats import RunningStat
+from sweep import PARAMETERS, Tuning
+
+
+METRICS = ("win", "turns", "damage_dealt", "damage_taken")
+METRIC_LABELS = {
+    "win": "胜率",
+    "turns": "回合数",
+    "damage_dealt": "造成伤害",
+    "damage_taken": "承受伤害",
+}
+
+
+@dataclass(frozen=True)
+class Variant:
+    label: str
+    outer_skills: Tuple[str, ...]
+    tuning: Tuning = Tuning()
+
+
+@dataclass
+class Comparison:
+    values: List[Dict[str, RunningStat]] = field(default_factory=list)
+    differences: List[Dict[str, RunningStat]] = field(default_factory=list)
+
+    def merge(self, other: Comparison) -> None:
+        if not self.values:
+            self.values, self.differences = other.values, other.differences
+            return
+        for mine, theirs in zip(self.values + self.differences, other.values + other.differences):
+            for metric in METRICS:
+                mine[metric].merge(theirs[metric])
+
+
+def parse_variant(text: str, outer_skills: List[str]) -> Variant:
+    skills = list(outer_skills)
+    values: Dict[str, object] = {}
+    for token in filter(None, (part.strip() for part in text.split(","))):
+        name, separator, value = token.partition("=")
+        if separator:
+            if name not in PARAMETERS:
+                raise ValueError(f"未知参数 {name}，可选：{', '.join(PARAMETERS)}")
+            values[name] = PARAMETERS[name](value)
+        elif token[0] == "+":
+            skills.append(token[1:])
+        elif token[0] in "~-":
+            if token[1:] not in skills:
+                raise ValueError(f"构筑中没有外功 {token[1:]}，无法移除")
+            skills.remove(token[1:])
+        else:
+            raise ValueError(f"无法解析变体 {token}：应为 +外功、~外功 或 名称=值")
+    return Variant(text, tuple(skills), Tuning(**values))
+
+
+def metric_values(result: BattleResult) -> Dict[str, float]:
+    return {
+        "win": 1.0 if result.win else 0.0,
+        "turns": result.turns,
+        "damage_dealt": result.damage_dealt,
+        "damage_taken": result.damage_taken,
+    }
+
+
+def run_variant(
+    inner_skill_id: str,
+    variant: Variant,
+    seeds: List[int],
+    stage: int,
+    policy_name: str,
+    max_turns: Optional[int],
+    common_random: bool,
+) -> List[Dict[str, float]]:
+    inner_skill, outer_skills = resolve_build(inner_skill_id, list(variant.outer_skills))
+    outer_skills = variant.tuning.scale_skills(outer_skills)
+    balance = variant.tuning.balance()
+    return [
+        metric_values(
+            simulate_battle(
+                inner_skill, outer_skills, stage, seed, create_policy(policy_name, seed), max_turns, common_random, balance
+            )
+        )
+        for seed in seeds
+    ]
+
+
+def compare_chunk(
+    inner_skill_id: str,
+    variants: List[Variant],
+    stage: int,
+    policy_name: str,
+    master_seed: int,
+    start: int,
+    stop: int,
+    max_turns: Optional[int],
+    independent: bool,
+) -> Comparison:
+    comparison = Comparison()
+    baseline: List[Dict[str, float]] = []
+    for index, variant in enumerate(variants):
+        variant_seed = master_seed + index if independent else master_seed
+        seeds = [battle_seed(variant_seed, battle) for battle in range(start, stop)]
+        rows = run_variant(inner_skill_id, variant, seeds, stage, policy_name, max_turns, not independent)
+        values = {metric: RunningStat() for metric in METRICS}
+        for row in rows:
+            for metric in METRICS:
+                values[metric].add(row[metric])
+        comparison.values.append(values)
+        if index == 0:
+            baseline = rows
+            continue
+        differences = {metric: RunningStat() for metric in METRICS}
+        for row, base in zip(rows, baseline):
+            for metric in METRICS:
+                differences[metric].add(row[metric] - base[metric])
+        comparison.differences.append(differences)
+    return comparison
+
+
+def compare_variants(
+    inner_skill_id: str,
+    variants: List[Variant],
+    battles: int,
+    seed: int = 0,
+    stage: int = 1,
+    policy_name: str = "attack",
+    workers: Optional[int] = None,
+    max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    independent: bool = False,
+) -> Comparison:
+    for variant in variants:
+        resolve_build(inner_skill_id, list(variant.outer_skills))
+    tasks = [
+        (inner_skill_id, variants, stage, policy_name, seed, start, min(battles, start + CHUNK_SIZE), max_turns, independent)
+        for start in range(0, battles, CHUNK_SIZE)
+    ]
+    comparison = Comparison()
+    if workers == 1:
+        for task in tasks:
+            comparison.merge(compare_chunk(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(compare_chunk, *zip(*tasks)):
+                comparison.merge(chunk)
+    return comparison
+
+
+def battles_to_decide(mean: float, variance: float) -> float:
+    if mean == 0:
+        return math.inf
+    return (Z_95 * math.sqrt(variance) / abs(mean)) ** 2
+
+
+def format_battles(count: float) -> str:
+    return "无法判定" if math.isinf(count) else f"{math.ceil(count)} 场"
+
+
+def report_lines(variants: List[Variant], comparison: Comparison, independent: bool = False) -> List[str]:
+    lines = []
+    base = comparison.values[0]
+    for variant, values, differences in zip(variants[1:], comparison.values[1:], comparison.differences):
+        lines.append(f"变体 {variant.label}：外功 {list(variant.outer_skills)}")
+        for metric in METRICS:
+            difference = differences[metric]
+            margin = Z_95 * math.sqrt(difference.variance() / difference.count) if difference.count else 0.0
+            low, high = difference.mean - margin, difference.mean + margin
+            verdict = "显著" if low > 0 or high < 0 else "不显著"
+            unpaired = base[metric].variance() + values[metric].variance()
+            line = (
+                f"  {METRIC_LABELS[metric]}: {base[metric].mean:.4f} → {values[metric].mean:.4f}，"
+                f"差值 {difference.mean:+.4f} [{low:+.4f}, {high:+.4f}] {verdict}"
+            )
+            if not independent:
+                reduction = f"{unpaired / difference.variance():.1f}x" if difference.variance() else "—（差值恒定）"
+                line += (
+                    f" | 方差缩减 {reduction}，判定约需 {format_battles(battles_to_decide(difference.mean, difference.variance()))}"
+                    f"（独立抽样约 {format_battles(battles_to_decide(difference.mean, unpaired))}）"
+                )
+            lines.append(line)
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="共用随机数的变体对比评估")
+    parser.add_argument("inner_skill")
+    parser.add_argument("outer_skills", nargs="*")
+    parser.add_argument(
+        "--variant",
+        action="append",
+        required=True,
+        help=f"逗号分隔的改动：+外功、~外功（移除）或 名称=值（可选：{', '.join(PARAMETERS)}），可重复",
+    )
+    parser.add_argument("--battles", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="attack")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--independent", action="store_true", help="各变体改用独立随机种子，用于对照")
+    args = parser.parse_args()
+
+    try:
+        variants = [Variant("基础构筑", tuple(args.outer_skills))]
+        variants += [parse_variant(text, args.outer_skills) for text in args.variant]
+        for variant in variants:
+            resolve_build(args.inner_skill, list(variant.outer_skills))
+    except KeyError as error:
+        parser.error(f"未知的内功或外功: {error.args[0]}")
+    except ValueError as error:
+        parser.error(str(error))
+
+    started = time.perf_counter()
+    comparison = compare_variants(
+        args.inner_skill,
+        variants,
+        args.battles,
+        seed=args.seed,
+        stage=args.stage,
+        policy_name=args.policy,
+        workers=args.workers,
+        independent=args.independent,
+    )
+    elapsed = time.perf_counter() - started
+    mode = "独立随机种子" if args.independent else "共用随机数"
+    print(f"{len(variants)} 个变体 × {args.battles} 场（{mode}），用时 {elapsed:.2f} 秒")
+    for line in report_lines(variants, comparison, args.independent):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import pickle
+import sys
+
+from advisor import CACHE_VERSION, Valuation, ValuationCache, build_key
+
+
+def test_cache_discards_entries_for_other_content(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    key = build_key("taiji", ["shock"], 2, "attack", 400, 0, 200)
+    cache = ValuationCache(path, fingerprint="before")
+    cache.put(key, Valuation(0.5, 10.0))
+    cache.save()
+    assert ValuationCache(path, fingerprint="before").get(key) == Valuation(0.5, 10.0)
+    assert ValuationCache(path, fingerprint="after").get(key) is None
+
+
+def test_cache_file_holds_only_plain_data(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    key = build_key("taiji", ["shock"], 2, "attack", 400, 0, 200)
+    cache = ValuationCache(path, fingerprint="content")
+    cache.put(key, Valuation(0.25, 3.0))
+    cache.save()
+    with open(path, "rb") as handle:
+        assert b"Valuation" not in handle.read()
+    assert ValuationCache(path, fingerprint="content").get(key) == Valuation(0.25, 3.0)
+
+
+def test_cache_from_main_module_is_discarded(tmp_path, monkeypatch):
+    class MainValuation:
+        pass
+
+    MainValuation.__module__ = "__main__"
+    MainValuation.__qualname__ = "Valuation"
+    monkeypatch.setattr(sys.modules["__main__"], "Valuation", MainValuation, raising=False)
+    path = tmp_path / "cache.pkl"
+    path.write_bytes(pickle.dumps((CACHE_VERSION, "content", [("key", MainValuation())])))
+    monkeypatch.delattr(sys.modules["__main__"], "Valuation")
+    assert ValuationCache(str(path), fingerprint="content").entries == {}
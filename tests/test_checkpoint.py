@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from checkpoint import (
+    CHECKPOINT_MAGIC,
+    KIND_JOB,
+    Checkpointer,
+    CheckpointError,
+    JobCheckpoint,
+    RunCheckpoint,
+    decode_checkpoint,
+    encode_checkpoint,
+    load_checkpoint,
+    run_job,
+    save_checkpoint,
+)
+from codec import FormatError, read_varint, write_varint
+from roguelike import STATUS_IDS, RunState, create_inner_skills, create_player
+from simulate import create_policy, record_stages, simulate_run
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_varint_round_trip():
+    buffer = bytearray()
+    values = [0, 1, 127, 128, 300, 1 << 40]
+    for value in values:
+        write_varint(buffer, value)
+    offset = 0
+    for value in values:
+        decoded, offset = read_varint(bytes(buffer), offset)
+        assert decoded == value
+    with pytest.raises(FormatError):
+        read_varint(bytes(buffer[:-1]), offset - 1)
+    with pytest.raises(FormatError):
+        write_varint(bytearray(), -1)
+
+
+def test_job_matches_simulate(tmp_path):
+    job = run_job(str(tmp_path / "job.wxck"), 40, 7, "random", 50, 200, interval=1e9)
+    expected = {}
+    for seed in range(7, 47):
+        result = simulate_run(seed, create_policy("random", seed), max_stages=50, max_turns=200)
+        record_stages(expected, result.inner_skill, result.stages_cleared)
+    assert job.stages_by_inner == expected
+
+
+def test_interrupted_job_resumes(tmp_path, monkeypatch):
+    reference = run_job(str(tmp_path / "reference.wxck"), 40, 3, "random", 50, 200, interval=1e9)
+    path = str(tmp_path / "job.wxck")
+    save = Checkpointer.save
+    saves = []
+
+    def interrupting_save(self, run):
+        save(self, run)
+        saves.append(run)
+        if run is not None and len(saves) >= 25:
+            raise Interrupted
+
+    monkeypatch.setattr(Checkpointer, "save", interrupting_save)
+    with pytest.raises(Interrupted):
+        run_job(path, 40, 3, "random", 50, 200, interval=0)
+    monkeypatch.setattr(Checkpointer, "save", save)
+    assert run_job(path, 40, 3, "random", 50, 200, interval=1e9).stages_by_inner == reference.stages_by_inner
+
+
+def test_decode_rejects_old_job_and_corrupt_data():
+    data = encode_checkpoint(JobCheckpoint(0, "random", 50, 200))
+    assert decode_checkpoint(data) == JobCheckpoint(0, "random", 50, 200)
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(CHECKPOINT_MAGIC + bytes([1, KIND_JOB]) + data[6:])
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(data[:-3])
+
+
+def run_checkpoint(status_count: int = len(STATUS_IDS)) -> RunCheckpoint:
+    player = create_player(create_inner_skills()[0])
+    player.status_stacks = list(range(status_count))
+    return RunCheckpoint(RunState(player, None, 2, 1), random.Random(0).getstate())
+
+
+def test_decode_rejects_wrong_status_count():
+    assert decode_checkpoint(encode_checkpoint(run_checkpoint())).state.player.status_stacks == list(range(len(STATUS_IDS)))
+    for count in (len(STATUS_IDS) - 1, len(STATUS_IDS) + 1):
+        with pytest.raises(CheckpointError):
+            decode_checkpoint(encode_checkpoint(run_checkpoint(count)))
+
+
+def test_save_leaves_no_temporary_files(tmp_path):
+    path = tmp_path / "save.wxck"
+    save_checkpoint(str(path), run_checkpoint())
+    save_checkpoint(str(path), run_checkpoint())
+    assert load_checkpoint(str(path)).state.stage == 2
+    blocked = tmp_path / "blocked"
+    blocked.mkdir()
+    (blocked / "inner").mkdir()
+    with pytest.raises(OSError):
+        save_checkpoint(str(blocked), run_checkpoint())
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["blocked", "save.wxck"]
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import json
+import pickle
+import shutil
+
+import pytest
+
+from roguelike import CONTENT_PATH, content_cache_path, load_content, parse_content
+
+
+def test_cached_content_matches_parsed_content(tmp_path):
+    path = str(tmp_path / "content.json")
+    shutil.copy(CONTENT_PATH, path)
+    with open(path, encoding="utf-8") as handle:
+        parsed = parse_content(json.load(handle))
+    assert load_content(path) == parsed
+    with open(content_cache_path(path), "rb") as handle:
+        assert b"roguelike" not in handle.read()
+    assert load_content(path) == parsed
+
+
+def test_content_objects_are_immutable():
+    content = load_content()
+    skill = content.inner_skills[0]
+    with pytest.raises(TypeError):
+        skill.hooks["onHit"] = ()
+    with pytest.raises(TypeError):
+        content.outer_skills[0].effect.update(amount=99)
+    restored = pickle.loads(pickle.dumps(skill))
+    assert restored == skill and hash(restored) == hash(skill)
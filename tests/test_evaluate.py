@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from evaluate import CHUNK_SIZE, Z_95, BuildStats, evaluate_build, run_battles, summarize, wilson_interval
+from simulate import DEFAULT_MAX_TURNS, resolve_build
+
+
+def test_wilson_interval_bounds():
+    assert wilson_interval(0, 0) == (0.0, 0.0)
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.40383, abs=1e-5)
+    assert high == pytest.approx(0.59617, abs=1e-5)
+    assert wilson_interval(0, 20)[0] == pytest.approx(0.0, abs=1e-12)
+    assert wilson_interval(20, 20)[1] == pytest.approx(1.0)
+    for successes in range(0, 31):
+        low, high = wilson_interval(successes, 30)
+        assert -1e-12 <= low <= successes / 30 <= high <= 1.0 + 1e-12
+    assert wilson_interval(500, 1000)[1] - wilson_interval(500, 1000)[0] < wilson_interval(50, 100)[1] - wilson_interval(50, 100)[0]
+
+
+def test_summarize_histogram():
+    assert summarize({}) is None
+    distribution = summarize({1: 2, 3: 2, 10: 1})
+    values = [1, 1, 3, 3, 10]
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+    margin = Z_95 * math.sqrt(variance / len(values))
+    assert distribution.count == 5
+    assert distribution.mean == pytest.approx(mean)
+    assert (distribution.ci_low, distribution.ci_high) == pytest.approx((mean - margin, mean + margin))
+    assert (distribution.p50, distribution.p90, distribution.p99) == (3, 10, 10)
+
+
+def test_chunks_merge_into_the_single_pass_stats():
+    inner_skill, outer_skills = resolve_build("taiji", ["shock", "combo"])
+    whole = run_battles(inner_skill, outer_skills, 2, "random", 3, 0, 300, 100)
+    merged = BuildStats()
+    for start, stop in ((0, 120), (120, 121), (121, 300)):
+        merged.merge(run_battles(inner_skill, outer_skills, 2, "random", 3, start, stop, 100))
+    assert merged == whole
+    report = evaluate_build("taiji", ["shock"], CHUNK_SIZE + 300, seed=1, workers=1)
+    stats = run_battles(*resolve_build("taiji", ["shock"]), 1, "attack", 1, 0, CHUNK_SIZE + 300, DEFAULT_MAX_TURNS)
+    assert report.battles == stats.battles
+    assert report.win_rate == stats.wins / stats.battles
+    assert report.damage_taken == summarize(stats.damage_taken)
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import math
+import random
+
+import pytest
+
+from expected import StatusBucket, evaluate_turn, representative_player
+from roguelike import STATUS_IDS, STATUS_INDEX, BattleContext, apply_player_intent, build_enemy, create_inner_skills, enemy_profiles, start_turn
+from simulate import resolve_build
+
+
+def stacks(**values: int):
+    result = [0] * len(STATUS_IDS)
+    for name, value in values.items():
+        result[STATUS_INDEX[name]] = value
+    return tuple(result)
+
+
+def sampled_turn(inner_skill, outer_skills, hp_bucket_index: int, bucket: StatusBucket, intent: str, battles: int):
+    enemy_inner_skill = {skill.id: skill for skill in create_inner_skills()}["taiji"]
+    damage = []
+    for seed in range(battles):
+        player = representative_player(inner_skill, hp_bucket_index, bucket)
+        player.outer_skills = list(outer_skills)
+        enemy = build_enemy(enemy_profiles(1)[0], enemy_inner_skill)
+        enemy.max_hp = enemy.hp = 10**6
+        enemy.qi = bucket.target_qi
+        enemy.status_stacks = list(bucket.target)
+        ctx = BattleContext(rng=random.Random(seed), quiet=True)
+        start_turn(player, enemy, ctx)
+        apply_player_intent(player, enemy, ctx, intent)
+        damage.append(enemy.max_hp - enemy.hp)
+    mean = sum(damage) / battles
+    variance = sum((value - mean) ** 2 for value in damage) / (battles - 1)
+    return mean, math.sqrt(variance / battles)
+
+
+@pytest.mark.parametrize("intent, attack_share", [("1", 1.0), ("2", 0.0)])
+def test_turn_expectation_matches_sampled_turn(intent, attack_share):
+    inner_skill, outer_skills = resolve_build(
+        "nine_sun", ["shock", "combo", "consume_shock", "quick_strike", "pierce", "echo", "backlash", "bleed"]
+    )
+    bucket = StatusBucket(2, 3, stacks(crit_focus=1), stacks(shock=2, vulnerable=1, shield_qi=2))
+    expected = evaluate_turn(inner_skill, outer_skills, 1, bucket).damage_per_turn(attack_share)
+    mean, error = sampled_turn(inner_skill, outer_skills, 1, bucket, intent, 8000)
+    assert expected > 0
+    assert abs(mean - expected) < 4 * error
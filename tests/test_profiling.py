@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from profiling import Profiler
+from simulate import battle_seed, create_policy, resolve_build, simulate_battle
+
+
+def test_profiled_battles_match_unprofiled():
+    inner_skill, outer_skills = resolve_build("taiji", ["shock", "combo", "echo", "riposte"])
+    profiler = Profiler()
+    for index in range(100):
+        seed = battle_seed(0, index)
+        result = simulate_battle(inner_skill, outer_skills, 3, seed, create_policy("random", seed))
+        assert profiler.profile_battle(inner_skill, outer_skills, 3, seed, create_policy("random", seed)) == result.win
+    assert len(profiler.rng_draws) == 100
+    assert sum(profiler.trigger_sizes.values()) == profiler.stats[("trigger", "onHit")].calls + profiler.stats[("trigger", "onDefense")].calls
+    assert sum(size * count for size, count in profiler.trigger_sizes.items()) == sum(
+        stat.calls for (category, _), stat in profiler.stats.items() if category == "skill"
+    )
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import zlib
+
+import pytest
+
+from replay import REPLAY_MAGIC, REPLAY_VERSION, Replay, ReplayError, ReplayPlayer, decode_replay, encode_replay, record_run
+
+
+@pytest.mark.parametrize("policy_name", ["attack", "random"])
+@pytest.mark.parametrize("max_stages", [1, 2, None])
+def test_replay_reproduces_recorded_run(policy_name, max_stages):
+    for seed in range(60):
+        replay, stages_cleared = record_run(seed, policy_name, max_stages, 200)
+        decoded = decode_replay(encode_replay(replay, compress=seed % 2 == 1))
+        assert decoded == replay
+        player, replayed = ReplayPlayer(decoded).play()
+        assert replayed == stages_cleared
+        assert len(player.outer_skills) == len(replay.rewards)
+
+
+def header(flags: int = 0) -> bytes:
+    return REPLAY_MAGIC + bytes([REPLAY_VERSION, flags])
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"junk",
+        REPLAY_MAGIC + bytes([99, 0]),
+        header(1) + b"not zlib",
+        header() + bytes([1, 2, 0xFF, 0xFE, 0, 0, 0, 0]),
+        header() + bytes([1, 40, 0x61]),
+        header() + bytes([1, 1, 0x61, 0, 0, 1, 3, 0]),
+        header(1) + zlib.compress(bytes([1, 1, 0x61, 0, 0, 1, 3, 0])),
+    ],
+)
+def test_decode_rejects_corrupt_data(data):
+    with pytest.raises(ReplayError):
+        decode_replay(data)
+
+
+def test_decode_reads_version_one_header():
+    payload = bytes([5, 1]) + b"x" + bytes([11, 2, 0b0100, 0])
+    replay = decode_replay(REPLAY_MAGIC + bytes([1, 0]) + payload)
+    assert replay == Replay(seed=5, inner_skill="x", intents=["1", "2"], rewards=[], max_turns=10, max_stages=None)
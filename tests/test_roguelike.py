@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import random
+from dataclasses import replace
+
+import pytest
+
+from roguelike import (
+    ATTACK_RESULTS,
+    INTERNED_DAMAGE_LIMIT,
+    Balance,
+    BattleContext,
+    attack_result,
+    build_enemy,
+    create_inner_skills,
+    create_outer_pool,
+    create_player,
+    end_action,
+    enemy_profiles,
+    perform_attack,
+    strike,
+)
+
+
+def attack_with(base_damage: int, crit_chance: float = 0.0):
+    inner_skill = create_inner_skills()[0]
+    attacker = create_player(inner_skill)
+    defender = build_enemy(enemy_profiles(1)[0], inner_skill)
+    ctx = BattleContext(rng=random.Random(0), quiet=True, balance=Balance(base_damage=base_damage, crit_chance=crit_chance))
+    return perform_attack(attacker, defender, ctx)
+
+
+@pytest.mark.parametrize("damage", [-3, 0, 5, INTERNED_DAMAGE_LIMIT, 10**9])
+def test_attack_result_keeps_actual_damage(damage):
+    for crit in (False, True):
+        result = attack_result(crit, damage)
+        assert (result.crit, result.damage) == (crit, damage)
+    assert all(len(results) == INTERNED_DAMAGE_LIMIT for results in ATTACK_RESULTS)
+
+
+@pytest.mark.parametrize("base_damage", [-3, 5, 10**9])
+def test_perform_attack_reports_dealt_multiple_of_base(base_damage):
+    assert attack_with(base_damage).damage == base_damage
+    assert attack_with(base_damage, crit_chance=1.0).damage == base_damage * 2
+
+
+def strike_with_budget(chain_budget):
+    pool = {skill.id: skill for skill in create_outer_pool()}
+    inner_skill = create_inner_skills()[0]
+    player = create_player(inner_skill)
+    player.outer_skills = [replace(pool["quick_strike"], chance=1.0)] + [pool["shock"]] * 4
+    enemy = build_enemy(enemy_profiles(1)[0], inner_skill)
+    enemy.max_hp = enemy.hp = 10**6
+    ctx = BattleContext(rng=random.Random(0), balance=Balance(crit_chance=0.0), chain_budget=chain_budget)
+    for _ in range(2):
+        strike(player, enemy, ctx)
+        end_action(player, ctx)
+    return [event for event in ctx.logs if event.kind in ("skill_trigger", "chain_truncated")]
+
+
+def test_chain_budget_is_shared_across_triggers_and_reported():
+    events = strike_with_budget(2)
+    action = [("skill_trigger", "quick_strike", 0), ("skill_trigger", "shock", 0), ("chain_truncated", "", 3)]
+    assert [(event.kind, event.skill, event.amount) for event in events] == action * 2
+
+
+def test_unbounded_chain_budget_resolves_every_skill():
+    events = strike_with_budget(None)
+    assert [event.skill for event in events] == ["quick_strike"] + ["shock"] * 4 + ["quick_strike"] + ["shock"] * 4
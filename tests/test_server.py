@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pickle
+
+import pytest
+
+from roguelike import create_outer_pool
+from server import GameServer, Session, SessionError
+
+
+def started_session() -> Session:
+    session = Session("abc", 7, create_outer_pool())
+    session.start()
+    return session
+
+
+@pytest.mark.parametrize("intent", ["", "12", "23", "123", 12, 1, None])
+def test_player_step_rejects_invalid_intents(intent):
+    session = started_session()
+    with pytest.raises(SessionError):
+        session.player_step(intent)
+
+
+@pytest.mark.parametrize("intent", ["1", "2", "3"])
+def test_player_step_accepts_intents(intent):
+    started_session().player_step(intent)
+
+
+def test_restore_rejects_removed_outer_skill():
+    outer_pool = create_outer_pool()
+    session = started_session()
+    session.state = "reward"
+    session.reward_options = outer_pool[:3]
+    data = session.dump()
+    with pytest.raises(SessionError):
+        Session.restore(data, outer_pool[1:])
+    restored = Session.restore(data, outer_pool)
+    assert [skill.id for skill in restored.reward_options] == [skill.id for skill in outer_pool[:3]]
+
+
+def test_dump_stores_actors_by_skill_id():
+    outer_pool = create_outer_pool()
+    session = started_session()
+    session.player.add_outer_skill(outer_pool[4])
+    session.player.add_status("shield_qi", 3)
+    session.player_step("1")
+    session.enemy_step()
+    data = pickle.loads(pickle.dumps(session.dump()))
+    assert all(isinstance(value, (bytes, type(None))) for value in data[6:8])
+    restored = Session.restore(data, outer_pool)
+    assert restored.player == session.player
+    assert restored.enemy == session.enemy
+    assert restored.player.outer_skills[-1] is outer_pool[4]
+    assert restored.ctx.rng.getstate() == session.ctx.rng.getstate()
+    with pytest.raises(SessionError):
+        Session.restore(data, outer_pool[:4] + outer_pool[5:])
+
+
+@pytest.mark.parametrize("data", [b"cmissing_module\nGhost\n.", b"cserver\nMissingClass\n.", b"\x80\x05garbage"])
+def test_find_session_reports_unloadable_files(tmp_path, data):
+    server = GameServer(str(tmp_path))
+    (tmp_path / "abc.session").write_bytes(data)
+    with pytest.raises(SessionError):
+        server.find_session("abc")
+
+
+def test_drained_events_carry_structured_fields():
+    session = started_session()
+    session.drain_events()
+    session.player_step("1")
+    events = session.drain_events()
+    hit = next(event for event in events if event["kind"] == "attack_hit")
+    assert hit["actor"] == session.player.name
+    assert hit["target"] == session.enemy.name
+    assert hit["amount"] > 0
+    assert set(hit) == {"kind", "actor", "target", "amount", "status", "skill", "extra", "text"}
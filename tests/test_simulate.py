@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import builtins
+import random
+from typing import Callable
+
+import pytest
+
+from roguelike import BattleContext, battle, create_enemy, create_outer_pool, create_player, play_run
+from simulate import (
+    DEFAULT_MAX_STAGES,
+    DEFAULT_MAX_TURNS,
+    RandomPolicy,
+    create_policy,
+    policy_seed,
+    resolve_build,
+    simulate_battle,
+    simulate_run,
+)
+
+
+SEEDS = range(40)
+
+
+def scripted_input(policy: RandomPolicy) -> Callable[[str], str]:
+    def answer(prompt: str = "") -> str:
+        if "外功" in prompt:
+            return policy.rng.choice("123")
+        return policy.choose_intent(None, None, None)
+
+    return answer
+
+
+@pytest.fixture
+def quiet_print(monkeypatch):
+    monkeypatch.setattr(builtins, "print", lambda *args, **kwargs: None)
+
+
+def test_policy_stream_is_independent_of_battle_stream():
+    for seed in SEEDS:
+        assert policy_seed(seed) != seed
+        assert create_policy("random", seed).rng.random() != random.Random(seed).random()
+    assert policy_seed(None) is None
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_simulate_run_matches_interactive_play_run(seed, monkeypatch, quiet_print):
+    outer_pool = create_outer_pool()
+    result = simulate_run(seed, create_policy("random", seed), outer_pool)
+
+    monkeypatch.setattr(builtins, "input", scripted_input(create_policy("random", seed)))
+    ctx = BattleContext(rng=random.Random(seed))
+    player, stages_cleared = play_run(ctx, outer_pool, max_stages=DEFAULT_MAX_STAGES, max_turns=DEFAULT_MAX_TURNS)
+
+    assert result.inner_skill == player.inner_skill.id
+    assert result.stages_cleared == stages_cleared
+    assert result.outer_skills == [skill.id for skill in player.outer_skills]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_simulate_battle_matches_interactive_battle(seed, monkeypatch, quiet_print):
+    inner_skill, outer_skills = resolve_build("suction_star", ["shock", "combo", "riposte"])
+    result = simulate_battle(inner_skill, outer_skills, 3, seed, create_policy("random", seed))
+
+    monkeypatch.setattr(builtins, "input", scripted_input(create_policy("random", seed)))
+    ctx = BattleContext(rng=random.Random(seed))
+    player = create_player(inner_skill)
+    player.outer_skills = list(outer_skills)
+    enemy = create_enemy(3, ctx.rng)
+    win = battle(player, enemy, ctx, max_turns=DEFAULT_MAX_TURNS)
+
+    assert result.win == win
+    assert result.turns == ctx.turn
+    assert result.damage_dealt == enemy.max_hp - enemy.hp
+    assert result.damage_taken == player.max_hp - player.hp
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import random
+
+from roguelike import Balance, BattleContext, build_enemy, create_inner_skills, create_outer_pool, create_player, enemy_profiles, play_turn
+from search import SearchNode, SearchPolicy, run_search
+from simulate import create_policy, simulate_battle
+from snapshot import capture_battle, fork_battle, restore_battle
+
+
+def create_battle(balance: Balance = Balance(), chain_budget=8):
+    inner_skills = create_inner_skills()
+    player = create_player(inner_skills[0])
+    player.outer_skills = create_outer_pool()[:4]
+    enemy = build_enemy(enemy_profiles(2, balance)[0], inner_skills[1])
+    ctx = BattleContext(rng=random.Random(5), quiet=True, turn=3, stage=2, balance=balance, chain_budget=chain_budget)
+    return player, enemy, ctx
+
+
+def play_turns(player, enemy, ctx, turns: int = 3):
+    policy = create_policy("random", 11)
+    for _ in range(turns):
+        play_turn(player, enemy, ctx, policy.choose_intent)
+    return capture_battle(player, enemy, ctx)
+
+
+def test_restore_replays_the_same_turns():
+    player, enemy, ctx = create_battle()
+    player.add_status("shield_qi", 2)
+    snapshot = capture_battle(player, enemy, ctx)
+    after = play_turns(player, enemy, ctx)
+    restore_battle(snapshot, player, enemy, ctx)
+    assert capture_battle(player, enemy, ctx) == snapshot
+    assert play_turns(player, enemy, ctx) == after
+
+
+def test_fork_keeps_settings_and_leaves_the_source_untouched():
+    balance = Balance(base_damage=7, crit_chance=0.3, enemy_hp_scale=1.5)
+    player, enemy, ctx = create_battle(balance, chain_budget=2)
+    snapshot = capture_battle(player, enemy, ctx)
+    forked_player, forked_enemy, forked_ctx = fork_battle(snapshot, player, enemy)
+    assert (forked_ctx.turn, forked_ctx.stage, forked_ctx.balance, forked_ctx.chain_budget) == (3, 2, balance, 2)
+    assert forked_player.outer_skills is player.outer_skills
+    assert play_turns(forked_player, forked_enemy, forked_ctx) == play_turns(player, enemy, ctx)
+    assert forked_player.status_stacks is not player.status_stacks
+    restore_battle(snapshot, player, enemy, ctx)
+    play_turns(forked_player, forked_enemy, forked_ctx)
+    assert capture_battle(player, enemy, ctx) == snapshot
+
+
+def test_search_rollouts_use_the_battle_balance():
+    values = []
+    for balance in (Balance(), Balance(base_damage=1000)):
+        player, enemy, ctx = create_battle(balance)
+        player.outer_skills = []
+        snapshot = capture_battle(player, enemy, ctx, include_rng=False)
+        root = run_search(SearchNode(), snapshot, player, enemy, 0, 60, None, horizon=1)
+        child = root.children["1"]
+        values.append(child.value / child.visits)
+    assert values[0] < 0.5 < values[1]
+
+
+def test_search_policy_is_deterministic_per_seed():
+    inner_skill = create_inner_skills()[0]
+    results = []
+    for _ in range(2):
+        with SearchPolicy(3, iterations=30, horizon=4) as policy:
+            results.append(simulate_battle(inner_skill, [], 1, 9, policy))
+    assert results[0] == results[1]
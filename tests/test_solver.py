@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import random
+from typing import Dict, List, Tuple
+
+import pytest
+
+from roguelike import BattleContext, build_enemy, create_inner_skills, create_player, enemy_profiles, play_turn
+from simulate import resolve_build
+from snapshot import capture_actor, restore_actor
+from solver import Branch, BranchOracle, SolverError, attack_intents, random_intents, solve_battle, solve_stage
+
+
+def reference_win_probability(player, enemy, policy, max_turns: int) -> float:
+    ctx = BattleContext(rng=random.Random(0), quiet=True)
+    frontier: Dict[Tuple[object, object], float] = {(capture_actor(player), capture_actor(enemy)): 1.0}
+    win = 0.0
+    for _ in range(max_turns):
+        following: Dict[Tuple[object, object], float] = {}
+        for state, mass in frontier.items():
+            prefixes: List[Tuple[object, ...]] = [()]
+            while prefixes:
+                prefix = prefixes.pop()
+                oracle = BranchOracle(prefix, policy)
+                ctx.roller = oracle.roll
+                restore_actor(player, state[0])
+                restore_actor(enemy, state[1])
+                try:
+                    play_turn(player, enemy, ctx, oracle.choose_intent)
+                except Branch:
+                    prefixes.extend(prefix + (option,) for option, _ in oracle.options)
+                    continue
+                weight = mass * oracle.probability
+                if player.hp <= 0:
+                    continue
+                if enemy.hp <= 0:
+                    win += weight
+                    continue
+                key = (capture_actor(player), capture_actor(enemy))
+                following[key] = following.get(key, 0.0) + weight
+        frontier = following
+    return win
+
+
+@pytest.mark.parametrize(
+    "inner_skill_id, outer_skill_ids, policy, max_turns",
+    [
+        ("taiji", [], random_intents, 4),
+        ("nine_sun", ["shock", "combo", "consume_shock"], attack_intents, 6),
+        ("withered_zen", ["frenzy", "crit_focus", "riposte"], random_intents, 3),
+    ],
+)
+def test_solver_matches_full_turn_enumeration(inner_skill_id, outer_skill_ids, policy, max_turns):
+    inner_skill, outer_skills = resolve_build(inner_skill_id, outer_skill_ids)
+    for enemy_inner_skill in create_inner_skills():
+        enemy = build_enemy(enemy_profiles(2)[0], enemy_inner_skill)
+        solved = solve_battle(inner_skill, outer_skills, enemy, policy, max_turns)
+        player = create_player(inner_skill)
+        player.outer_skills = list(outer_skills)
+        expected = reference_win_probability(player, build_enemy(enemy_profiles(2)[0], enemy_inner_skill), policy, max_turns)
+        assert solved.win_probability == pytest.approx(expected, abs=1e-12)
+
+
+def test_random_policy_terminates_when_stacks_are_capped():
+    inner_skill, outer_skills = resolve_build("taiji", [])
+    enemy = build_enemy(enemy_profiles(1)[0], {skill.id: skill for skill in create_inner_skills()}["taiji"])
+    result = solve_battle(inner_skill, outer_skills, enemy, random_intents, max_states=20000)
+    assert result.win_probability + result.loss_probability == pytest.approx(1.0)
+
+
+def test_unbounded_state_space_is_rejected():
+    inner_skill, outer_skills = resolve_build("taiji", [])
+    enemy = build_enemy(enemy_profiles(1)[0], {skill.id: skill for skill in create_inner_skills()}["nine_sun"])
+    with pytest.raises(SolverError):
+        solve_battle(inner_skill, outer_skills, enemy, random_intents, max_states=2000)
+
+
+def test_stage_reports_unsolved_enemies_and_keeps_the_rest():
+    inner_skill, outer_skills = resolve_build("taiji", [])
+    enemy_inner_skills = create_inner_skills()
+    weight = 1 / (len(enemy_profiles(1)) * len(enemy_inner_skills))
+    unsolved = []
+    win_probability = 0.0
+    for profile in enemy_profiles(1):
+        for enemy_inner_skill in enemy_inner_skills:
+            try:
+                solved = solve_battle(inner_skill, outer_skills, build_enemy(profile, enemy_inner_skill), random_intents, 3, max_states=700)
+            except SolverError:
+                unsolved.append(f"敌人-{profile[0]}·{enemy_inner_skill.id}")
+                continue
+            win_probability += solved.win_probability * weight
+    assert 0 < len(unsolved) < len(enemy_profiles(1)) * len(enemy_inner_skills)
+    result = solve_stage("taiji", [], 1, "random", max_turns=3, max_states=700)
+    assert result.unsolved == unsolved
+    assert result.unsolved_probability == pytest.approx(len(unsolved) * weight)
+    assert result.win_probability == pytest.approx(win_probability)
+    assert result.win_probability + result.loss_probability + result.unsolved_probability == pytest.approx(1.0)
+    with pytest.raises(SolverError):
+        solve_stage("taiji", [], 1, "random", max_turns=3, max_states=100)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from roguelike import Event
+from stats import QuantileSketch, RunningStat, StatsCollector, collect_runs
+
+
+def two_pass(values):
+    mean = sum(values) / len(values)
+    return mean, sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+
+
+def test_running_stat_merge_matches_two_pass_variance():
+    rng = random.Random(1)
+    values = [rng.gauss(1e6, 3.0) for _ in range(500)] + [rng.expovariate(0.1) for _ in range(300)]
+    for split in (0, 1, 400, 799):
+        left, right = RunningStat(), RunningStat()
+        for value in values[:split]:
+            left.add(value)
+        for value in values[split:]:
+            right.add(value)
+        left.merge(right)
+        mean, variance = two_pass(values)
+        assert left.count == len(values)
+        assert left.mean == pytest.approx(mean, rel=1e-12)
+        assert left.variance() == pytest.approx(variance, rel=1e-9)
+        assert (left.minimum, left.maximum) == (min(values), max(values))
+
+
+def test_sketch_quantiles_stay_within_relative_accuracy():
+    rng = random.Random(2)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(4000)] + [0.0] * 200 + [-rng.expovariate(1.0) for _ in range(300)]
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for index, value in enumerate(values):
+        whole.add(value)
+        (left if index % 2 else right).add(value)
+    left.merge(right)
+    ordered = sorted(values)
+    for fraction in (0.01, 0.05, 0.1, 0.5, 0.9, 0.99, 1.0):
+        exact = ordered[int(fraction * (len(values) - 1))]
+        assert whole.quantile(fraction) == pytest.approx(exact, rel=whole.relative_accuracy, abs=1e-12)
+        assert left.quantile(fraction) == whole.quantile(fraction)
+    with pytest.raises(ValueError):
+        whole.merge(QuantileSketch(relative_accuracy=0.05))
+
+
+def test_skill_damage_is_attributed_per_trigger():
+    collector = StatsCollector()
+    events = [
+        Event("run_start", "玩家", skill="taiji"),
+        Event("stage_start", amount=1),
+        Event("damage", "玩家", "敌人", 2, skill="pierce"),
+        Event("skill_trigger", "玩家", "敌人", skill="pierce"),
+        Event("status_consume", "玩家", "敌人", 6, status="shock", skill="consume_shock"),
+        Event("chain_damage", "玩家", "敌人", 3, skill="combo"),
+        Event("skill_trigger", "玩家", "敌人", skill="consume_shock"),
+        Event("skill_trigger", "玩家", "敌人", skill="combo"),
+        Event("skill_trigger", "玩家", "敌人", skill="pierce"),
+        Event("attack_hit", "敌人", "玩家", 5),
+    ]
+    for event in events:
+        collector(event)
+    collector.close()
+    totals = {skill: (metric.stat.count, metric.stat.total()) for skill, metric in collector.skill_damage.items()}
+    assert totals == {"pierce": (2, 2.0), "consume_shock": (1, 6.0), "combo": (1, 3.0)}
+    assert collector.attack_damage["敌人"].stat.total() == 5
+    assert collector.stage_reached["taiji"].stat.mean == 1
+
+
+def test_chunks_merge_like_one_pass():
+    whole = collect_runs(4, "attack", 0, 30, 20, 100)
+    merged = collect_runs(4, "attack", 0, 12, 20, 100)
+    merged.merge(collect_runs(4, "attack", 12, 30, 20, 100))
+    assert merged.runs == whole.runs == 30
+    assert merged.events == whole.events
+    for name, metric in whole.stage_reached.items():
+        assert merged.stage_reached[name].stat.mean == pytest.approx(metric.stat.mean)
+        assert merged.stage_reached[name].stat.variance() == pytest.approx(metric.stat.variance())
+    assert collect_runs(5, "attack", 0, 30, 20, 100).events != collect_runs(4, "attack", 1, 31, 20, 100).events
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pytest
+
+from evaluate import run_battles
+from simulate import resolve_build
+from sweep import Tuning, evaluate_point, grid_points, parse_param, random_points, run_sweep
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["base_damage=-3,5", "crit_chance=1.5", "crit_chance=0.2:1.5", "enemy_hp_scale=-1", "base_damage=6:2", "speed=1"],
+)
+def test_parse_param_rejects_invalid_values(text):
+    with pytest.raises(ValueError):
+        parse_param(text)
+
+
+def test_tuning_rejects_out_of_range_values():
+    with pytest.raises(ValueError):
+        Tuning(base_damage=-1)
+    with pytest.raises(ValueError):
+        Tuning(crit_chance=1.01)
+
+
+def test_points_cover_requested_values():
+    params = dict([parse_param("base_damage=4,6"), parse_param("crit_chance=0,0.5")])
+    assert [(point.base_damage, point.crit_chance) for point in grid_points(params)] == [(4, 0.0), (4, 0.5), (6, 0.0), (6, 0.5)]
+    samples = list(random_points(dict([parse_param("crit_chance=0.2:0.4")]), 50, 3))
+    assert all(0.2 <= point.crit_chance <= 0.4 for point in samples)
+
+
+def test_default_tuning_matches_untuned_battles():
+    inner_skill, outer_skills = resolve_build("taiji", ["shock", "combo"])
+    point = evaluate_point(0, Tuning(), "taiji", ["shock", "combo"], 2, "random", 5, 300, 200)
+    assert point.stats == run_battles(inner_skill, outer_skills, 2, "random", 5, 0, 300, 200)
+
+
+def test_tuning_reaches_the_engine():
+    weak = evaluate_point(0, Tuning(base_damage=2, enemy_hp_scale=1.5), "taiji", [], 2, "attack", 0, 300, 200).stats
+    strong = evaluate_point(1, Tuning(base_damage=9, enemy_hp_scale=0.5), "taiji", [], 2, "attack", 0, 300, 200).stats
+    assert strong.wins > weak.wins
+    assert min(strong.turns_to_kill) < min(weak.turns_to_kill)
+
+
+def test_interrupted_sweep_resumes(tmp_path):
+    params = dict([parse_param("base_damage=4,5,6"), parse_param("enemy_attack_scale=0.5,1")])
+    full = tmp_path / "full.csv"
+    assert run_sweep(str(full), grid_points(params), list(params), "taiji", ["shock"], battles=100, workers=1) == (0, 6)
+    lines = full.read_text(encoding="utf-8").splitlines(keepends=True)
+    partial = tmp_path / "partial.csv"
+    partial.write_text("".join(lines[:4]) + lines[4][:5], encoding="utf-8")
+    assert run_sweep(str(partial), grid_points(params), list(params), "taiji", ["shock"], battles=100, workers=1) == (3, 3)
+    assert partial.read_text(encoding="utf-8") == full.read_text(encoding="utf-8")
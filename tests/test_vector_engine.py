@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from roguelike import STATUS_INDEX, InnerSkill
+from vector_engine import Z_LIMIT, compare_with_reference, compile_inner_hooks
+
+
+BATTLES = 3000
+
+
+@pytest.mark.parametrize(
+    "inner_skill_id, outer_skill_ids, stage, policy_name, seed",
+    [
+        ("suction_star", [], 3, "random", 11),
+        ("taiji", ["shock", "combo", "riposte"], 2, "random", 12),
+        ("nine_sun", ["shock", "combo", "consume_shock"], 3, "attack", 13),
+        ("withered_zen", ["frenzy", "crit_focus", "steady"], 2, "random", 14),
+        ("blood_war", ["vitality", "bleed", "shield_break"], 4, "attack", 15),
+    ],
+)
+def test_vector_engine_matches_reference(inner_skill_id, outer_skill_ids, stage, policy_name, seed):
+    report = compare_with_reference(inner_skill_id, outer_skill_ids, stage, BATTLES, seed, policy_name)
+    for metric, (expected, actual, z_score) in report.items():
+        assert abs(z_score) < Z_LIMIT, f"{metric}: 参考 {expected:.3f} 向量 {actual:.3f} z={z_score:+.2f}"
+
+
+def test_inner_hooks_are_read_from_content():
+    skills = [
+        InnerSkill(
+            "sun",
+            "",
+            "",
+            {
+                "onTurnStart": ({"type": "gainQi", "amount": 3},),
+                "onQiOverflow": ({"type": "addStatus", "status": "frenzy", "amount": "overflow"},),
+            },
+        ),
+        InnerSkill("star", "", "", {"onHit": ({"type": "stealQi", "amount": 2},)}),
+        InnerSkill("guard", "", "", {"onDefense": ({"type": "addStatus", "status": "shield_qi", "amount": 2},)}),
+    ]
+    hooks = compile_inner_hooks(skills)
+    assert hooks.turn_start_qi.tolist() == [3, 0, 0]
+    assert hooks.overflow_status.tolist() == [STATUS_INDEX["frenzy"], -1, -1]
+    assert hooks.steal_qi.tolist() == [0, 2, 0]
+    assert hooks.defense_status.tolist() == [-1, -1, STATUS_INDEX["shield_qi"]]
+    assert hooks.defense_amount.tolist() == [0, 0, 2]
+
+
+def test_unsupported_inner_hook_is_rejected():
+    with pytest.raises(ValueError):
+        compile_inner_hooks([InnerSkill("odd", "", "", {"onTurnStart": ({"type": "dealDamage", "amount": 1},)})])
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import pytest
+
+from sweep import Tuning
+from whatif import METRICS, Variant, compare_variants, parse_variant, report_lines
+
+
+def test_parse_variant_edits_the_build():
+    assert parse_variant("~combo", ["shock", "combo"]) == Variant("~combo", ("shock",))
+    assert parse_variant("-combo", ["shock", "combo"]).outer_skills == ("shock",)
+    variant = parse_variant("+pierce, base_damage=6", ["shock"])
+    assert variant.outer_skills == ("shock", "pierce")
+    assert variant.tuning == Tuning(base_damage=6)
+    for text in ("~echo", "combo", "unknown=1", "crit_chance=2"):
+        with pytest.raises(ValueError):
+            parse_variant(text, ["shock", "combo"])
+
+
+def compare(independent: bool):
+    variants = [Variant("基础构筑", ("shock",)), parse_variant("+pierce", ["shock"]), parse_variant("skill_chance_scale=1.0", ["shock"])]
+    return variants, compare_variants("taiji", variants, 300, workers=1, independent=independent)
+
+
+def test_paired_differences_match_the_means():
+    _, comparison = compare(independent=False)
+    for values, differences in zip(comparison.values[1:], comparison.differences):
+        for metric in METRICS:
+            assert differences[metric].count == 300
+            assert differences[metric].mean == pytest.approx(values[metric].mean - comparison.values[0][metric].mean)
+    assert all(comparison.differences[1][metric].variance() == 0.0 for metric in METRICS)
+
+
+def test_common_random_numbers_reduce_variance():
+    variants, paired = compare(independent=False)
+    _, independent = compare(independent=True)
+    for metric in ("turns", "damage_dealt", "damage_taken"):
+        unpaired = paired.values[0][metric].variance() + paired.values[1][metric].variance()
+        assert paired.differences[0][metric].variance() < unpaired / 2
+        assert independent.differences[0][metric].variance() > unpaired / 2
+        assert independent.differences[1][metric].variance() > 0
+    assert any("方差缩减" in line for line in report_lines(variants, paired))